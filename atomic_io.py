@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 配置文件的原子写入
+config_core 和 config_history 共用；本模块不依赖二者，避免循环导入。
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+from tracing import span
+
+
+def atomic_write(path: Path, text: str, mode: Optional[int] = None):
+    """原子写入文本文件：写入同目录的临时文件后 rename 覆盖目标
+
+    mode 为 None 时沿用目标文件原有的权限（新文件为 0600）。
+    """
+    if mode is None:
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o600
+    import tempfile
+    with span('atomic_write', 'io', path=path.name, bytes=len(text)):
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+                # 先把内容写入磁盘再 rename，断电后不会出现内容为空的新文件
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        fsync_dir(path.parent)
+
+
+def fsync_dir(directory: Path):
+    """同步目录项，使 rename 后的文件名也写入磁盘（Windows 不支持打开目录，跳过）"""
+    if sys.platform == "win32":
+        return
+    fd = os.open(str(directory), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
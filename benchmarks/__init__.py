@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Claude Code 配置管理器性能基准测试"""
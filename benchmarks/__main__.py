@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""python -m benchmarks 入口"""
+
+from benchmarks.suite import main
+
+main()
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+配置操作的性能基准测试
+覆盖命令行冷启动、JSON 和 SQLite 存储在不同规模（10 / 1k / 100k 个提供商）下的读取、列出、修改和切换、
+shell 配置文件更新（1KB ~ 10MB）以及导入/导出吞吐量。
+所有测试都在临时目录中进行，不会读写用户的真实配置。
+
+用法:
+    python -m benchmarks [--quick] [--output result.json] [--baseline baseline.json]
+    python config_manager.py bench [...]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config_manager import ConfigManager
+from provider_probe import percentile
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_SCALES = (10, 1000, 100000)
+QUICK_SCALES = (10, 1000)
+DEFAULT_RC_SIZES = (1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+QUICK_RC_SIZES = (1024, 1024 * 1024)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10
+# 单个测试项的时间预算（秒），超出后至少保留 3 次采样就停止
+TIME_BUDGET = 3.0
+# 命令行冷启动比裸解释器启动（cold_start[python]）多出的耗时上限（毫秒），超出时退出码为 1
+COLD_START_BUDGETS = {
+    'cold_start[config_manager list]': 60.0,
+    'cold_start[switch_provider --status]': 60.0,
+    'cold_start[switch_provider switch]': 90.0,
+}
+
+
+def format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size // (1024 * 1024)}MB"
+    return f"{size // 1024}KB"
+
+
+def measure(func: Callable[[], None], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """多次执行 func 并统计耗时（毫秒），setup 不计入耗时"""
+    samples = []
+    started = time.perf_counter()
+    for _ in range(max(1, repeat)):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+        if len(samples) >= 3 and time.perf_counter() - started > TIME_BUDGET:
+            break
+    return {
+        'runs': len(samples),
+        'median_ms': round(percentile(samples, 50), 3),
+        'min_ms': round(min(samples), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+    }
+
+
+def make_providers(count: int) -> Dict:
+    """生成指定数量的提供商配置"""
+    return {
+        'providers': {
+            f"provider{i}": {
+                'name': f"Provider {i}",
+                'base_url': f"https://api{i}.example.com/anthropic",
+                'api_key': f"sk-{i:032x}",
+                'description': f"基准测试提供商 {i}"
+            }
+            for i in range(count)
+        }
+    }
+
+
+def make_rc_content(size: int) -> str:
+    """生成指定大小的 shell 配置文件内容"""
+    line = "alias ll='ls -alF'  # filler line for benchmark\n"
+    return line * max(1, size // len(line))
+
+
+class BenchmarkSuite:
+    """在临时目录中运行所有基准测试"""
+
+    def __init__(self, root: Path, scales=DEFAULT_SCALES, rc_sizes=DEFAULT_RC_SIZES,
+                 repeat: int = DEFAULT_REPEAT, only: Optional[str] = None,
+                 progress: Optional[Callable[[str, Dict], None]] = None):
+        self.root = root
+        self.scales = scales
+        self.rc_sizes = rc_sizes
+        self.repeat = repeat
+        self.only = only
+        self.progress = progress
+        self.results = {}
+
+    def record(self, name: str, func: Callable[[], None], setup=None, repeat: Optional[int] = None,
+               items: Optional[int] = None, size: Optional[int] = None):
+        """执行并记录一个测试项；items/size 用于计算吞吐量"""
+        if self.only and self.only not in name:
+            return
+        result = measure(func, repeat or self.repeat, setup)
+        seconds = result['median_ms'] / 1000
+        if items is not None and seconds:
+            result['items_per_s'] = round(items / seconds, 1)
+        if size is not None and seconds:
+            result['mb_per_s'] = round(size / (1024 * 1024) / seconds, 2)
+        self.results[name] = result
+        if self.progress:
+            self.progress(name, result)
+
+    def manager(self, name: str, count: int, storage: str = 'json') -> ConfigManager:
+        """创建包含 count 个提供商的独立配置目录"""
+        config_manager = ConfigManager(self.root / name)
+        config_manager.save_providers(make_providers(count))
+        if storage != 'json':
+            config_manager.migrate_storage(storage)
+        return config_manager
+
+    def cli_env(self, home: Path) -> Dict[str, str]:
+        env = dict(os.environ)
+        env['HOME'] = env['USERPROFILE'] = str(home)
+        env['SHELL'] = '/bin/bash'
+        env['CLAUDE_CONFIG_NO_DAEMON'] = '1'
+        return env
+
+    def bench_cold_start(self):
+        """命令行冷启动：每次都启动新的解释器进程"""
+        home = self.root / 'cli_home'
+        ConfigManager(home / '.claude_code_config').save_providers(make_providers(10))
+        env = self.cli_env(home)
+
+        def run(*args):
+            return lambda: subprocess.run([sys.executable, *args], env=env, cwd=str(REPO_ROOT),
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        self.record('cold_start[python]', run('-c', 'pass'))
+        self.record('cold_start[config_manager list]', run(str(REPO_ROOT / 'config_manager.py'), 'list'))
+        self.record('cold_start[switch_provider --status]',
+                    run(str(REPO_ROOT / 'switch_provider.py'), '--status'))
+        self.record('cold_start[switch_provider switch]',
+                    run(str(REPO_ROOT / 'switch_provider.py'), 'provider1'))
+
+    def bench_scale(self, count: int, storage: str = 'json'):
+        """不同规模下的读取、列出、修改和切换"""
+        config_manager = self.manager(f"scale_{storage}_{count}", count, storage)
+        config_dir = config_manager.config_dir
+        label = f"n={count}" if storage == 'json' else f"{storage},n={count}"
+        # 预热缓存
+        config_manager.load_providers()
+
+        self.record(f"load_providers_cold[{label}]",
+                    lambda: ConfigManager(config_dir).load_providers(), items=count)
+        self.record(f"get_provider_cold[{label}]",
+                    lambda: ConfigManager(config_dir).get_provider(f"provider{count - 1}"))
+        self.record(f"load_providers[{label}]", config_manager.load_providers, items=count)
+        self.record(f"get_provider[{label}]",
+                    lambda: config_manager.get_provider(f"provider{count - 1}"))
+        self.record(f"list_providers[{label}]", config_manager.list_providers, items=count)
+        self.record(f"update_provider[{label}]",
+                    lambda: config_manager.update_provider(f"provider{count // 2}",
+                                                           description=str(time.perf_counter())))
+
+        targets = [f"provider{i % count}" for i in range(2)]
+        state = {'index': 0}
+
+        def switch():
+            state['index'] += 1
+            config_manager.switch_provider(targets[state['index'] % 2], update_env=False)
+
+        self.record(f"switch_provider[{label}]", switch)
+
+    def bench_shell_config(self, size: int):
+        """shell 配置文件更新：整体重写 rc 文件 vs 只重写环境文件"""
+        config_manager = self.manager('shell', 1)
+        rc_file = self.root / f"bashrc_{size}"
+        content = make_rc_content(size)
+        rc_file.write_text(content, encoding='utf-8')
+
+        self.record(f"update_shell_config[rc={format_size(size)}]",
+                    lambda: config_manager._update_shell_config(rc_file, 'https://api.example.com', 'sk-test'),
+                    size=len(content))
+
+    def bench_env_file(self):
+        config_manager = self.manager('env_file', 1)
+        self.record('write_env_files',
+                    lambda: config_manager.write_env_files('https://api.example.com', 'sk-test'))
+
+    def bench_import_export(self, count: int):
+        """通过命令行导入/导出（包含进程启动耗时）"""
+        home = self.root / f"io_home_{count}"
+        ConfigManager(home / '.claude_code_config').save_providers(make_providers(count))
+        env = self.cli_env(home)
+        export_file = self.root / f"export_{count}.json"
+        script = str(REPO_ROOT / 'config_manager.py')
+
+        def run(*args):
+            subprocess.run([sys.executable, script, *args], env=env, cwd=str(REPO_ROOT),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+        self.record(f"export[n={count}]", lambda: run('export', str(export_file), '--include-keys'),
+                    items=count)
+        size = export_file.stat().st_size if export_file.exists() else None
+        self.record(f"import[n={count}]", lambda: run('import', str(export_file)),
+                    items=count, size=size)
+
+    def run(self) -> Dict:
+        self.bench_cold_start()
+        for storage in ('json', 'sqlite'):
+            for count in self.scales:
+                self.bench_scale(count, storage)
+        for size in self.rc_sizes:
+            self.bench_shell_config(size)
+        self.bench_env_file()
+        for count in self.scales:
+            self.bench_import_export(count)
+        return self.results
+
+
+def run_suite(scales=DEFAULT_SCALES, rc_sizes=DEFAULT_RC_SIZES, repeat: int = DEFAULT_REPEAT,
+              only: Optional[str] = None, progress=None) -> Dict:
+    """运行基准测试，返回可以保存为 JSON 的报告"""
+    with tempfile.TemporaryDirectory(prefix='claude-config-bench-') as root:
+        results = BenchmarkSuite(Path(root), scales, rc_sizes, repeat, only, progress).run()
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scales': list(scales),
+            'rc_sizes': list(rc_sizes),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare_results(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """与基线比较中位数耗时，变慢超过 threshold（比例）的测试项标记为回归"""
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base.get('median_ms'):
+            rows.append({'name': name, 'baseline_ms': None, 'current_ms': result['median_ms'],
+                         'change': None, 'regression': False})
+            continue
+        change = result['median_ms'] / base['median_ms'] - 1
+        rows.append({
+            'name': name,
+            'baseline_ms': base['median_ms'],
+            'current_ms': result['median_ms'],
+            'change': round(change, 4),
+            'regression': change > threshold,
+        })
+    return rows
+
+
+def check_cold_start(report: Dict, budgets: Dict[str, float] = COLD_START_BUDGETS) -> List[Dict]:
+    """检查冷启动比解释器启动多出的耗时是否超出预算，返回超出的测试项"""
+    results = report['results']
+    python = results.get('cold_start[python]')
+    if not python:
+        return []
+    rows = []
+    for name, budget in budgets.items():
+        if name not in results:
+            continue
+        extra = results[name]['median_ms'] - python['median_ms']
+        if extra > budget:
+            rows.append({'name': name, 'extra_ms': round(extra, 3), 'budget_ms': budget})
+    return rows
+
+
+def format_result(name: str, result: Dict) -> str:
+    extra = ''
+    if 'items_per_s' in result:
+        extra += f"  {result['items_per_s']:>12.1f} 项/s"
+    if 'mb_per_s' in result:
+        extra += f"  {result['mb_per_s']:>8.2f} MB/s"
+    return (f"  {name:<42} {result['median_ms']:>10.3f} ms  "
+            f"(min {result['min_ms']:.3f}, p95 {result['p95_ms']:.3f}, {result['runs']} 次){extra}")
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    lines = []
+    for row in rows:
+        if row['change'] is None:
+            lines.append(f"  {row['name']:<42} {row['current_ms']:>10.3f} ms  (基线中没有)")
+            continue
+        mark = '✗' if row['regression'] else '✓'
+        lines.append(f"{mark} {row['name']:<42} {row['baseline_ms']:>10.3f} → {row['current_ms']:>10.3f} ms"
+                     f"  {row['change'] * 100:+.1f}%")
+    return '\n'.join(lines)
+
+
+def run_cli(quick: bool = False, output: Optional[str] = None, baseline: Optional[str] = None,
+            threshold: float = DEFAULT_THRESHOLD, repeat: int = DEFAULT_REPEAT,
+            only: Optional[str] = None, as_json: bool = False) -> int:
+    """命令行入口（python -m benchmarks 和 config_manager.py bench 共用），返回退出码"""
+    baseline_report = None
+    if baseline:
+        try:
+            with open(baseline, 'r', encoding='utf-8') as f:
+                baseline_report = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"✗ 无法读取基线文件 {baseline}: {e}", file=sys.stderr)
+            return 1
+
+    def progress(name, result):
+        if not as_json:
+            print(format_result(name, result), flush=True)
+
+    report = run_suite(QUICK_SCALES if quick else DEFAULT_SCALES,
+                       QUICK_RC_SIZES if quick else DEFAULT_RC_SIZES,
+                       repeat, only, progress)
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        if not as_json:
+            print(f"✓ 结果已保存到: {output}")
+
+    regressions = []
+    if baseline_report is not None:
+        rows = compare_results(report, baseline_report, threshold)
+        report['comparison'] = rows
+        regressions = [row for row in rows if row['regression']]
+        if not as_json:
+            print(f"\n与基线比较（阈值 {threshold * 100:.0f}%）:")
+            print(format_comparison(rows))
+            if regressions:
+                print(f"✗ {len(regressions)} 个测试项出现性能回归")
+            else:
+                print("✓ 没有性能回归")
+
+    over_budget = check_cold_start(report)
+    if over_budget:
+        report['cold_start_over_budget'] = over_budget
+        if not as_json:
+            print("\n✗ 冷启动超出预算:")
+            for row in over_budget:
+                print(f"  {row['name']:<42} 比解释器启动多 {row['extra_ms']:.1f} ms（上限 {row['budget_ms']:.0f} ms）")
+
+    if as_json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if regressions or over_budget else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Claude Code 配置管理器性能基准测试')
+    parser.add_argument('--quick', action='store_true', help='只测试较小的规模（10/1k 个提供商，1KB/1MB 配置文件）')
+    parser.add_argument('--output', help='把结果保存为 JSON 文件')
+    parser.add_argument('--baseline', help='与之前保存的结果比较，出现回归时退出码为 1（冷启动超出预算时也为 1）')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='判定为回归的变慢比例（默认 0.10）')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每个测试项的重复次数（默认5）')
+    parser.add_argument('--only', help='只运行名称包含该字符串的测试项')
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式输出结果')
+    args = parser.parse_args(argv)
+    sys.exit(run_cli(args.quick, args.output, args.baseline, args.threshold, args.repeat,
+                     args.only, args.json))
+
+
+if __name__ == '__main__':
+    main()
@@ -83,6 +83,9 @@ class Builder:
             self.python_cmd, '-m', 'PyInstaller',
             '--onefile',
             '--windowed',
+            # UPX 压缩的 Qt 库每次启动都要解压，明显拖慢窗口出现的时间
+            '--noupx',
+            '--exclude-module', 'tkinter',
             '--name', 'Claude-Config-Manager',
             '--add-data', f'example_config.json{os.pathsep}.',
             '--hidden-import', 'PySide6.QtCore',
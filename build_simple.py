@@ -44,7 +44,7 @@ def main():
             print(f"✓ 清理 {dir_name} 目录")
     
     # 构建GUI
-    gui_cmd = """python -m PyInstaller --onefile --windowed --name "Claude-Config-Manager" claude_config_gui.py"""
+    gui_cmd = """python -m PyInstaller --onefile --windowed --noupx --exclude-module tkinter --name "Claude-Config-Manager" claude_config_gui.py"""
     if not run_command(gui_cmd, "构建GUI应用"):
         return False
     
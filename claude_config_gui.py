@@ -7,25 +7,78 @@ Claude Code 配置管理器 GUI
 
 import sys
 import os
+import json
+import threading
+import time
 from pathlib import Path
 from typing import Dict, Optional
 
+STARTUP_BEGIN = time.perf_counter()
+
 try:
     from PySide6.QtWidgets import (
         QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
         QLabel, QLineEdit, QPushButton, QComboBox, QTextEdit, QGroupBox,
-        QFormLayout, QMessageBox, QTabWidget, QTableWidget, QTableWidgetItem,
+        QFormLayout, QMessageBox, QTabWidget, QTableView, QAbstractItemView,
         QHeaderView, QSplitter, QFrame, QStatusBar, QToolBar, QDialog,
-        QDialogButtonBox, QCheckBox
+        QDialogButtonBox, QCheckBox, QProgressBar, QRadioButton
+    )
+    from PySide6.QtCore import (
+        Qt, QTimer, Signal, QObject, QFileSystemWatcher, QAbstractTableModel,
+        QModelIndex, QSortFilterProxyModel, QRunnable, QThreadPool
     )
-    from PySide6.QtCore import Qt, QTimer, Signal, QThread
-    from PySide6.QtGui import QIcon, QFont, QPixmap, QAction
+    from PySide6.QtGui import QIcon, QFont, QPixmap, QAction, QColor
 except ImportError:
     print("错误: 未安装 PySide6")
     print("请运行: pip install PySide6")
     sys.exit(1)
 
-from config_manager import ConfigManager
+import provider_stream
+from config_manager import ConfigManager, default_config_dir
+from tracing import process_uptime
+
+IMPORT_EXPORT_FILTER = "配置文件 (*.json *.jsonl *.ndjson *.gz *.xz);;JSON文件 (*.json);;JSON Lines (*.jsonl *.jsonl.gz *.jsonl.xz);;所有文件 (*)"
+
+MODULES_LOADED = time.perf_counter()
+
+class StartupReport:
+    """启动耗时报告（--startup-report）
+    
+    各阶段的时间从进程启动算起（无法获取进程启动时间时从导入本模块算起），
+    在首次绘制和首次加载提供商列表都完成后输出到 stderr。
+    """
+    
+    def __init__(self):
+        uptime = process_uptime()
+        self.origin = time.perf_counter() - uptime if uptime is not None else STARTUP_BEGIN
+        self.marks = []
+        if uptime is not None:
+            self.mark("Python 启动", STARTUP_BEGIN)
+        self.mark("PySide6 导入", MODULES_LOADED)
+        self.printed = False
+    
+    def mark(self, name, when=None):
+        self.marks.append((name, time.perf_counter() if when is None else when))
+    
+    def elapsed(self, name):
+        """从进程启动到某个阶段的毫秒数"""
+        for mark, when in self.marks:
+            if mark == name:
+                return (when - self.origin) * 1000
+        return None
+    
+    def report(self):
+        lines = ["启动耗时报告:"]
+        previous = self.origin
+        for name, when in self.marks:
+            lines.append(f"  {(when - self.origin) * 1000:8.1f} ms  (+{(when - previous) * 1000:6.1f} ms)  {name}")
+            previous = when
+        return "\n".join(lines)
+    
+    def print_report(self):
+        if not self.printed:
+            self.printed = True
+            print(self.report(), file=sys.stderr)
 
 class ProviderDialog(QDialog):
     """添加/编辑提供商对话框"""
@@ -114,43 +167,391 @@ class ProviderDialog(QDialog):
         
         super().accept()
 
-class StatusUpdateThread(QThread):
-    """状态更新线程"""
-    status_updated = Signal(dict)
+class ImportDiffDialog(QDialog):
+    """导入预览对话框：显示导入文件与现有配置的差异，选择导入方式"""
     
-    def __init__(self, config_manager):
-        super().__init__()
-        self.config_manager = config_manager
-        self.running = True
+    def __init__(self, parent, file_name, diff):
+        super().__init__(parent)
+        # diff 为替换 + 覆盖模式的预览，其他方式由它推导
+        self.diff = diff
+        self.setWindowTitle("导入预览")
+        self.setModal(True)
+        self.resize(480, 420)
         
-    def run(self):
-        while self.running:
-            try:
-                env_info = self.config_manager.get_current_env_info()
-                self.status_updated.emit(env_info)
-            except Exception as e:
-                print(f"状态更新错误: {e}")
-            
-            self.msleep(2000)  # 每2秒更新一次
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"导入文件: {file_name}"))
+        
+        self.merge_radio = QRadioButton("合并（保留导入文件中没有的提供商）")
+        self.replace_radio = QRadioButton("替换（删除导入文件中没有的提供商）")
+        self.merge_radio.setChecked(True)
+        self.overwrite_check = QCheckBox("覆盖内容不同的已有提供商")
+        self.overwrite_check.setChecked(True)
+        for widget in (self.merge_radio, self.replace_radio, self.overwrite_check):
+            widget.toggled.connect(self.update_preview)
+            layout.addWidget(widget)
+        
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        
+        self.details_text = QTextEdit()
+        self.details_text.setReadOnly(True)
+        layout.addWidget(self.details_text)
+        
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.button_box.button(QDialogButtonBox.Ok).setText("导入")
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+        
+        self.update_preview()
+    
+    def options(self):
+        """(replace, overwrite)"""
+        return self.replace_radio.isChecked(), self.overwrite_check.isChecked()
+    
+    def update_preview(self):
+        diff = self.diff.with_options(*self.options())
+        if diff.has_changes:
+            self.summary_label.setText(
+                f"新增 {len(diff.added)}，修改 {len(diff.changed)}，删除 {len(diff.removed)}，"
+                f"未变化 {diff.unchanged}，跳过 {len(diff.skipped)}")
+        else:
+            self.summary_label.setText("与现有配置相同，没有需要导入的修改")
+        self.details_text.setPlainText(diff.format(limit=200))
+        self.button_box.button(QDialogButtonBox.Ok).setEnabled(diff.has_changes)
+
+def file_signature(paths):
+    """配置文件的 stat 签名，文件不存在时对应位置为 None"""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+class ConfigWatcher(QObject):
+    """配置目录监听器
+    
+    监听提供商存储（providers.json 或 providers.db）、current.json 和模型列表缓存的变化，防抖后仅在文件签名确实改变时
+    发出 config_changed 信号；空闲时不产生任何磁盘 I/O。要监听的文件取决于存储后端，由后台读取配置后通过
+    set_files() 设置，主线程不需要创建 ConfigManager。
+    """
+    config_changed = Signal()
+    
+    def __init__(self, config_dir, debounce_ms=300, parent=None):
+        super().__init__(parent)
+        self.config_dir = str(config_dir)
+        self.watched_files = []
+        self.last_signature = ()
+        
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(debounce_ms)
+        self.debounce_timer.timeout.connect(self.check_changes)
+        
+        # 配置文件通过 rename 原子替换，需要同时监听目录才能感知到新文件
+        self.watcher = QFileSystemWatcher(self)
+        self.watch_files()
+        self.watcher.directoryChanged.connect(self.schedule_check)
+        self.watcher.fileChanged.connect(self.schedule_check)
+    
+    def set_files(self, paths, signature):
+        """设置要监听的文件；signature 是后台读取配置之前取得的签名
+        
+        读取之后文件又被修改时签名不一致，重新检查一次，不会漏掉这次修改。
+        """
+        self.watched_files = list(paths)
+        self.last_signature = signature
+        self.watch_files()
+        if file_signature(self.watched_files) != signature:
+            self.schedule_check()
+    
+    def watch_files(self):
+        """将存在的配置目录和配置文件加入监听列表（首次启动时目录由后台任务创建）"""
+        if self.config_dir not in self.watcher.directories() and os.path.isdir(self.config_dir):
+            self.watcher.addPath(self.config_dir)
+        watched = set(self.watcher.files())
+        for path in self.watched_files:
+            if str(path) not in watched and path.exists():
+                self.watcher.addPath(str(path))
+    
+    def get_signature(self):
+        """获取配置文件的 stat 签名"""
+        return file_signature(self.watched_files)
+    
+    def schedule_check(self, path=None):
+        """收到文件系统事件后重新计时，合并短时间内的连续变化"""
+        self.debounce_timer.start()
+    
+    def check_changes(self):
+        """防抖结束后检查配置是否真的发生变化"""
+        self.watch_files()
+        signature = self.get_signature()
+        if signature != self.last_signature:
+            self.last_signature = signature
+            self.config_changed.emit()
     
     def stop(self):
-        self.running = False
-        self.quit()
-        self.wait()
+        self.debounce_timer.stop()
+        self.watcher.removePaths(self.watcher.files() + self.watcher.directories())
+
+class TaskCancelled(Exception):
+    """后台任务被用户取消"""
+
+class TaskSignals(QObject):
+    """后台任务的信号，对象在主线程创建，工作线程发出的信号排队投递到主线程"""
+    started = Signal(object)
+    progress = Signal(object, int, int)
+    finished = Signal(object, object)
+    failed = Signal(object, object)
+    cancelled = Signal(object)
+
+class ConfigTask(QRunnable):
+    """在线程池中执行的配置操作
+    
+    fn(task, config_manager, *args) 在工作线程中运行，使用本任务自己的 ConfigManager
+    （SQLite 连接不能跨线程使用），任务结束时关闭它的数据库连接和锁文件句柄，线程池回收
+    线程时不会遗留打开的文件。长时间运行的操作通过 task.report_progress() 报告进度，
+    并在其中响应取消；取消后 fn 抛出 TaskCancelled，不会写入任何修改。
+    """
+    
+    def __init__(self, config_dir, fn, *args, description=None, on_finished=None, on_failed=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.config_dir = config_dir
+        self.fn = fn
+        self.args = args
+        self.description = description
+        self.on_finished = on_finished
+        self.on_failed = on_failed
+        self.signals = TaskSignals()
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        self.cancel_event.set()
+    
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+    
+    def report_progress(self, done, total=0):
+        """报告进度（total 为 0 表示无法估计），同时检查是否已取消"""
+        self.check_cancelled()
+        self.signals.progress.emit(self, done, total)
+    
+    def run(self):
+        self.signals.started.emit(self)
+        config_manager = None
+        try:
+            self.check_cancelled()
+            config_manager = ConfigManager(self.config_dir)
+            result = self.fn(self, config_manager, *self.args)
+        except TaskCancelled:
+            self.signals.cancelled.emit(self)
+        except Exception as e:
+            self.signals.failed.emit(self, e)
+        else:
+            self.signals.finished.emit(self, result)
+        finally:
+            if config_manager is not None:
+                config_manager.close()
+
+PROGRESS_INTERVAL = 500
+
+def load_snapshot(task, config_manager):
+    """读取提供商列表、当前环境信息和模型列表缓存（只读缓存，不发起网络请求）
+    
+    同时返回要监听的配置文件和读取前的文件签名，供 ConfigWatcher 使用。
+    """
+    watched_files = config_manager.storage_files + [config_manager.current_config_file,
+                                                    config_manager.models_cache_file]
+    signature = file_signature(watched_files)
+    return (config_manager.list_providers(), config_manager.get_current_env_info(),
+            config_manager.cached_models(), watched_files, signature)
+
+def import_file(task, config_manager, file_path, replace=True, overwrite=True, dry_run=False):
+    """逐条读取导入文件并导入（dry_run 时只计算差异），按已读取的文件大小（KB）报告进度
+
+    返回 provider_stream.ImportDiff；取消时不写入任何修改。
+    """
+    with provider_stream.ProviderReader(file_path) as reader:
+        def on_read(count):
+            if count % PROGRESS_INTERVAL == 0:
+                task.report_progress(reader.position // 1024, reader.total_bytes // 1024)
+        
+        return config_manager.import_providers(reader, replace=replace, overwrite=overwrite,
+                                               dry_run=dry_run, on_read=on_read)
+
+def export_providers(task, config_manager, file_path, include_api_keys):
+    """导出提供商配置到文件（格式和压缩按文件名判断），返回导出的数量"""
+    return provider_stream.export_providers(
+        config_manager, file_path, include_keys=include_api_keys,
+        progress=task.report_progress, every=PROGRESS_INTERVAL
+    )
+
+class ProviderTableModel(QAbstractTableModel):
+    """提供商列表模型
+    
+    以有序的 provider_id 列表和提供商信息字典保存数据。set_providers() 与现有数据比较，
+    只发出行级的插入、删除和 dataChanged 信号，视图不需要整体重建。
+    最后一列为切换下拉框使用的 "名称 (ID)"，在表格中隐藏。
+    """
+    HEADERS = ["状态", "名称", "描述", "切换项"]
+    SWITCH_COLUMN = 3
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.provider_ids = []
+        self.providers = {}
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.provider_ids)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+    
+    @staticmethod
+    def status_of(info):
+        """状态列的文字和颜色"""
+        if info['is_current']:
+            return "✓ 当前", "#4CAF50"
+        if info['is_configured']:
+            return "○ 已配置", "#2196F3"
+        return "× 未配置", "#F44336"
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        provider_id = self.provider_ids[index.row()]
+        info = self.providers[provider_id]
+        column = index.column()
+        
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return self.status_of(info)[0]
+            if column == 1:
+                return info.get('name', provider_id)
+            if column == 2:
+                return info.get('description', '')
+            return f"{info.get('name', provider_id)} ({provider_id})"
+        if role == Qt.ForegroundRole and column == 0:
+            return QColor(self.status_of(info)[1])
+        if role == Qt.UserRole:
+            return provider_id
+        return None
+    
+    def provider_info(self, provider_id):
+        return self.providers.get(provider_id)
+    
+    def set_providers(self, providers: Dict[str, Dict]):
+        """用最新的提供商数据更新模型，只通知发生变化的行"""
+        new_ids = list(providers)
+        kept_old = [pid for pid in self.provider_ids if pid in providers]
+        kept_new = [pid for pid in new_ids if pid in self.providers]
+        if kept_old != kept_new:
+            # 已有提供商的顺序发生变化（例如替换导入），直接重置
+            self.beginResetModel()
+            self.provider_ids = new_ids
+            self.providers = dict(providers)
+            self.endResetModel()
+            return
+        
+        # 删除：从后往前按连续区间删除，前面的行号不受影响
+        row = len(self.provider_ids) - 1
+        while row >= 0:
+            if self.provider_ids[row] in providers:
+                row -= 1
+                continue
+            end = row
+            while row >= 0 and self.provider_ids[row] not in providers:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row + 1, end)
+            for provider_id in self.provider_ids[row + 1:end + 1]:
+                del self.providers[provider_id]
+            del self.provider_ids[row + 1:end + 1]
+            self.endRemoveRows()
+        
+        # 修改：按连续区间发出 dataChanged
+        start = None
+        for row, provider_id in enumerate(self.provider_ids + [None]):
+            changed = provider_id is not None and self.providers[provider_id] != providers[provider_id]
+            if changed:
+                self.providers[provider_id] = providers[provider_id]
+                if start is None:
+                    start = row
+            elif start is not None:
+                self.dataChanged.emit(self.index(start, 0), self.index(row - 1, self.columnCount() - 1))
+                start = None
+        
+        # 插入：新列表中不在模型里的连续区间
+        row = 0
+        while row < len(new_ids):
+            if row < len(self.provider_ids) and self.provider_ids[row] == new_ids[row]:
+                row += 1
+                continue
+            start = row
+            while row < len(new_ids) and new_ids[row] not in self.providers:
+                row += 1
+            self.beginInsertRows(QModelIndex(), start, row - 1)
+            self.provider_ids[start:start] = new_ids[start:row]
+            for provider_id in new_ids[start:row]:
+                self.providers[provider_id] = providers[provider_id]
+            self.endInsertRows()
+
+class ConfiguredProviderFilter(QSortFilterProxyModel):
+    """只保留已配置 API Key 的提供商（用于切换下拉框）"""
+    
+    def filterAcceptsRow(self, source_row, source_parent):
+        model = self.sourceModel()
+        info = model.provider_info(model.provider_ids[source_row])
+        return bool(info and info['is_configured'])
 
 class ClaudeConfigGUI(QMainWindow):
     """主窗口"""
     
-    def __init__(self):
+    def __init__(self, startup_report=None):
         super().__init__()
-        self.config_manager = ConfigManager()
-        self.status_thread = None
+        self.startup_report = startup_report
+        # ConfigManager 在后台线程中按需创建，主线程只需要配置目录
+        self.config_dir = default_config_dir()
+        self.config_watcher = None
+        self.current_provider_id = None
+        self.model_catalog = {}
+        self.startup_finished = False
+        self.pending_log = []
+        
+        # 所有配置读写都在后台线程执行；单线程保证操作按提交顺序完成
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.tasks = []
+        self.current_task = None
+        
         self.setup_ui()
         self.setup_status_bar()
         self.setup_toolbar()
+        
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.startup_finished:
+            # 首次绘制后再读取配置、监听文件和创建日志面板，窗口尽快显示出来
+            self.startup_finished = True
+            if self.startup_report:
+                self.startup_report.mark("首次绘制")
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """窗口显示后的初始化"""
         self.load_providers()
         self.start_status_updates()
-        
+        self.create_log_panel()
+    
     def setup_ui(self):
         """设置UI"""
         self.setWindowTitle("Claude Code 配置管理器")
@@ -183,19 +584,43 @@ class ClaudeConfigGUI(QMainWindow):
         panel = QGroupBox("提供商列表")
         layout = QVBoxLayout(panel)
         
-        # 提供商表格
-        self.providers_table = QTableWidget()
-        self.providers_table.setColumnCount(3)
-        self.providers_table.setHorizontalHeaderLabels(["状态", "名称", "描述"])
+        # 搜索框
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索提供商...")
+        self.search_edit.setClearButtonEnabled(True)
+        layout.addWidget(self.search_edit)
+        
+        # 提供商表格（模型 + 排序/过滤代理）
+        self.provider_model = ProviderTableModel(self)
+        self.provider_proxy = QSortFilterProxyModel(self)
+        self.provider_proxy.setSourceModel(self.provider_model)
+        self.provider_proxy.setFilterKeyColumn(-1)
+        self.provider_proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.provider_proxy.setSortCaseSensitivity(Qt.CaseInsensitive)
+        self.search_edit.textChanged.connect(self.provider_proxy.setFilterFixedString)
+        
+        self.providers_table = QTableView()
+        self.providers_table.setModel(self.provider_proxy)
+        self.providers_table.setColumnHidden(ProviderTableModel.SWITCH_COLUMN, True)
         
         # 设置表格属性
         header = self.providers_table.horizontalHeader()
-        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        # 状态列只有固定的几种文字，按最宽的一种设置列宽，避免每次更新都逐行测量
+        status_width = max(self.providers_table.fontMetrics().horizontalAdvance(text)
+                           for text in ("✓ 当前", "○ 已配置", "× 未配置", "状态"))
+        header.setSectionResizeMode(0, QHeaderView.Fixed)
+        header.resizeSection(0, status_width + 24)
         header.setSectionResizeMode(1, QHeaderView.Stretch)
         header.setSectionResizeMode(2, QHeaderView.Stretch)
+        # 初始保持配置文件中的顺序，点击表头后排序
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        self.providers_table.setSortingEnabled(True)
+        self.providers_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         
-        self.providers_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.providers_table.itemSelectionChanged.connect(self.on_provider_selected)
+        self.providers_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.providers_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.providers_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.providers_table.selectionModel().selectionChanged.connect(self.on_provider_selected)
         
         layout.addWidget(self.providers_table)
         
@@ -248,8 +673,13 @@ class ClaudeConfigGUI(QMainWindow):
         switch_form = QHBoxLayout()
         switch_form.addWidget(QLabel("选择提供商:"))
         
+        # 下拉框与表格共用同一个模型，只显示已配置的提供商
+        self.switch_proxy = ConfiguredProviderFilter(self)
+        self.switch_proxy.setSourceModel(self.provider_model)
         self.provider_combo = QComboBox()
-        self.provider_combo.currentTextChanged.connect(self.on_combo_changed)
+        self.provider_combo.setModel(self.switch_proxy)
+        self.provider_combo.setModelColumn(ProviderTableModel.SWITCH_COLUMN)
+        self.provider_combo.currentIndexChanged.connect(self.on_combo_changed)
         switch_form.addWidget(self.provider_combo)
         
         self.switch_btn = QPushButton("切换")
@@ -278,9 +708,23 @@ class ClaudeConfigGUI(QMainWindow):
         self.detail_description_label.setWordWrap(True)
         details_layout.addRow("描述:", self.detail_description_label)
         
+        self.detail_models_label = QLabel("-")
+        self.detail_models_label.setWordWrap(True)
+        details_layout.addRow("模型:", self.detail_models_label)
+        
         layout.addWidget(details_group)
         
-        # 操作日志
+        # 操作日志面板在窗口显示后创建（见 create_log_panel）
+        self.control_layout = layout
+        self.log_text = None
+        
+        # 添加弹性空间
+        layout.addStretch()
+        
+        return panel
+    
+    def create_log_panel(self):
+        """创建操作日志面板，并写入此前缓存的日志"""
         log_group = QGroupBox("操作日志")
         log_layout = QVBoxLayout(log_group)
         
@@ -289,18 +733,29 @@ class ClaudeConfigGUI(QMainWindow):
         self.log_text.setReadOnly(True)
         log_layout.addWidget(self.log_text)
         
-        layout.addWidget(log_group)
+        # 放在弹性空间之前
+        self.control_layout.insertWidget(self.control_layout.count() - 1, log_group)
         
-        # 添加弹性空间
-        layout.addStretch()
-        
-        return panel
+        for message in self.pending_log:
+            self.log_text.append(message)
+        self.pending_log = []
     
     def setup_status_bar(self):
         """设置状态栏"""
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("就绪")
+        
+        # 后台任务进度和取消按钮，仅在执行用户发起的操作时显示
+        self.task_progress = QProgressBar()
+        self.task_progress.setMaximumWidth(200)
+        self.task_progress.hide()
+        self.status_bar.addPermanentWidget(self.task_progress)
+        
+        self.cancel_task_btn = QPushButton("取消")
+        self.cancel_task_btn.clicked.connect(self.cancel_current_task)
+        self.cancel_task_btn.hide()
+        self.status_bar.addPermanentWidget(self.cancel_task_btn)
     
     def setup_toolbar(self):
         """设置工具栏"""
@@ -332,68 +787,126 @@ class ClaudeConfigGUI(QMainWindow):
         toolbar.addAction(about_action)
     
     def start_status_updates(self):
-        """启动状态更新线程"""
-        self.status_thread = StatusUpdateThread(self.config_manager)
-        self.status_thread.status_updated.connect(self.update_status_display)
-        self.status_thread.start()
+        """启动配置文件监听，配置变化时刷新状态"""
+        self.config_watcher = ConfigWatcher(self.config_dir, parent=self)
+        self.config_watcher.config_changed.connect(self.on_config_changed)
+    
+    def run_task(self, fn, *args, description=None, on_finished=None, on_failed=None):
+        """在后台线程执行配置操作
+        
+        description 不为空时在状态栏显示进度并允许取消；on_finished(result) 和
+        on_failed(error) 在主线程中调用。
+        """
+        task = ConfigTask(self.config_dir, fn, *args, description=description,
+                          on_finished=on_finished, on_failed=on_failed)
+        task.signals.started.connect(self.on_task_started)
+        task.signals.progress.connect(self.on_task_progress)
+        task.signals.finished.connect(self.on_task_finished)
+        task.signals.failed.connect(self.on_task_failed)
+        task.signals.cancelled.connect(self.on_task_cancelled)
+        self.tasks.append(task)
+        self.thread_pool.start(task)
+        return task
+    
+    def on_task_started(self, task):
+        if not task.description:
+            return
+        self.current_task = task
+        self.task_progress.setRange(0, 0)
+        self.task_progress.show()
+        self.cancel_task_btn.setEnabled(True)
+        self.cancel_task_btn.show()
+        self.status_bar.showMessage(task.description)
+    
+    def on_task_progress(self, task, done, total):
+        if task is not self.current_task:
+            return
+        if total > 0:
+            self.task_progress.setRange(0, total)
+            self.task_progress.setValue(done)
+        else:
+            self.task_progress.setRange(0, 0)
+    
+    def finish_task(self, task):
+        """任务结束（完成、失败或取消）后的清理"""
+        self.tasks.remove(task)
+        if task is self.current_task:
+            self.current_task = None
+            self.task_progress.hide()
+            self.cancel_task_btn.hide()
+            self.status_bar.showMessage("就绪")
+    
+    def on_task_finished(self, task, result):
+        self.finish_task(task)
+        if task.on_finished:
+            task.on_finished(result)
+    
+    def on_task_failed(self, task, error):
+        self.finish_task(task)
+        if task.on_failed:
+            task.on_failed(error)
+        else:
+            self.log_message(f"✗ 操作失败: {error}")
+    
+    def on_task_cancelled(self, task):
+        self.finish_task(task)
+        if task.description:
+            self.log_message(f"○ 已取消: {task.description}")
+            self.status_bar.showMessage("操作已取消", 3000)
+    
+    def cancel_current_task(self):
+        """取消正在执行的操作"""
+        if self.current_task:
+            self.current_task.cancel()
+            self.cancel_task_btn.setEnabled(False)
+    
+    def on_config_changed(self):
+        """配置文件被修改（本程序或外部工具）
+        
+        添加、编辑、删除、切换和导入完成后不单独刷新，统一由这里重新加载一次。
+        """
+        self.load_providers()
     
     def load_providers(self):
-        """加载提供商列表"""
-        providers = self.config_manager.list_providers()
-        
-        # 更新表格
-        self.providers_table.setRowCount(len(providers))
-        
-        for row, (provider_id, info) in enumerate(providers.items()):
-            # 状态列
-            if info['is_current']:
-                status = "✓ 当前"
-                status_color = "#4CAF50"
-            elif info['is_configured']:
-                status = "○ 已配置"
-                status_color = "#2196F3"
-            else:
-                status = "× 未配置"
-                status_color = "#F44336"
-            
-            status_item = QTableWidgetItem(status)
-            from PySide6.QtGui import QColor
-            status_item.setForeground(QColor(status_color))
-            status_item.setData(Qt.UserRole, provider_id)
-            self.providers_table.setItem(row, 0, status_item)
-            
-            # 名称列
-            name_item = QTableWidgetItem(info['name'])
-            self.providers_table.setItem(row, 1, name_item)
-            
-            # 描述列
-            desc_item = QTableWidgetItem(info.get('description', ''))
-            self.providers_table.setItem(row, 2, desc_item)
-        
-        # 更新下拉框
-        self.provider_combo.clear()
-        configured_providers = {pid: info for pid, info in providers.items() if info['is_configured']}
-        
-        for provider_id, info in configured_providers.items():
-            display_text = f"{info['name']} ({provider_id})"
-            self.provider_combo.addItem(display_text, provider_id)
-        
-        # 选中当前提供商
-        current_provider = self.config_manager.get_current_provider()
-        if current_provider:
-            for i in range(self.provider_combo.count()):
-                if self.provider_combo.itemData(i) == current_provider:
-                    self.provider_combo.setCurrentIndex(i)
-                    break
+        """在后台读取提供商列表，完成后更新界面"""
+        self.run_task(load_snapshot, on_finished=self.on_providers_loaded)
+    
+    def on_providers_loaded(self, snapshot):
+        """更新提供商模型（只更新发生变化的行）和状态显示"""
+        providers, env_info, self.model_catalog, watched_files, signature = snapshot
+        if self.config_watcher:
+            self.config_watcher.set_files(watched_files, signature)
+        self.provider_model.set_providers(providers)
+        if self.startup_report and not self.startup_report.printed:
+            self.startup_report.mark("提供商列表加载")
+            self.startup_report.print_report()
+            # 窗口模式的打包程序没有 stderr，同时写入操作日志
+            self.log_message(f"启动耗时: 首次绘制 {self.startup_report.elapsed('首次绘制'):.0f} ms，"
+                             f"列表加载 {self.startup_report.elapsed('提供商列表加载'):.0f} ms")
+        
+        # 当前提供商变化时在下拉框中选中它
+        current_provider = env_info['current_provider']
+        if current_provider and current_provider != self.current_provider_id:
+            index = self.provider_combo.findData(current_provider)
+            if index >= 0:
+                self.provider_combo.setCurrentIndex(index)
+        self.current_provider_id = current_provider
+        
+        self.update_status_display(env_info)
+        provider_id = self.selected_provider_id()
+        if provider_id:
+            self.show_provider_details(provider_id)
+    
+    def selected_provider_id(self):
+        """表格中选中的提供商ID"""
+        selected_rows = self.providers_table.selectionModel().selectedRows()
+        return selected_rows[0].data(Qt.UserRole) if selected_rows else None
     
     def on_provider_selected(self):
         """提供商选择变化"""
-        selected_rows = self.providers_table.selectionModel().selectedRows()
+        provider_id = self.selected_provider_id()
         
-        if selected_rows:
-            row = selected_rows[0].row()
-            provider_id = self.providers_table.item(row, 0).data(Qt.UserRole)
-            
+        if provider_id:
             # 启用编辑和删除按钮
             self.edit_btn.setEnabled(True)
             self.delete_btn.setEnabled(True)
@@ -407,10 +920,8 @@ class ClaudeConfigGUI(QMainWindow):
     
     def show_provider_details(self, provider_id):
         """显示提供商详情"""
-        providers = self.config_manager.load_providers()
-        if provider_id in providers['providers']:
-            info = providers['providers'][provider_id]
-            
+        info = self.provider_model.provider_info(provider_id)
+        if info:
             self.detail_name_label.setText(info['name'])
             self.detail_base_url_label.setText(info['base_url'])
             
@@ -423,6 +934,20 @@ class ClaudeConfigGUI(QMainWindow):
                 self.detail_api_key_label.setText("未设置")
             
             self.detail_description_label.setText(info.get('description', '无'))
+            self.detail_models_label.setText(self.format_models(provider_id))
+    
+    def format_models(self, provider_id):
+        """模型列表缓存的摘要（由 `config_manager.py models` 更新）"""
+        from model_catalog import format_models
+        
+        entry = self.model_catalog.get(provider_id)
+        if not entry:
+            return "未查询"
+        models = entry.get('models', [])
+        text = format_models(models) if models else "无"
+        if entry.get('error'):
+            text += f"\n（上次查询失败: {entry['error']}）"
+        return text
     
     def clear_provider_details(self):
         """清空提供商详情"""
@@ -430,6 +955,7 @@ class ClaudeConfigGUI(QMainWindow):
         self.detail_base_url_label.setText("-")
         self.detail_api_key_label.setText("-")
         self.detail_description_label.setText("-")
+        self.detail_models_label.setText("-")
     
     def on_combo_changed(self):
         """下拉框选择变化"""
@@ -441,57 +967,59 @@ class ClaudeConfigGUI(QMainWindow):
         if dialog.exec() == QDialog.Accepted:
             data = dialog.get_data()
             
-            try:
-                self.config_manager.add_provider(
-                    data['id'], data['name'], data['base_url'], 
-                    data['api_key'], data['description']
-                )
+            def on_finished(result):
                 self.log_message(f"✓ 已添加提供商: {data['name']}")
-                self.refresh_data()
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"添加提供商失败: {str(e)}")
-                self.log_message(f"✗ 添加提供商失败: {str(e)}")
+            
+            def on_failed(error):
+                QMessageBox.critical(self, "错误", f"添加提供商失败: {str(error)}")
+                self.log_message(f"✗ 添加提供商失败: {str(error)}")
+            
+            self.run_task(
+                lambda task, config_manager: config_manager.add_provider(
+                    data['id'], data['name'], data['base_url'],
+                    data['api_key'], data['description']
+                ),
+                on_finished=on_finished, on_failed=on_failed
+            )
     
     def edit_provider(self):
         """编辑提供商"""
-        selected_rows = self.providers_table.selectionModel().selectedRows()
-        if not selected_rows:
+        provider_id = self.selected_provider_id()
+        if not provider_id:
             return
         
-        row = selected_rows[0].row()
-        provider_id = self.providers_table.item(row, 0).data(Qt.UserRole)
-        
-        providers = self.config_manager.load_providers()
-        provider_data = providers['providers'].get(provider_id)
+        provider_data = self.provider_model.provider_info(provider_id)
         
         if provider_data:
             dialog = ProviderDialog(self, provider_data, provider_id)
             if dialog.exec() == QDialog.Accepted:
                 data = dialog.get_data()
                 
-                try:
-                    self.config_manager.update_provider(
+                def on_finished(result):
+                    self.log_message(f"✓ 已更新提供商: {data['name']}")
+                
+                def on_failed(error):
+                    QMessageBox.critical(self, "错误", f"更新提供商失败: {str(error)}")
+                    self.log_message(f"✗ 更新提供商失败: {str(error)}")
+                
+                self.run_task(
+                    lambda task, config_manager: config_manager.update_provider(
                         provider_id,
                         name=data['name'],
                         base_url=data['base_url'],
                         api_key=data['api_key'],
                         description=data['description']
-                    )
-                    self.log_message(f"✓ 已更新提供商: {data['name']}")
-                    self.refresh_data()
-                except Exception as e:
-                    QMessageBox.critical(self, "错误", f"更新提供商失败: {str(e)}")
-                    self.log_message(f"✗ 更新提供商失败: {str(e)}")
+                    ),
+                    on_finished=on_finished, on_failed=on_failed
+                )
     
     def delete_provider(self):
         """删除提供商"""
-        selected_rows = self.providers_table.selectionModel().selectedRows()
-        if not selected_rows:
+        provider_id = self.selected_provider_id()
+        if not provider_id:
             return
         
-        row = selected_rows[0].row()
-        provider_id = self.providers_table.item(row, 0).data(Qt.UserRole)
-        provider_name = self.providers_table.item(row, 1).text()
+        provider_name = self.provider_model.provider_info(provider_id)['name']
         
         reply = QMessageBox.question(
             self, "确认删除", 
@@ -500,41 +1028,51 @@ class ClaudeConfigGUI(QMainWindow):
         )
         
         if reply == QMessageBox.Yes:
-            try:
-                self.config_manager.delete_provider(provider_id)
+            def on_finished(result):
                 self.log_message(f"✓ 已删除提供商: {provider_name}")
-                self.refresh_data()
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"删除提供商失败: {str(e)}")
-                self.log_message(f"✗ 删除提供商失败: {str(e)}")
+            
+            def on_failed(error):
+                QMessageBox.critical(self, "错误", f"删除提供商失败: {str(error)}")
+                self.log_message(f"✗ 删除提供商失败: {str(error)}")
+            
+            self.run_task(
+                lambda task, config_manager: config_manager.delete_provider(provider_id),
+                on_finished=on_finished, on_failed=on_failed
+            )
     
     def switch_provider(self):
-        """切换提供商"""
+        """切换提供商（Windows 上的 setx 和 shell 配置写入都在后台线程执行）"""
         provider_id = self.provider_combo.currentData()
         if not provider_id:
             return
         
-        try:
-            if self.config_manager.switch_provider(provider_id):
-                providers = self.config_manager.load_providers()
-                provider_name = providers['providers'][provider_id]['name']
+        provider_name = self.provider_model.provider_info(provider_id)['name']
+        
+        def on_finished(switched):
+            if switched:
                 self.log_message(f"✓ 已切换到: {provider_name}")
                 self.status_bar.showMessage(f"已切换到: {provider_name}", 3000)
-                self.refresh_data()
             else:
                 QMessageBox.warning(self, "切换失败", "提供商配置不完整或不存在")
                 self.log_message("✗ 切换失败: 提供商配置不完整")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"切换提供商失败: {str(e)}")
-            self.log_message(f"✗ 切换失败: {str(e)}")
+        
+        def on_failed(error):
+            QMessageBox.critical(self, "错误", f"切换提供商失败: {str(error)}")
+            self.log_message(f"✗ 切换失败: {str(error)}")
+        
+        self.run_task(
+            lambda task, config_manager: config_manager.switch_provider(provider_id),
+            description=f"正在切换到: {provider_name}",
+            on_finished=on_finished, on_failed=on_failed
+        )
     
     def update_status_display(self, env_info):
         """更新状态显示"""
         try:
             # 更新当前提供商显示
             if env_info.get('current_provider'):
-                providers = self.config_manager.load_providers()
-                provider_name = providers['providers'][env_info['current_provider']]['name']
+                provider = self.provider_model.provider_info(env_info['current_provider'])
+                provider_name = provider['name'] if provider else env_info['current_provider']
                 self.current_provider_label.setText(f"{provider_name} ({env_info['current_provider']})")
             else:
                 self.current_provider_label.setText("未设置")
@@ -559,7 +1097,8 @@ class ClaudeConfigGUI(QMainWindow):
                 self.current_api_key_label.setText("未设置")
                 
         except Exception as e:
-            print(f"更新状态显示错误: {e}")
+            # 窗口模式的打包程序没有 stdout；日志面板创建前的消息先放入 pending_log
+            self.log_message(f"✗ 更新状态显示错误: {e}")
     
     def refresh_data(self):
         """刷新数据"""
@@ -567,107 +1106,69 @@ class ClaudeConfigGUI(QMainWindow):
         self.log_message("✓ 数据已刷新")
     
     def import_config(self):
-        """导入配置"""
+        """导入配置：先在后台计算与现有配置的差异，确认后只写入有变化的提供商"""
         from PySide6.QtWidgets import QFileDialog
-        import json
         
         # 选择导入文件
         file_path, _ = QFileDialog.getOpenFileName(
             self, 
             "导入配置文件", 
             "", 
-            "JSON文件 (*.json);;所有文件 (*)"
+            IMPORT_EXPORT_FILTER
         )
         
         if not file_path:
             return
         
-        try:
-            # 读取配置文件
-            with open(file_path, 'r', encoding='utf-8') as f:
-                imported_config = json.load(f)
-            
-            # 验证配置文件格式
-            if 'providers' not in imported_config:
-                QMessageBox.warning(self, "导入失败", "配置文件格式不正确，缺少 'providers' 字段")
-                return
-            
-            # 询问导入方式
-            from PySide6.QtWidgets import QMessageBox
-            reply = QMessageBox.question(
-                self, "导入配置", 
-                f"找到 {len(imported_config['providers'])} 个提供商配置。\n\n"
-                "选择导入方式:\n"
-                "• 是(Yes): 合并配置（保留现有配置）\n"
-                "• 否(No): 替换配置（清空现有配置）\n"
-                "• 取消(Cancel): 取消导入",
-                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel
-            )
-            
-            if reply == QMessageBox.Cancel:
+        self.run_task(
+            import_file, file_path, True, True, True,
+            description=f"正在比较: {Path(file_path).name}",
+            on_finished=lambda diff: self.confirm_import(file_path, diff),
+            on_failed=self.on_import_failed
+        )
+    
+    def on_import_failed(self, error):
+        if isinstance(error, (json.JSONDecodeError, UnicodeDecodeError)):
+            QMessageBox.critical(self, "导入失败", "配置文件格式错误，请检查JSON格式")
+            self.log_message(f"✗ 导入失败: JSON格式错误")
+        else:
+            QMessageBox.critical(self, "导入失败", f"导入配置时发生错误:\n{str(error)}")
+            self.log_message(f"✗ 导入失败: {str(error)}")
+    
+    def confirm_import(self, file_path, diff):
+        """显示导入预览，确认后在后台导入"""
+        dialog = ImportDiffDialog(self, Path(file_path).name, diff)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        replace, overwrite = dialog.options()
+        
+        def on_finished(result):
+            if not result.has_changes:
+                self.log_message("✓ 配置没有变化，未写入文件")
                 return
             
-            # 获取当前配置
-            current_config = self.config_manager.load_providers()
-            
-            if reply == QMessageBox.No:
-                # 替换模式：清空现有配置
-                new_config = imported_config
-                imported_count = len(imported_config['providers'])
-            else:
-                # 合并模式：保留现有配置
-                new_config = current_config.copy()
-                imported_count = 0
-                
-                for provider_id, provider_info in imported_config['providers'].items():
-                    if provider_id in new_config['providers']:
-                        # 询问是否覆盖现有提供商
-                        overwrite_reply = QMessageBox.question(
-                            self, "提供商冲突", 
-                            f"提供商 '{provider_info.get('name', provider_id)}' 已存在。\n"
-                            "是否覆盖现有配置？",
-                            QMessageBox.Yes | QMessageBox.No
-                        )
-                        
-                        if overwrite_reply == QMessageBox.Yes:
-                            new_config['providers'][provider_id] = provider_info
-                            imported_count += 1
-                    else:
-                        new_config['providers'][provider_id] = provider_info
-                        imported_count += 1
-            
-            # 保存新配置
-            self.config_manager.save_providers(new_config)
-            
-            # 刷新界面
-            self.refresh_data()
-            
             # 显示成功消息
             QMessageBox.information(
                 self, "导入成功", 
-                f"成功导入 {imported_count} 个提供商配置！"
+                f"成功导入 {result.imported} 个提供商配置！\n"
+                f"新增 {len(result.added)}，修改 {len(result.changed)}，删除 {len(result.removed)}"
             )
             
             self.log_message(f"✓ 成功导入配置文件: {file_path}")
-            self.log_message(f"✓ 导入了 {imported_count} 个提供商配置")
-            
-        except json.JSONDecodeError:
-            QMessageBox.critical(self, "导入失败", "配置文件格式错误，请检查JSON格式")
-            self.log_message(f"✗ 导入失败: JSON格式错误")
-        except Exception as e:
-            QMessageBox.critical(self, "导入失败", f"导入配置时发生错误:\n{str(e)}")
-            self.log_message(f"✗ 导入失败: {str(e)}")
+            self.log_message(f"✓ 导入了 {result.imported} 个提供商配置，删除 {len(result.removed)} 个")
+        
+        self.run_task(
+            import_file, file_path, replace, overwrite,
+            description=f"正在导入: {Path(file_path).name}",
+            on_finished=on_finished, on_failed=self.on_import_failed
+        )
     
     def export_config(self):
-        """导出配置"""
+        """导出配置（在后台线程执行，可以取消）"""
         from PySide6.QtWidgets import QFileDialog
-        import json
         from datetime import datetime
         
-        # 获取当前配置
-        config = self.config_manager.load_providers()
-        
-        if not config.get('providers'):
+        if self.provider_model.rowCount() == 0:
             QMessageBox.information(self, "导出失败", "没有可导出的配置")
             return
         
@@ -680,53 +1181,27 @@ class ClaudeConfigGUI(QMainWindow):
             self, 
             "导出配置文件", 
             default_filename,
-            "JSON文件 (*.json);;所有文件 (*)"
+            IMPORT_EXPORT_FILTER
         )
         
         if not file_path:
             return
         
-        try:
-            # 准备导出数据
-            export_data = {
-                "export_info": {
-                    "version": "1.0.0",
-                    "export_time": datetime.now().isoformat(),
-                    "total_providers": len(config['providers'])
-                },
-                "providers": {}
-            }
-            
-            # 询问是否包含敏感信息
-            include_keys_reply = QMessageBox.question(
-                self, "导出选项", 
-                "是否在导出文件中包含API Keys？\n\n"
-                "• 是: 包含完整配置（包含API Keys）\n"
-                "• 否: 仅导出基本配置（不包含API Keys）\n\n"
-                "注意: 包含API Keys的文件请妥善保管！",
-                QMessageBox.Yes | QMessageBox.No
-            )
-            
-            include_api_keys = include_keys_reply == QMessageBox.Yes
-            
-            # 处理每个提供商配置
-            for provider_id, provider_info in config['providers'].items():
-                export_provider = provider_info.copy()
-                
-                if not include_api_keys:
-                    # 移除敏感信息
-                    export_provider['api_key'] = ""
-                
-                export_data['providers'][provider_id] = export_provider
-            
-            # 写入文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
-            
+        # 询问是否包含敏感信息
+        include_keys_reply = QMessageBox.question(
+            self, "导出选项", 
+            "是否在导出文件中包含API Keys？\n\n"
+            "• 是: 包含完整配置（包含API Keys）\n"
+            "• 否: 仅导出基本配置（不包含API Keys）\n\n"
+            "注意: 包含API Keys的文件请妥善保管！",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        
+        include_api_keys = include_keys_reply == QMessageBox.Yes
+        keys_info = "包含API Keys" if include_api_keys else "不包含API Keys"
+        
+        def on_finished(provider_count):
             # 显示成功消息
-            provider_count = len(export_data['providers'])
-            keys_info = "包含API Keys" if include_api_keys else "不包含API Keys"
-            
             QMessageBox.information(
                 self, "导出成功", 
                 f"成功导出 {provider_count} 个提供商配置！\n"
@@ -736,10 +1211,16 @@ class ClaudeConfigGUI(QMainWindow):
             
             self.log_message(f"✓ 成功导出配置文件: {file_path}")
             self.log_message(f"✓ 导出了 {provider_count} 个提供商配置 ({keys_info})")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "导出失败", f"导出配置时发生错误:\n{str(e)}")
-            self.log_message(f"✗ 导出失败: {str(e)}")
+        
+        def on_failed(error):
+            QMessageBox.critical(self, "导出失败", f"导出配置时发生错误:\n{str(error)}")
+            self.log_message(f"✗ 导出失败: {str(error)}")
+        
+        self.run_task(
+            export_providers, file_path, include_api_keys,
+            description=f"正在导出: {Path(file_path).name}",
+            on_finished=on_finished, on_failed=on_failed
+        )
     
     def show_about(self):
         """显示关于对话框"""
@@ -760,6 +1241,9 @@ class ClaudeConfigGUI(QMainWindow):
         from datetime import datetime
         from PySide6.QtGui import QTextCursor
         timestamp = datetime.now().strftime("%H:%M:%S")
+        if self.log_text is None:
+            self.pending_log.append(f"[{timestamp}] {message}")
+            return
         self.log_text.append(f"[{timestamp}] {message}")
         
         # 自动滚动到底部
@@ -769,21 +1253,34 @@ class ClaudeConfigGUI(QMainWindow):
     
     def closeEvent(self, event):
         """关闭事件"""
-        if self.status_thread:
-            self.status_thread.stop()
+        if self.config_watcher:
+            self.config_watcher.stop()
+        # 取消未完成的后台操作并等待工作线程退出
+        for task in self.tasks:
+            task.cancel()
+        self.thread_pool.waitForDone()
         event.accept()
 
 def main():
     """主函数"""
+    startup_report = None
+    if '--startup-report' in sys.argv:
+        sys.argv.remove('--startup-report')
+        startup_report = StartupReport()
+    
     app = QApplication(sys.argv)
     
     # 设置应用信息
     app.setApplicationName("Claude Code 配置管理器")
     app.setApplicationVersion("1.0.0")
     app.setOrganizationName("Claude Code Team")
+    if startup_report:
+        startup_report.mark("QApplication")
     
     # 创建主窗口
-    window = ClaudeConfigGUI()
+    window = ClaudeConfigGUI(startup_report)
+    if startup_report:
+        startup_report.mark("主窗口创建")
     window.show()
     
     # 运行应用
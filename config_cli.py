@@ -0,0 +1,893 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 配置管理器的命令行接口
+由 config_manager.py 调用；放在可导入的模块中，冷启动时可以使用 __pycache__ 中缓存的字节码。
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config_core import (KEY_STRATEGIES, MODELS_CACHE_TTL, PROBE_CACHE_TTL, STORAGE_BACKENDS,
+                         ConfigLockTimeout, ConfigManager, detect_shell, provider_keys)
+from tracing import start_tracing
+
+
+def command_name(argv: List[str]) -> Optional[str]:
+    """命令行中的子命令名称（跳过 --trace FILE），以选项开头（如 -h）时返回 None"""
+    index = 0
+    while index < len(argv):
+        arg = argv[index]
+        if arg == '--trace':
+            index += 2
+        elif arg.startswith('--trace='):
+            index += 1
+        elif arg.startswith('-'):
+            return None
+        else:
+            return arg
+    return None
+
+
+def _list_command(subparsers) -> argparse.ArgumentParser:
+    """列出提供商"""
+    list_parser = subparsers.add_parser('list', help='列出所有提供商')
+    list_parser.add_argument('--tag', help='只列出带有该标签的提供商')
+    return list_parser
+
+
+def _switch_command(subparsers) -> argparse.ArgumentParser:
+    """切换提供商"""
+    switch_parser = subparsers.add_parser('switch', help='切换提供商')
+    switch_parser.add_argument('provider', nargs='?', help='提供商ID')
+    switch_parser.add_argument('--fastest', action='store_true', help='根据最近的探测结果切换到最快的提供商')
+    switch_parser.add_argument('--dry-run', action='store_true', help='仅显示排名，不执行切换（配合 --fastest）')
+    switch_parser.add_argument('--no-env', action='store_true', help='只切换当前提供商，不修改环境变量（配合 serve 使用）')
+    return switch_parser
+
+
+def _add_command(subparsers) -> argparse.ArgumentParser:
+    """添加提供商"""
+    add_parser = subparsers.add_parser('add', help='添加提供商')
+    add_parser.add_argument('id', help='提供商ID')
+    add_parser.add_argument('name', help='提供商名称')
+    add_parser.add_argument('base_url', help='Base URL')
+    add_parser.add_argument('api_key', help='API Key')
+    add_parser.add_argument('--description', help='描述', default='')
+    return add_parser
+
+
+def _update_command(subparsers) -> argparse.ArgumentParser:
+    """更新提供商"""
+    update_parser = subparsers.add_parser('update', help='更新提供商')
+    update_parser.add_argument('id', help='提供商ID')
+    update_parser.add_argument('--name', help='提供商名称')
+    update_parser.add_argument('--base_url', help='Base URL')
+    update_parser.add_argument('--api_key', help='API Key')
+    update_parser.add_argument('--description', help='描述')
+    update_parser.add_argument('--key_strategy', choices=KEY_STRATEGIES, help='多个API Key时的选择策略')
+    update_parser.add_argument('--tags', help='标签，多个标签用逗号分隔（传入空字符串清除）')
+    return update_parser
+
+
+def _keys_command(subparsers) -> argparse.ArgumentParser:
+    """管理API Key池"""
+    keys_parser = subparsers.add_parser('keys', help='管理提供商的多个API Key')
+    keys_subparsers = keys_parser.add_subparsers(dest='keys_command', help='Key 操作')
+    keys_list_parser = keys_subparsers.add_parser('list', help='列出提供商的API Key')
+    keys_list_parser.add_argument('id', help='提供商ID')
+    keys_add_parser = keys_subparsers.add_parser('add', help='添加API Key')
+    keys_add_parser.add_argument('id', help='提供商ID')
+    keys_add_parser.add_argument('api_key', help='API Key')
+    keys_add_parser.add_argument('--weight', type=int, default=1, help='权重（轮询时按权重分配）')
+    keys_remove_parser = keys_subparsers.add_parser('remove', help='删除API Key')
+    keys_remove_parser.add_argument('id', help='提供商ID')
+    keys_remove_parser.add_argument('index', type=int, help='Key 序号（见 keys list）')
+    keys_limited_parser = keys_subparsers.add_parser('limited', help='标记API Key被限流（429）')
+    keys_limited_parser.add_argument('id', help='提供商ID')
+    keys_limited_parser.add_argument('index', type=int, help='Key 序号（见 keys list）')
+    keys_limited_parser.add_argument('--retry-after', type=float, help='冷却时间（秒）')
+    return keys_parser
+
+
+def _delete_command(subparsers) -> argparse.ArgumentParser:
+    """删除提供商"""
+    delete_parser = subparsers.add_parser('delete', help='删除提供商')
+    delete_parser.add_argument('id', help='提供商ID')
+    return delete_parser
+
+
+def _status_command(subparsers) -> argparse.ArgumentParser:
+    """显示当前状态"""
+    status_parser = subparsers.add_parser('status', help='显示当前状态')
+    return status_parser
+
+
+def _export_command(subparsers) -> argparse.ArgumentParser:
+    """导出配置"""
+    export_parser = subparsers.add_parser('export', help='导出配置')
+    export_parser.add_argument('file', help='导出文件路径')
+    export_parser.add_argument('--include-keys', action='store_true', help='包含API Keys')
+    export_parser.add_argument('--format', choices=['json', 'jsonl'],
+                               help='文件格式（默认按文件名判断，.jsonl / .ndjson 为每行一个提供商）')
+    export_parser.add_argument('--compress', choices=['gzip', 'xz'], help='压缩格式（默认按 .gz / .xz 后缀判断）')
+    export_parser.add_argument('--progress-every', type=int, default=10000, help='每导出多少条显示一次进度')
+    return export_parser
+
+
+def _import_command(subparsers) -> argparse.ArgumentParser:
+    """导入配置"""
+    import_parser = subparsers.add_parser('import', help='导入配置')
+    import_parser.add_argument('file', help='导入文件路径')
+    import_parser.add_argument('--merge', action='store_true', help='合并模式（保留现有配置）')
+    import_parser.add_argument('--force', action='store_true', help='强制覆盖冲突的提供商')
+    import_parser.add_argument('--format', choices=['json', 'jsonl'], help='文件格式（默认按文件名判断）')
+    import_parser.add_argument('--compress', choices=['gzip', 'xz'], help='压缩格式（默认按 .gz / .xz 后缀判断）')
+    import_parser.add_argument('--progress-every', type=int, default=10000, help='JSON Lines 导入时每处理多少条显示一次进度')
+    import_parser.add_argument('--dry-run', action='store_true', help='只显示与现有配置的差异，不写入')
+    import_parser.add_argument('--limit', type=int, default=20, help='--dry-run 时每类最多列出的提供商数量')
+    return import_parser
+
+
+def _history_command(subparsers) -> argparse.ArgumentParser:
+    """列出配置的历史版本"""
+    history_parser = subparsers.add_parser('history', help='列出配置的历史版本')
+    history_parser.add_argument('--limit', type=int, default=20, help='最多显示的版本数量（默认20）')
+    history_parser.add_argument('--keep', type=int, help='设置保留的版本数量并立即清理更早的版本（0 表示不再记录）')
+    return history_parser
+
+
+def _diff_command(subparsers) -> argparse.ArgumentParser:
+    """比较两个历史版本的提供商配置"""
+    diff_parser = subparsers.add_parser('diff', help='比较两个历史版本的提供商配置')
+    diff_parser.add_argument('rev', help='版本号（可以是前缀）、HEAD 或 HEAD~N')
+    diff_parser.add_argument('to', nargs='?', default='HEAD', help='比较的目标版本（默认当前版本 HEAD）')
+    diff_parser.add_argument('--limit', type=int, default=20, help='每类最多列出的提供商数量')
+    return diff_parser
+
+
+def _rollback_command(subparsers) -> argparse.ArgumentParser:
+    """回滚到历史版本（回滚本身也会记录为新版本）"""
+    rollback_parser = subparsers.add_parser('rollback', help='回滚到历史版本（回滚本身也会记录为新版本）')
+    rollback_parser.add_argument('rev', help='版本号（可以是前缀）、HEAD 或 HEAD~N')
+    rollback_parser.add_argument('--dry-run', action='store_true', help='只显示回滚会修改的提供商，不写入')
+    rollback_parser.add_argument('--limit', type=int, default=20, help='每类最多列出的提供商数量')
+    return rollback_parser
+
+
+def _probe_command(subparsers) -> argparse.ArgumentParser:
+    """延迟探测"""
+    probe_parser = subparsers.add_parser('probe', help='并发探测提供商延迟和可用性')
+    probe_parser.add_argument('providers', nargs='*', help='提供商ID（默认探测全部）')
+    probe_parser.add_argument('--samples', type=int, default=3, help='每个提供商的采样次数')
+    probe_parser.add_argument('--connect-timeout', type=float, default=3.0, help='连接/TLS超时（秒）')
+    probe_parser.add_argument('--timeout', type=float, default=10.0, help='首字节超时（秒）')
+    probe_parser.add_argument('--ttl', type=float, default=PROBE_CACHE_TTL, help='结果缓存有效期（秒）')
+    probe_parser.add_argument('--refresh', action='store_true', help='忽略缓存重新探测')
+    return probe_parser
+
+
+def _models_command(subparsers) -> argparse.ArgumentParser:
+    """模型列表"""
+    models_parser = subparsers.add_parser('models', help='查询提供商支持的模型列表（结果缓存，过期后按 ETag 验证）')
+    models_parser.add_argument('providers', nargs='*', help='提供商ID（默认查询全部已配置的提供商）')
+    models_parser.add_argument('--ttl', type=float, default=MODELS_CACHE_TTL, help='缓存有效期（秒）')
+    models_parser.add_argument('--refresh', action='store_true', help='忽略缓存有效期重新查询（仍会使用 ETag）')
+    models_parser.add_argument('--cached', action='store_true', help='只显示缓存，不发起网络请求')
+    models_parser.add_argument('--connect-timeout', type=float, default=5.0, help='连接/TLS超时（秒）')
+    models_parser.add_argument('--timeout', type=float, default=15.0, help='响应超时（秒）')
+    models_parser.add_argument('--limit', type=int, default=20, help='每个提供商最多列出的模型数量（0 表示全部）')
+    models_parser.add_argument('--json', action='store_true', help='以 JSON 格式输出结果')
+    return models_parser
+
+
+def _serve_command(subparsers) -> argparse.ArgumentParser:
+    """本地路由代理"""
+    serve_parser = subparsers.add_parser('serve', help='启动本地路由代理')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    serve_parser.add_argument('--port', type=int, default=8787, help='监听端口')
+    serve_parser.add_argument('--access-log', action='store_true', help='输出每个请求的耗时（含代理额外开销）')
+    serve_parser.add_argument('--fallback', default='', help='备用提供商ID列表（逗号分隔，按顺序故障转移/对冲）')
+    serve_parser.add_argument('--hedge-delay', type=float, default=3.0, help='首字节样本不足时的对冲等待时间（秒）')
+    return serve_parser
+
+
+def _shell_hook_command(subparsers) -> argparse.ArgumentParser:
+    """shell 环境文件钩子"""
+    hook_parser = subparsers.add_parser('shell-hook', help='在shell配置中安装一次source钩子，之后切换只重写环境文件')
+    hook_parser.add_argument('--rc', help='shell配置文件路径（默认根据 $SHELL 判断）')
+    hook_parser.add_argument('--uninstall', action='store_true', help='移除钩子，恢复直接写入shell配置文件')
+    return hook_parser
+
+
+def _print_env_command(subparsers) -> argparse.ArgumentParser:
+    """输出环境变量语句"""
+    print_env_parser = subparsers.add_parser('print-env', help='输出提供商的环境变量语句（配合 eval 使用，不写入文件）')
+    print_env_parser.add_argument('provider', help='提供商ID')
+    print_env_parser.add_argument('--shell', choices=['sh', 'fish'], help='输出语法（默认根据 $SHELL 判断）')
+    return print_env_parser
+
+
+def _exec_command(subparsers) -> argparse.ArgumentParser:
+    """使用指定提供商执行命令"""
+    exec_parser = subparsers.add_parser('exec', help='使用指定提供商执行命令（仅影响该进程，不写入任何文件）')
+    exec_parser.add_argument('provider', help='提供商ID')
+    exec_parser.add_argument('exec_command', nargs=argparse.REMAINDER, metavar='-- command ...',
+                             help='要执行的命令及其参数')
+    return exec_parser
+
+
+def _run_command(subparsers) -> argparse.ArgumentParser:
+    """多提供商并行执行任务"""
+    run_parser = subparsers.add_parser('run', help='把任务列表并行分派给多个提供商执行')
+    run_parser.add_argument('file', help='JSON Lines 格式的任务文件，使用 - 表示从标准输入读取')
+    run_parser.add_argument('--providers', help='提供商及其最大并发数，如 kimi:4,qwen:2（默认所有已配置的提供商，并发数为1）')
+    run_parser.add_argument('--command', dest='task_command', default='claude -p {prompt}',
+                            help='命令模板，{prompt} 和 {id} 会被替换（默认: claude -p {prompt}）')
+    run_parser.add_argument('--max-attempts', type=int, default=3, help='每个任务最多尝试次数（默认3）')
+    run_parser.add_argument('--timeout', type=float, help='单个任务的超时秒数')
+    run_parser.add_argument('--output-dir', help='把每个任务的输出保存到该目录下的 <id>.log（默认直接输出到终端）')
+    run_parser.add_argument('--failure-threshold', type=int, default=3,
+                            help='提供商连续失败多少次后暂停调度（默认3）')
+    run_parser.add_argument('--json', action='store_true', help='以 JSON Lines 格式输出任务状态')
+    return run_parser
+
+
+def _bench_command(subparsers) -> argparse.ArgumentParser:
+    """性能基准测试"""
+    bench_parser = subparsers.add_parser('bench', help='运行性能基准测试（在临时目录中进行，不影响现有配置）')
+    bench_parser.add_argument('--quick', action='store_true', help='只测试较小的规模（10/1k 个提供商，1KB/1MB 配置文件）')
+    bench_parser.add_argument('--output', help='把结果保存为 JSON 文件')
+    bench_parser.add_argument('--baseline', help='与之前保存的结果比较，出现回归时退出码为 1（冷启动超出预算时也为 1）')
+    bench_parser.add_argument('--threshold', type=float, default=0.10, help='判定为回归的变慢比例（默认 0.10）')
+    bench_parser.add_argument('--repeat', type=int, default=5, help='每个测试项的重复次数（默认5）')
+    bench_parser.add_argument('--only', help='只运行名称包含该字符串的测试项')
+    bench_parser.add_argument('--json', action='store_true', help='以 JSON 格式输出结果')
+    return bench_parser
+
+
+def _migrate_command(subparsers) -> argparse.ArgumentParser:
+    """存储后端迁移"""
+    migrate_parser = subparsers.add_parser('migrate', help='在 JSON 和 SQLite 存储后端之间迁移提供商配置')
+    migrate_parser.add_argument('backend', choices=STORAGE_BACKENDS, help='目标存储后端')
+    return migrate_parser
+
+
+def _daemon_command(subparsers) -> argparse.ArgumentParser:
+    """常驻切换守护进程"""
+    daemon_parser = subparsers.add_parser('daemon', help='运行常驻切换守护进程（加速 claude-switch）')
+    daemon_parser.add_argument('--stop', action='store_true', help='停止正在运行的守护进程')
+    daemon_parser.add_argument('--status', action='store_true', help='查看守护进程是否在运行')
+    return daemon_parser
+
+
+def _batch_command(subparsers) -> argparse.ArgumentParser:
+    """批量操作"""
+    batch_parser = subparsers.add_parser('batch', help='批量应用 JSON Lines 格式的操作')
+    batch_parser.add_argument('file', nargs='?', default='-', help='操作文件路径（默认从标准输入读取）')
+    batch_parser.add_argument('--atomic', action='store_true', help='任意操作失败时放弃全部修改')
+    return batch_parser
+
+
+# 子命令和构建其解析器的函数，顺序即帮助信息中的顺序
+COMMANDS = {
+    'list': _list_command,
+    'switch': _switch_command,
+    'add': _add_command,
+    'update': _update_command,
+    'keys': _keys_command,
+    'delete': _delete_command,
+    'status': _status_command,
+    'export': _export_command,
+    'import': _import_command,
+    'history': _history_command,
+    'diff': _diff_command,
+    'rollback': _rollback_command,
+    'probe': _probe_command,
+    'models': _models_command,
+    'serve': _serve_command,
+    'shell-hook': _shell_hook_command,
+    'print-env': _print_env_command,
+    'exec': _exec_command,
+    'run': _run_command,
+    'bench': _bench_command,
+    'migrate': _migrate_command,
+    'daemon': _daemon_command,
+    'batch': _batch_command,
+}
+
+
+def build_parser(command: Optional[str] = None) -> Tuple[argparse.ArgumentParser, Dict[str, argparse.ArgumentParser]]:
+    """构建命令行解析器，返回 (解析器, {子命令: 子命令解析器})
+
+    command 不为 None 时只构建该子命令，省去冷启动时构建其余子命令的时间；
+    command 不是已知的子命令时返回的子命令字典为空。
+    """
+    parser = argparse.ArgumentParser(description='Claude Code 配置管理器')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='记录各项操作和文件读写的耗时，退出时写入 Chrome trace JSON 文件')
+    subparsers = parser.add_subparsers(dest='command', help='可用命令')
+    parsers = {name: build(subparsers) for name, build in COMMANDS.items()
+               if command is None or name == command}
+    return parser, parsers
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行接口"""
+    argv = sys.argv[1:] if argv is None else argv
+    parser, parsers = build_parser(command_name(argv))
+    if not parsers:
+        # 没有子命令、-h 或未知的子命令：构建全部子命令，输出完整的帮助和错误信息
+        parser, parsers = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.trace:
+        start_tracing(args.trace)
+    
+    if not args.command:
+        parser.print_help()
+        return
+    
+    config_manager = ConfigManager()
+    
+    if args.command == 'list':
+        providers = config_manager.list_providers()
+        if args.tag is not None:
+            tagged = set(config_manager.find_providers(tag=args.tag))
+            providers = {pid: info for pid, info in providers.items() if pid in tagged}
+        print("可用的提供商:")
+        for provider_id, info in providers.items():
+            status = "✓ 当前" if info['is_current'] else ("○ 已配置" if info['is_configured'] else "× 未配置")
+            print(f"  {status} {provider_id}: {info['name']}")
+            if info.get('description'):
+                print(f"    {info['description']}")
+    
+    elif args.command == 'switch' and args.fastest:
+        ranking = config_manager.rank_providers()
+        print("提供商排名 (评分越低越好):")
+        for rank, item in enumerate(ranking, 1):
+            if item['score'] is None:
+                print(f"  {rank}. {item['id']}: 不可用")
+            else:
+                print(f"  {rank}. {item['id']}: 评分 {item['score']:.1f}  "
+                      f"延迟 {item['latency_ms']:.1f}ms  错误率 {item['error_rate']:.0%}  "
+                      f"(探测 {item['probes']} 次)")
+        
+        if not ranking or ranking[0]['score'] is None:
+            print("✗ 切换失败: 没有可用的提供商")
+            sys.exit(1)
+        
+        best = ranking[0]
+        if args.dry_run:
+            print(f"○ 最快的提供商: {best['name']} ({best['id']})（未切换）")
+        elif config_manager.switch_provider(best['id'], update_env=not args.no_env):
+            print(f"✓ 已切换到: {best['name']} ({best['id']})")
+        else:
+            print(f"✗ 切换失败: 提供商 '{best['id']}' 不存在或未配置")
+    
+    elif args.command == 'switch':
+        if not args.provider:
+            parsers['switch'].error("需要提供商ID，或使用 --fastest")
+        if config_manager.switch_provider(args.provider, update_env=not args.no_env):
+            provider_name = config_manager.get_provider(args.provider)['name']
+            print(f"✓ 已切换到: {provider_name}")
+        else:
+            print(f"✗ 切换失败: 提供商 '{args.provider}' 不存在或未配置")
+    
+    elif args.command == 'add':
+        config_manager.add_provider(args.id, args.name, args.base_url, args.api_key, args.description)
+        print(f"✓ 已添加提供商: {args.name}")
+    
+    elif args.command == 'update':
+        kwargs = {}
+        if args.name: kwargs['name'] = args.name
+        if args.base_url: kwargs['base_url'] = args.base_url
+        if args.api_key: kwargs['api_key'] = args.api_key
+        if args.description: kwargs['description'] = args.description
+        if args.key_strategy: kwargs['key_strategy'] = args.key_strategy
+        if args.tags is not None:
+            kwargs['tags'] = [tag.strip() for tag in args.tags.split(',') if tag.strip()]
+        
+        if config_manager.update_provider(args.id, **kwargs):
+            print(f"✓ 已更新提供商: {args.id}")
+        else:
+            print(f"✗ 更新失败: 提供商 '{args.id}' 不存在")
+    
+    elif args.command == 'keys':
+        if not args.keys_command:
+            parsers['keys'].print_help()
+            return
+        provider = config_manager.get_provider(args.id)
+        if provider is None:
+            print(f"✗ 提供商 '{args.id}' 不存在")
+            sys.exit(1)
+        keys = provider_keys(provider)
+        
+        if args.keys_command == 'list':
+            pool = config_manager.get_key_pool(args.id)
+            now = time.time()
+            print(f"{provider['name']} 的API Key（策略: {pool.strategy}）:")
+            if not keys:
+                print("  未设置")
+            for index, item in enumerate(pool.keys):
+                masked = item['key'][:8] + '*' * max(0, len(item['key']) - 8)
+                cooldown = pool.state[item['id']]['cooldown_until'] - now
+                status = f"冷却中 {cooldown:.0f}s" if cooldown > 0 else "可用"
+                print(f"  [{index}] {masked}  权重 {item['weight']}  {status}")
+        
+        elif args.keys_command == 'add':
+            try:
+                config_manager.add_api_key(args.id, args.api_key, args.weight)
+            except ValueError as e:
+                print(f"✗ {e}")
+                sys.exit(1)
+            print(f"✓ 已为 {args.id} 添加API Key（共 {len(provider_keys(config_manager.get_provider(args.id)))} 个）")
+        
+        elif args.keys_command == 'remove':
+            if config_manager.remove_api_key(args.id, args.index):
+                print(f"✓ 已删除 {args.id} 的第 {args.index} 个API Key")
+            else:
+                print(f"✗ 删除失败: 序号 {args.index} 不存在")
+                sys.exit(1)
+        
+        elif args.keys_command == 'limited':
+            if not 0 <= args.index < len(keys):
+                print(f"✗ 序号 {args.index} 不存在")
+                sys.exit(1)
+            config_manager.report_key_limited(args.id, keys[args.index]['key'], args.retry_after)
+            print(f"✓ 已标记 {args.id} 的第 {args.index} 个API Key为限流状态")
+    
+    elif args.command == 'delete':
+        if config_manager.delete_provider(args.id):
+            print(f"✓ 已删除提供商: {args.id}")
+        else:
+            print(f"✗ 删除失败: 提供商 '{args.id}' 不存在")
+    
+    elif args.command == 'status':
+        env_info = config_manager.get_current_env_info()
+        current = config_manager.get_provider(env_info['current_provider']) if env_info['current_provider'] else None
+        
+        print("当前状态:")
+        if current:
+            provider_name = current['name']
+            print(f"  当前提供商: {provider_name} ({env_info['current_provider']})")
+        else:
+            print("  当前提供商: 未设置")
+        
+        print(f"  Base URL: {env_info['base_url'] or '未设置'}")
+        print(f"  API Key: {'已设置' if env_info['api_key'] else '未设置'}")
+        print(f"  存储后端: {config_manager.storage}")
+    
+    elif args.command == 'export':
+        import provider_stream
+        
+        try:
+            if config_manager.count_providers() == 0:
+                print("✗ 没有可导出的配置")
+                return
+            
+            def on_progress(done, total):
+                if done % args.progress_every == 0:
+                    print(f"  已导出 {done}/{total}")
+            
+            provider_count = provider_stream.export_providers(
+                config_manager, args.file, include_keys=args.include_keys, fmt=args.format,
+                compression=args.compress, progress=on_progress, every=args.progress_every
+            )
+            keys_info = "包含API Keys" if args.include_keys else "不包含API Keys"
+            
+            print(f"✓ 成功导出 {provider_count} 个提供商配置")
+            print(f"✓ 文件位置: {args.file}")
+            print(f"✓ 导出选项: {keys_info}")
+            
+        except Exception as e:
+            print(f"✗ 导出失败: {str(e)}")
+    
+    elif args.command == 'import':
+        import json
+        import provider_stream
+        
+        try:
+            with provider_stream.ProviderReader(args.file, fmt=args.format, compression=args.compress) as reader:
+                # JSON 文档逐个显示处理结果，JSON Lines 按条数显示读取进度
+                verbose = reader.format == 'json'
+                
+                def on_read(count):
+                    if not verbose and count % args.progress_every == 0:
+                        percent = reader.position * 100 // max(1, reader.total_bytes)
+                        print(f"  已读取 {count} 条 ({percent}%)")
+                
+                def on_record(action, provider_id, provider):
+                    name = provider.get('name', provider_id)
+                    if verbose and args.merge and not args.dry_run:
+                        if action == 'skipped':
+                            print(f"○ 跳过已存在的提供商: {name}")
+                        elif action == 'changed':
+                            print(f"✓ 覆盖提供商: {name}")
+                        elif action == 'added':
+                            print(f"✓ 添加提供商: {name}")
+                
+                if not args.merge and not args.dry_run:
+                    print("⚠️  替换模式：删除导入文件中没有的提供商")
+                diff = config_manager.import_providers(
+                    reader, replace=not args.merge, overwrite=args.force or not args.merge,
+                    on_record=on_record, dry_run=args.dry_run, on_read=on_read
+                )
+            
+            if args.dry_run:
+                print(f"导入预览（{'合并' if args.merge else '替换'}模式，未写入任何修改）:")
+                print(diff.format(limit=args.limit))
+                return
+            
+            if not diff.has_changes:
+                print("✓ 配置没有变化，未写入文件")
+            else:
+                print(f"✓ 成功导入 {diff.imported} 个提供商配置"
+                      f"（新增 {len(diff.added)}，修改 {len(diff.changed)}，删除 {len(diff.removed)}，"
+                      f"未变化 {diff.unchanged}）")
+            if diff.skipped:
+                print(f"○ 跳过 {len(diff.skipped)} 个内容不同的已有提供商（使用 --force 覆盖）")
+            
+        except json.JSONDecodeError:
+            print("✗ 配置文件格式错误，请检查JSON格式")
+        except FileNotFoundError:
+            print(f"✗ 文件不存在: {args.file}")
+        except Exception as e:
+            print(f"✗ 导入失败: {str(e)}")
+    
+    elif args.command == 'history' and args.keep is not None:
+        pruned = config_manager.set_history_keep(args.keep)
+        if args.keep <= 0:
+            print("✓ 已停止记录历史版本（已有的版本保留在 history/ 目录中）")
+        else:
+            print(f"✓ 保留最近 {args.keep} 个版本，已清理 {pruned} 个旧版本")
+    
+    elif args.command in ('history', 'diff') and config_manager.history() is None:
+        print("✗ 历史记录未启用，使用 history --keep N 重新启用")
+        sys.exit(1)
+    
+    elif args.command == 'history':
+        from datetime import datetime
+        
+        entries = config_manager.history().entries()
+        if not entries:
+            print("没有历史版本（修改配置后开始记录）")
+            return
+        print(f"历史版本（共 {len(entries)} 个，最新的在前）:")
+        for index in range(len(entries) - 1, max(-1, len(entries) - 1 - args.limit), -1):
+            entry = entries[index]
+            previous = entries[index - 1] if index > 0 else None
+            parts = [entry['message']] if entry['message'] else []
+            counts = [f"{label} {entry[key]} 个" for label, key in (("写入", 'written'), ("删除", 'removed'))
+                      if entry[key]]
+            if counts:
+                more = entry['written'] + entry['removed'] > len(entry['ids'])
+                parts.append(f"{'，'.join(counts)}: {', '.join(entry['ids'])}{' 等' if more else ''}")
+            if previous is not None and entry['current'] != previous['current']:
+                parts.append(f"切换到 {entry['current'] or '（无）'}")
+            when = datetime.fromtimestamp(entry['time']).strftime('%Y-%m-%d %H:%M:%S')
+            head = " (HEAD)" if index == len(entries) - 1 else ""
+            print(f"  {entry['rev']}  {when}  {'；'.join(parts)}{head}")
+    
+    elif args.command == 'diff':
+        history = config_manager.history()
+        try:
+            old, new = history.resolve(args.rev), history.resolve(args.to)
+            old_manifest, old_current = history.manifest(old['rev'])
+            new_manifest, new_current = history.manifest(new['rev'])
+        except ValueError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        print(f"版本 {old['rev']} → {new['rev']}:")
+        print(history.diff(old_manifest, new_manifest).format(limit=args.limit))
+        if old_current != new_current:
+            print(f"当前提供商: {old_current or '（无）'} → {new_current or '（无）'}")
+    
+    elif args.command == 'rollback':
+        previous_current = config_manager.get_current_provider()
+        try:
+            entry, diff = config_manager.rollback(args.rev, dry_run=args.dry_run)
+        except (OSError, ValueError) as e:
+            print(f"✗ 回滚失败: {e}")
+            sys.exit(1)
+        if args.dry_run:
+            print(f"回滚到版本 {entry['rev']} 的预览（未写入任何修改）:")
+            print(diff.format(limit=args.limit))
+            return
+        current = config_manager.get_current_provider()
+        if not diff.has_changes and current == previous_current:
+            print(f"✓ 配置与版本 {entry['rev']} 相同，未写入文件")
+            return
+        print(f"✓ 已回滚到版本 {entry['rev']}"
+              f"（写入 {diff.imported} 个，删除 {len(diff.removed)} 个提供商）")
+        print(f"  当前提供商: {current or '（无）'}；环境变量未修改，需要时运行 switch 重新设置")
+    
+    elif args.command == 'probe':
+        providers = config_manager.list_providers()
+        unknown = [pid for pid in args.providers if pid not in providers]
+        if unknown:
+            print(f"✗ 提供商不存在: {', '.join(unknown)}")
+            sys.exit(1)
+        
+        results = config_manager.probe_providers(
+            args.providers or None, samples=args.samples,
+            connect_timeout=args.connect_timeout, timeout=args.timeout,
+            ttl=args.ttl, refresh=args.refresh
+        )
+        if not results:
+            print("✗ 没有可探测的提供商（需要配置 Base URL）")
+            return
+        
+        def fmt(value):
+            return f"{value:.1f}ms" if value is not None else "-"
+        
+        print("提供商延迟探测:")
+        for provider_id, result in sorted(results.items(), key=lambda item: (not item[1]['ok'], item[1]['p50_ms'] or 0)):
+            cached = " (缓存)" if result['cached'] else ""
+            if result['ok']:
+                print(f"  ✓ {provider_id}: p50 {fmt(result['p50_ms'])}  p95 {fmt(result['p95_ms'])}  "
+                      f"连接 {fmt(result['connect_ms'])}  TLS {fmt(result['tls_ms'])}  "
+                      f"首字节 {fmt(result['ttfb_p50_ms'])}  错误率 {result['error_rate']:.0%}{cached}")
+            else:
+                print(f"  ✗ {provider_id}: 不可达 ({result['last_error']}){cached}")
+    
+    elif args.command == 'models':
+        import json
+        from datetime import datetime
+        
+        providers = config_manager.list_providers()
+        unknown = [pid for pid in args.providers if pid not in providers]
+        if unknown:
+            print(f"✗ 提供商不存在: {', '.join(unknown)}")
+            sys.exit(1)
+        
+        if args.cached:
+            results = config_manager.cached_models()
+            if args.providers:
+                results = {pid: entry for pid, entry in results.items() if pid in args.providers}
+            results = {pid: {**entry, 'cached': True, 'not_modified': False} for pid, entry in results.items()}
+        else:
+            results = config_manager.discover_models(
+                args.providers or None, ttl=args.ttl, refresh=args.refresh,
+                connect_timeout=args.connect_timeout, timeout=args.timeout
+            )
+        if args.json:
+            print(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        if not results:
+            print("✗ 没有可查询的提供商（需要配置 Base URL 和 API Key）" if not args.cached else "✗ 没有缓存的模型列表")
+            return
+        
+        print("提供商模型列表:")
+        for provider_id, result in results.items():
+            models = result.get('models', [])
+            fetched = result.get('fetched_at')
+            fetched = f"，更新于 {datetime.fromtimestamp(fetched).strftime('%Y-%m-%d %H:%M')}" if fetched else ""
+            note = " (缓存)" if result['cached'] else " (未变化)" if result['not_modified'] else ""
+            if result.get('error'):
+                print(f"  ✗ {provider_id}: 查询失败 ({result['error']})"
+                      + (f"，以下为上次的结果{fetched}" if models else ""))
+            else:
+                print(f"  ✓ {provider_id}: {len(models)} 个模型{note}{fetched}")
+            shown = models if args.limit <= 0 else models[:args.limit]
+            for model in shown:
+                name = f" ({model['name']})" if model['name'] != model['id'] else ""
+                print(f"      {model['id']}{name}")
+            if len(models) > len(shown):
+                print(f"      ... 还有 {len(models) - len(shown)} 个")
+    
+    elif args.command == 'serve':
+        from routing_proxy import serve
+        
+        fallback = [pid.strip() for pid in args.fallback.split(',') if pid.strip()]
+        unknown = [pid for pid in fallback if not config_manager.get_provider(pid)]
+        if unknown:
+            print(f"✗ 提供商不存在: {', '.join(unknown)}")
+            sys.exit(1)
+        
+        def on_ready(server):
+            print(f"✓ 路由代理已启动: http://{args.host}:{args.port}")
+            print("  请将环境变量指向代理（只需设置一次）:")
+            print(f"    export ANTHROPIC_BASE_URL=http://{args.host}:{args.port}")
+            print("    export ANTHROPIC_AUTH_TOKEN=local-proxy")
+            print("  之后使用 switch --no-env 切换提供商即可立即生效")
+            if fallback:
+                print(f"  备用提供商: {', '.join(fallback)}")
+            sys.stdout.flush()
+        
+        try:
+            serve(config_manager, args.host, args.port, ready=on_ready, access_log=args.access_log,
+                  fallback=fallback, hedge_delay=args.hedge_delay)
+        except KeyboardInterrupt:
+            print("\n✓ 路由代理已停止")
+        except OSError as e:
+            print(f"✗ 启动路由代理失败: {e}")
+            sys.exit(1)
+    
+    elif args.command == 'run':
+        import json
+        from task_runner import load_tasks, parse_weights, run_tasks
+        
+        try:
+            if args.providers:
+                weights = parse_weights(args.providers)
+            else:
+                weights = {pid: 1 for pid, info in config_manager.list_providers().items()
+                           if info['is_configured']}
+            if args.file == '-':
+                tasks = load_tasks(sys.stdin)
+            else:
+                with open(args.file, 'r', encoding='utf-8') as f:
+                    tasks = load_tasks(f)
+        except FileNotFoundError:
+            print(f"✗ 文件不存在: {args.file}")
+            sys.exit(1)
+        except ValueError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        if not weights:
+            print("✗ 没有可用的提供商")
+            sys.exit(1)
+        
+        def on_event(event):
+            if args.json:
+                print(json.dumps(event, ensure_ascii=False))
+            elif event['event'] == 'start':
+                print(f"  ▶ {event['id']} → {event['provider']}（第 {event['attempt']} 次）")
+            elif event['event'] == 'done':
+                print(f"  ✓ {event['id']} {event['provider']} {event['duration_ms'] / 1000:.2f}s")
+            elif event['event'] == 'retry':
+                print(f"  ✗ {event['id']} {event['provider']} {event['error']}，重新排队")
+            elif event['event'] == 'failed':
+                print(f"  ✗ {event['id']} {event['provider']} {event['error']}，已放弃")
+            elif event['event'] == 'breaker_open':
+                print(f"  ! {event['provider']} 连续失败，暂停调度 {event['reset_timeout']:.0f} 秒")
+            sys.stdout.flush()
+        
+        try:
+            results = run_tasks(config_manager, tasks, weights, command=args.task_command,
+                                max_attempts=args.max_attempts, timeout=args.timeout,
+                                output_dir=Path(args.output_dir) if args.output_dir else None,
+                                failure_threshold=args.failure_threshold, on_event=on_event)
+        except KeyError as e:
+            print(f"✗ 提供商 '{e.args[0]}' 不存在或未配置")
+            sys.exit(1)
+        except ValueError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        
+        failed = [result for result in results if not result['ok']]
+        if not args.json:
+            print(f"{'✓' if not failed else '✗'} 共 {len(results)} 个任务，成功 {len(results) - len(failed)} 个，失败 {len(failed)} 个")
+        if failed:
+            sys.exit(1)
+    
+    elif args.command == 'bench':
+        try:
+            from benchmarks.suite import run_cli
+        except ImportError:
+            print("✗ 找不到 benchmarks 目录，请在源码目录中运行")
+            sys.exit(1)
+        sys.exit(run_cli(args.quick, args.output, args.baseline, args.threshold, args.repeat,
+                         args.only, args.json))
+    
+    elif args.command == 'shell-hook':
+        rc_file = Path(args.rc).expanduser() if args.rc else None
+        try:
+            if args.uninstall:
+                rc_file = config_manager.uninstall_env_hook(rc_file)
+                print(f"✓ 已从 {rc_file} 移除钩子，切换时将直接写入shell配置文件")
+            else:
+                rc_file = config_manager.install_env_hook(rc_file)
+                print(f"✓ 已在 {rc_file} 中安装钩子")
+                print(f"  之后切换提供商只会重写 {config_manager.env_file(detect_shell())}")
+        except OSError as e:
+            print(f"✗ 更新shell配置文件失败: {e}")
+            sys.exit(1)
+    
+    elif args.command == 'print-env':
+        exports = config_manager.render_env(args.provider, args.shell or detect_shell())
+        if exports is None:
+            print(f"✗ 提供商 '{args.provider}' 不存在或未配置", file=sys.stderr)
+            sys.exit(1)
+        sys.stdout.write(exports)
+    
+    elif args.command == 'exec':
+        command = args.exec_command
+        if command and command[0] == '--':
+            command = command[1:]
+        if not command:
+            print("✗ 请在 -- 之后指定要执行的命令", file=sys.stderr)
+            sys.exit(2)
+        try:
+            sys.exit(config_manager.exec_with_provider(args.provider, command))
+        except KeyError:
+            print(f"✗ 提供商 '{args.provider}' 不存在或未配置", file=sys.stderr)
+            sys.exit(1)
+        except OSError as e:
+            print(f"✗ 无法执行 {command[0]}: {e}", file=sys.stderr)
+            sys.exit(127)
+    
+    elif args.command == 'migrate':
+        previous = config_manager.storage
+        try:
+            count = config_manager.migrate_storage(args.backend)
+        except (OSError, ValueError) as e:
+            print(f"✗ 迁移失败: {e}")
+            sys.exit(1)
+        if previous == args.backend:
+            print(f"○ 已在使用 {args.backend} 存储后端（{count} 个提供商）")
+        else:
+            print(f"✓ 已将 {count} 个提供商从 {previous} 迁移到 {args.backend}")
+            print(f"  数据文件: {config_manager.storage_files[0]}")
+            print("  原数据文件保留不变；正在运行的守护进程和路由代理需要重启后生效")
+    
+    elif args.command == 'daemon':
+        from switch_daemon import default_socket_path, request_daemon, serve_daemon
+        
+        if args.stop or args.status:
+            response = request_daemon({'cmd': 'shutdown' if args.stop else 'ping'})
+            if response is None:
+                print("○ 守护进程未运行")
+            elif args.stop:
+                print("✓ 守护进程已停止")
+            else:
+                print(f"✓ 守护进程正在运行 (PID {response.get('pid')}): {default_socket_path()}")
+                lock = response.get('lock')
+                if lock:
+                    print(f"  配置锁: 获取 {lock['acquired']} 次，等待 {lock['contended']} 次，"
+                          f"累计等待 {lock['wait_ms_total']:.1f}ms，最长 {lock['wait_ms_max']:.1f}ms")
+            return
+        
+        def on_ready(path):
+            print(f"✓ 守护进程已启动: {path}")
+            print("  claude-switch 会自动通过守护进程执行，停止请运行: config_manager.py daemon --stop")
+            sys.stdout.flush()
+        
+        try:
+            serve_daemon(config_manager, ready=on_ready)
+        except KeyboardInterrupt:
+            print("\n✓ 守护进程已停止")
+        except OSError as e:
+            print(f"✗ 启动守护进程失败: {e}")
+            sys.exit(1)
+    
+    elif args.command == 'batch':
+        try:
+            if args.file == '-':
+                report = config_manager.apply_batch(sys.stdin, atomic=args.atomic)
+            else:
+                with open(args.file, 'r', encoding='utf-8') as f:
+                    report = config_manager.apply_batch(f, atomic=args.atomic)
+        except FileNotFoundError:
+            print(f"✗ 文件不存在: {args.file}")
+            sys.exit(1)
+        
+        for result in report['results']:
+            if result['ok']:
+                print(f"  ✓ 第 {result['line']} 行: {result['op']} {result['id']}")
+            else:
+                print(f"  ✗ 第 {result['line']} 行: {result['op'] or '-'} {result['id'] or '-'}: {result['error']}")
+        
+        if report['committed']:
+            print(f"✓ 已应用 {report['applied']} 个操作，失败 {report['failed']} 个")
+        else:
+            print(f"✗ 批量操作已取消: {report['failed']} 个操作失败，未写入任何修改")
+        if report['failed']:
+            sys.exit(1)
+
+
+def run():
+    """脚本入口，等待配置锁超时时输出错误并以 1 退出"""
+    try:
+        main()
+    except ConfigLockTimeout as e:
+        print(f"✗ {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,1648 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 配置管理器的核心库
+提供商配置的存储、切换、导入导出和环境变量管理；命令行接口见 config_cli。
+
+hashlib、tempfile、shlex、subprocess 等只在部分操作中用到的模块在使用处导入，以缩短命令行的冷启动时间。
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, NoReturn, Optional, Tuple
+
+from atomic_io import atomic_write
+from tracing import TRACE_ENV, span, stop_tracing, traced
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，配置锁为空操作
+    fcntl = None
+
+
+def _clone(value):
+    """复制解析后的 JSON 结构，避免调用方修改缓存中的数据"""
+    if isinstance(value, dict):
+        return {key: _clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clone(item) for item in value]
+    return value
+
+
+# 等待配置锁的最长时间（秒），可用环境变量 CLAUDE_CONFIG_LOCK_TIMEOUT 调整（0 表示一直等待）
+LOCK_TIMEOUT = 30.0
+LOCK_TIMEOUT_ENV = 'CLAUDE_CONFIG_LOCK_TIMEOUT'
+
+
+class ConfigLockTimeout(TimeoutError):
+    """等待配置锁超时：其他进程长时间持有锁（可能已经卡住）"""
+
+
+def _lock_timeout() -> float:
+    try:
+        return float(os.environ.get(LOCK_TIMEOUT_ENV, LOCK_TIMEOUT))
+    except ValueError:
+        return LOCK_TIMEOUT
+
+
+class ConfigLock:
+    """配置目录的跨进程读写锁（fcntl.flock）
+
+    读取时持有共享锁，多个进程可以同时读取；修改时持有排他锁，同一时间只有一个进程写入。
+    同一个对象可以重入：持有排他锁时可以再获取共享锁或排他锁；持有共享锁时不能再获取排他锁
+    （flock 的升级不是原子的），需要修改的操作应一开始就获取排他锁。对象不在线程之间共享，
+    每个 ConfigManager 使用自己的锁文件句柄。path 为 None 或没有 fcntl 时为空操作。
+
+    等待超过 timeout 秒时抛出 ConfigLockTimeout，一个卡住的进程不会让其他进程一直阻塞。
+    acquired / contended / wait_total / wait_max 记录获取锁的次数、需要等待的次数和等待时间。
+    """
+
+    def __init__(self, path: Optional[Path], timeout: Optional[float] = None):
+        self.path = path
+        self.timeout = _lock_timeout() if timeout is None else timeout
+        self.acquired = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._fd = None
+        self._mode = None
+        self._depth = 0
+
+    def shared(self):
+        return self._hold(fcntl.LOCK_SH if fcntl else None)
+
+    def exclusive(self):
+        return self._hold(fcntl.LOCK_EX if fcntl else None)
+
+    @contextmanager
+    def _hold(self, mode):
+        if mode is None or self.path is None:
+            yield
+            return
+        if self._depth:
+            if mode == fcntl.LOCK_EX and self._mode == fcntl.LOCK_SH:
+                raise RuntimeError("持有共享锁时不能获取排他锁")
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._release()
+            return
+
+        if self._fd is None:
+            self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o600)
+        start = time.perf_counter()
+        try:
+            fcntl.flock(self._fd, mode | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.contended += 1
+            with span('lock.wait', 'lock', mode='exclusive' if mode == fcntl.LOCK_EX else 'shared'):
+                self._wait(mode, start)
+        waited = time.perf_counter() - start
+        self.acquired += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self._mode = mode
+        self._depth = 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _wait(self, mode, start: float):
+        """等待其他进程释放锁，超过 timeout 秒时抛出 ConfigLockTimeout"""
+        if self.timeout <= 0:
+            fcntl.flock(self._fd, mode)
+            return
+        delay = 0.001
+        while True:
+            time.sleep(delay)
+            try:
+                fcntl.flock(self._fd, mode | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.perf_counter() - start >= self.timeout:
+                    raise ConfigLockTimeout(
+                        f"等待配置锁超过 {self.timeout:g} 秒，可能有其他进程卡住: {self.path}") from None
+                delay = min(delay * 2, 0.05)
+
+    def _release(self):
+        # 按持有次数计数，嵌套的持有不要求按获取的相反顺序释放（事务的锁在第一次读取时才获取）
+        self._depth -= 1
+        if not self._depth:
+            self._mode = None
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._fd is not None and not self._depth:
+            os.close(self._fd)
+            self._fd = None
+
+    def stats(self) -> Dict:
+        return {
+            'acquired': self.acquired,
+            'contended': self.contended,
+            'wait_ms_total': round(self.wait_total * 1000, 3),
+            'wait_ms_max': round(self.wait_max * 1000, 3)
+        }
+
+
+_NO_LOCK = ConfigLock(None)
+
+
+class CachedJsonFile:
+    """带 stat 签名校验的 JSON 文件缓存
+
+    仅当文件的 (mtime_ns, size, inode) 发生变化时才重新读取和解析，
+    其余情况直接返回内存中的文档。重新读取时持有共享锁，写入时持有排他锁。
+    """
+
+    def __init__(self, path: Path, lock: ConfigLock = _NO_LOCK):
+        self.path = path
+        self.lock = lock
+        self.hits = 0
+        self.misses = 0
+        self._signature = None
+        self._data = None
+
+    @staticmethod
+    def _signature_of(st) -> tuple:
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def read(self):
+        """读取文档，文件不存在或格式错误时返回 None（返回值只读）"""
+        try:
+            signature = self._signature_of(os.stat(self.path))
+        except FileNotFoundError:
+            self.invalidate()
+            return None
+
+        if signature == self._signature:
+            self.hits += 1
+            return self._data
+
+        self.misses += 1
+        try:
+            with self.lock.shared(), open(self.path, 'r', encoding='utf-8') as f, \
+                    span('json.load', 'io', path=self.path.name):
+                # 以实际读取的文件句柄为准，避免 stat 与 open 之间文件被替换
+                signature = self._signature_of(os.fstat(f.fileno()))
+                data = json.load(f)
+        except FileNotFoundError:
+            self.invalidate()
+            return None
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            data = None
+
+        self._signature = signature
+        self._data = data
+        return data
+
+    def write(self, data):
+        """原子写入文档（临时文件 + rename）并同步更新缓存"""
+        with span('json.dump', 'io', path=self.path.name):
+            text = json.dumps(data, ensure_ascii=False, indent=2)
+        with self.lock.exclusive():
+            atomic_write(self.path, text, mode=0o600)
+            self._signature = self._signature_of(os.stat(self.path))
+        self._data = _clone(data)
+
+    def invalidate(self):
+        """丢弃缓存，下次读取时重新解析"""
+        self._signature = None
+        self._data = None
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class JsonProviderStore:
+    """providers.json 存储：整个配置保存在一个 JSON 文件中，每次修改整体重写"""
+
+    def __init__(self, path: Path, lock: ConfigLock = _NO_LOCK):
+        self.path = path
+        self.files = [path]
+        self._file = CachedJsonFile(path, lock)
+
+    def read(self) -> Optional[Dict]:
+        """读取完整文档（返回值只读），文件不存在或格式错误时返回 None"""
+        data = self._file.read()
+        if not isinstance(data, dict) or 'providers' not in data:
+            return None
+        return data
+
+    def initialized(self) -> bool:
+        return self.read() is not None
+
+    def get(self, provider_id: str) -> Optional[Dict]:
+        data = self.read()
+        return data['providers'].get(provider_id) if data else None
+
+    def find(self, tag: Optional[str] = None, name: Optional[str] = None,
+             base_url: Optional[str] = None) -> List[str]:
+        data = self.read()
+        return _match_providers(data['providers'] if data else {}, tag, name, base_url)
+
+    def write(self, data: Dict):
+        self._file.write(data)
+
+    def apply(self, changes: Dict[str, Optional[Dict]]):
+        # 调用方持有排他锁（ConfigManager 的事务），读取和写入之间不会被其他进程修改
+        data = _clone(self.read())
+        for provider_id, provider in changes.items():
+            if provider is None:
+                data['providers'].pop(provider_id, None)
+            else:
+                data['providers'][provider_id] = provider
+        self._file.write(data)
+
+    def count(self) -> int:
+        data = self.read()
+        return len(data['providers']) if data else 0
+
+    def stats(self) -> Dict:
+        return self._file.stats()
+
+    def close(self):
+        # 每次读写都重新打开文件，没有需要释放的资源
+        pass
+
+
+def _match_providers(providers: Dict, tag: Optional[str] = None, name: Optional[str] = None,
+                     base_url: Optional[str] = None) -> List[str]:
+    """在内存中按 tag / name / base_url 过滤提供商"""
+    return [
+        provider_id for provider_id, provider in providers.items()
+        if (tag is None or tag in (provider.get('tags') or []))
+        and (name is None or provider.get('name') == name)
+        and (base_url is None or provider.get('base_url') == base_url)
+    ]
+
+
+# 提供商配置的存储后端
+STORAGE_BACKENDS = ('json', 'sqlite')
+
+_UNSET = object()
+
+# batch 子命令支持的操作及 update 允许修改的字段
+BATCH_OPERATIONS = ('add', 'update', 'delete', 'switch')
+PROVIDER_FIELDS = ('name', 'base_url', 'api_key', 'description', 'api_keys', 'key_strategy', 'tags')
+
+# 延迟探测结果的默认缓存有效期（秒）
+PROBE_CACHE_TTL = 300
+# 每个提供商保留的探测历史条数，以及滚动评分的半衰期（秒）
+PROBE_HISTORY_SIZE = 20
+PROBE_HALF_LIFE = 3600
+# 模型列表缓存的默认有效期（秒），过期后带 ETag 重新验证
+MODELS_CACHE_TTL = 6 * 3600
+
+# shell 环境文件模式：rc 文件中只安装一次 source 钩子，之后每次切换只重写环境文件
+SHELL_MODES = ('rc', 'env_file')
+ENV_HOOK_MARKER = '# Claude Code environment (managed by claude-config)'
+LEGACY_ENV_MARKER = '# Claude Code environment variables'
+
+
+def detect_shell() -> str:
+    """根据 $SHELL 判断环境文件语法（sh 或 fish）"""
+    return 'fish' if 'fish' in os.environ.get('SHELL', '') else 'sh'
+
+
+def format_env_exports(base_url: str, api_key: str, shell: str = 'sh') -> str:
+    """生成设置环境变量的 shell 语句，可直接 source 或 eval"""
+    variables = [('ANTHROPIC_BASE_URL', base_url), ('ANTHROPIC_AUTH_TOKEN', api_key)]
+    if shell == 'fish':
+        def quote(value):
+            return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+        return ''.join(f"set -gx {name} {quote(value)}\n" for name, value in variables)
+    import shlex
+    return ''.join(f"export {name}={shlex.quote(value)}\n" for name, value in variables)
+
+
+def _strip_legacy_env_block(lines: List[str]) -> List[str]:
+    """移除旧版直接写入 rc 文件的环境变量块"""
+    new_lines = []
+    skip_next = False
+    
+    for line in lines:
+        if LEGACY_ENV_MARKER in line:
+            skip_next = True
+            continue
+        elif skip_next and (line.startswith('export ANTHROPIC_') or line.strip() == ''):
+            if not line.startswith('export ANTHROPIC_'):
+                skip_next = False
+                new_lines.append(line)
+            continue
+        else:
+            skip_next = False
+            new_lines.append(line)
+    return new_lines
+
+
+def _write_rc_file(rc_file: Path, text: str):
+    """原子重写 rc 文件
+
+    rc 文件常由 dotfile 管理工具链接到其他位置，先解析符号链接再替换链接指向的文件，
+    不会把链接本身替换成普通文件。
+    """
+    target = rc_file.resolve()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(target, text)
+
+
+# API Key 池的选择策略，以及没有 retry-after 时 429 的默认冷却时间（秒）
+KEY_STRATEGIES = ('round_robin', 'least_limited')
+DEFAULT_KEY_COOLDOWN = 60
+
+
+def key_fingerprint(api_key: str) -> str:
+    """API Key 的指纹，用于记录状态而不保存明文"""
+    import hashlib
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+def provider_keys(provider: Dict) -> List[Dict]:
+    """提供商的全部 API Key，兼容只有 api_key 字段的旧格式"""
+    keys = [item for item in provider.get('api_keys') or [] if item.get('key')]
+    if not keys and provider.get('api_key'):
+        keys = [{'key': provider['api_key'], 'weight': 1}]
+    return keys
+
+
+def check_api_keys(keys) -> List[Dict]:
+    """检查 api_keys 字段（[{key, weight}] 列表），返回整理后的副本，不合法时抛出 ValueError"""
+    if not isinstance(keys, list):
+        raise ValueError("api_keys 必须是 [{key, weight}] 列表")
+    checked = []
+    for item in keys:
+        if not isinstance(item, dict) or not isinstance(item.get('key'), str) or not item['key']:
+            raise ValueError("api_keys 的每一项都需要非空的 key")
+        weight = item.get('weight', 1)
+        if isinstance(weight, bool) or not isinstance(weight, int) or weight < 1:
+            raise ValueError(f"API Key 的权重必须是正整数: {weight!r}")
+        checked.append({'key': item['key'], 'weight': weight})
+    return checked
+
+
+def check_provider_fields(fields: Dict) -> Dict:
+    """检查要更新的提供商字段中的 api_keys 和 key_strategy，返回整理后的副本"""
+    fields = dict(fields)
+    if 'api_keys' in fields:
+        fields['api_keys'] = check_api_keys(fields['api_keys'])
+    if 'key_strategy' in fields and fields['key_strategy'] not in KEY_STRATEGIES:
+        raise ValueError(f"未知的 Key 选择策略: {fields['key_strategy']!r}（可选: {', '.join(KEY_STRATEGIES)}）")
+    return fields
+
+
+class KeyPool:
+    """提供商的 API Key 池
+
+    round_robin: 平滑加权轮询，按权重把请求分散到各个 Key；
+    least_limited: 优先使用最久没有被限流的 Key，相同时使用最久未用的 Key。
+    返回 429 的 Key 会按 retry-after 冷却，冷却期间不会被选中（全部冷却时选最早恢复的）。
+    """
+
+    def __init__(self, keys: List[Dict], strategy: str = 'round_robin', state: Optional[Dict] = None):
+        self.strategy = strategy if strategy in KEY_STRATEGIES else 'round_robin'
+        self.keys = []
+        self.state = {}
+        state = state or {}
+        for item in keys:
+            fingerprint = key_fingerprint(item['key'])
+            self.keys.append({
+                'id': fingerprint,
+                'key': item['key'],
+                'weight': max(1, int(item.get('weight', 1)))
+            })
+            self.state[fingerprint] = {
+                'current': 0, 'cooldown_until': 0.0, 'limited_at': 0.0, 'used_at': 0.0,
+                **state.get(fingerprint, {})
+            }
+
+    def available(self, now: Optional[float] = None) -> List[Dict]:
+        """未处于冷却期的 Key"""
+        now = time.time() if now is None else now
+        return [item for item in self.keys if self.state[item['id']]['cooldown_until'] <= now]
+
+    def acquire(self, now: Optional[float] = None) -> Optional[str]:
+        """选择一个 Key，Key 池为空时返回 None"""
+        if not self.keys:
+            return None
+        now = time.time() if now is None else now
+        candidates = self.available(now)
+        
+        if not candidates:
+            chosen = min(self.keys, key=lambda item: self.state[item['id']]['cooldown_until'])
+        elif self.strategy == 'least_limited':
+            chosen = min(candidates, key=lambda item: (self.state[item['id']]['limited_at'],
+                                                       self.state[item['id']]['used_at']))
+        else:
+            total = sum(item['weight'] for item in candidates)
+            for item in candidates:
+                self.state[item['id']]['current'] += item['weight']
+            chosen = max(candidates, key=lambda item: self.state[item['id']]['current'])
+            self.state[chosen['id']]['current'] -= total
+        
+        self.state[chosen['id']]['used_at'] = now
+        return chosen['key']
+
+    def sample(self, now: Optional[float] = None) -> Optional[str]:
+        """不修改状态地选择一个 Key，Key 池为空时返回 None
+
+        供不保存状态的场景使用（exec / print-env）：在未冷却的 Key 中按权重随机选择，
+        least_limited 策略只在最久没有被限流的 Key 中选择，这样各个进程不会都使用第一个 Key。
+        """
+        if not self.keys:
+            return None
+        import random
+        now = time.time() if now is None else now
+        candidates = self.available(now)
+        if not candidates:
+            return min(self.keys, key=lambda item: self.state[item['id']]['cooldown_until'])['key']
+        if self.strategy == 'least_limited':
+            oldest = min(self.state[item['id']]['limited_at'] for item in candidates)
+            candidates = [item for item in candidates if self.state[item['id']]['limited_at'] == oldest]
+        return random.choices(candidates, weights=[item['weight'] for item in candidates])[0]['key']
+
+    def report_limited(self, api_key: str, retry_after: Optional[float] = None, now: Optional[float] = None):
+        """记录 Key 被限流（429），在 retry_after 秒内不再选择它"""
+        state = self.state.get(key_fingerprint(api_key))
+        if state is None:
+            return
+        now = time.time() if now is None else now
+        cooldown = retry_after if retry_after is not None else DEFAULT_KEY_COOLDOWN
+        state['cooldown_until'] = now + max(0.0, cooldown)
+        state['limited_at'] = now
+
+    def to_state(self) -> Dict:
+        return {fingerprint: dict(state) for fingerprint, state in self.state.items()}
+
+
+class _BatchAborted(Exception):
+    """原子批处理中出现失败时用于回滚事务"""
+
+
+class _Transaction:
+    """事务内的待提交状态"""
+
+    def __init__(self):
+        self.providers = None
+        # 未加载完整副本时，只记录修改过的提供商（None 表示删除）
+        self.changes = {}
+        self.providers_dirty = False
+        self.current = _UNSET
+        self.message = ''
+        # 第一次读取配置时获取的排他锁，事务结束时释放
+        self.locks = ExitStack()
+        self.locked = False
+
+
+def default_config_dir() -> Path:
+    """默认配置目录（只计算路径，不创建目录）"""
+    return Path.home() / ".claude_code_config"
+
+
+class ConfigManager:
+    @traced
+    def __init__(self, config_dir: Optional[Path] = None):
+        self.config_dir = Path(config_dir) if config_dir else default_config_dir()
+        self.config_file = self.config_dir / "providers.json"
+        self.current_config_file = self.config_dir / "current.json"
+        self.probe_cache_file = self.config_dir / "probe_cache.json"
+        self.models_cache_file = self.config_dir / "models_cache.json"
+        self.key_state_file = self.config_dir / "key_state.json"
+        self.settings_file = self.config_dir / "settings.json"
+        self.database_file = self.config_dir / "providers.db"
+        self.history_dir = self.config_dir / "history"
+        self.lock_file = self.config_dir / ".lock"
+        self.ensure_config_dir()
+        self._lock = ConfigLock(self.lock_file)
+        self._settings_store = CachedJsonFile(self.settings_file, self._lock)
+        self.storage = self.get_setting('storage', 'json')
+        self._providers_store = self._open_store(self.storage)
+        self._current_store = CachedJsonFile(self.current_config_file, self._lock)
+        self._probe_store = CachedJsonFile(self.probe_cache_file, self._lock)
+        self._models_store = CachedJsonFile(self.models_cache_file, self._lock)
+        self._key_state_store = CachedJsonFile(self.key_state_file, self._lock)
+        self._config_history = _UNSET
+        self._txn = None
+        
+    def ensure_config_dir(self):
+        """确保配置目录存在"""
+        self.config_dir.mkdir(parents=True, exist_ok=True)
+    
+    def close(self):
+        """关闭 SQLite 连接和锁文件句柄（之后继续使用时会重新打开）"""
+        self._providers_store.close()
+        self._lock.close()
+    
+    def _open_store(self, backend: str):
+        """打开指定后端的提供商存储"""
+        if backend == 'sqlite':
+            from sqlite_store import SqliteProviderStore
+            return SqliteProviderStore(self.database_file)
+        return JsonProviderStore(self.config_file, self._lock)
+    
+    @property
+    def storage_files(self) -> List[Path]:
+        """当前存储后端的数据文件（供 GUI 监听变化）"""
+        return list(self._providers_store.files)
+    
+    def _stored_providers(self) -> Dict:
+        """存储中的提供商配置，未初始化时为默认配置（只读）"""
+        data = self._providers_store.read()
+        return data if data is not None else self.get_default_providers()
+    
+    def _lock_transaction(self):
+        """事务第一次读取配置时获取排他锁，持有到提交完成
+
+        之后的读取-修改-写入不会被其他进程打断；只写入不读取的事务只在提交时加锁。
+        """
+        txn = self._txn
+        if txn is not None and not txn.locked:
+            txn.locks.enter_context(self._lock.exclusive())
+            txn.locked = True
+    
+    def _working_copy(self, txn: _Transaction) -> Dict:
+        """事务的完整工作副本，合并已记录的单个提供商修改"""
+        self._lock_transaction()
+        if txn.providers is None:
+            txn.providers = _clone(self._stored_providers())
+        if txn.changes:
+            for provider_id, provider in txn.changes.items():
+                if provider is None:
+                    txn.providers['providers'].pop(provider_id, None)
+                else:
+                    txn.providers['providers'][provider_id] = provider
+            txn.changes = {}
+        return txn.providers
+    
+    def _providers_view(self) -> Dict:
+        """返回缓存中的提供商配置（只读，调用方不得修改）"""
+        self._lock_transaction()
+        txn = self._txn
+        if txn is not None and (txn.providers is not None or txn.changes):
+            return self._working_copy(txn)
+        return self._stored_providers()
+    
+    def _read_provider(self, provider_id: str) -> Optional[Dict]:
+        """读取单个提供商（只读），SQLite 后端只查询对应的行"""
+        self._lock_transaction()
+        txn = self._txn
+        if txn is not None:
+            if txn.providers is not None:
+                return txn.providers['providers'].get(provider_id)
+            if provider_id in txn.changes:
+                return txn.changes[provider_id]
+        if not self._providers_store.initialized():
+            return self.get_default_providers()['providers'].get(provider_id)
+        return self._providers_store.get(provider_id)
+    
+    def _write_provider(self, provider_id: str, provider: Optional[Dict]):
+        """在事务中写入（provider 为 None 时删除）单个提供商"""
+        with self.transaction():
+            txn = self._txn
+            if txn.providers is not None:
+                if provider is None:
+                    txn.providers['providers'].pop(provider_id, None)
+                else:
+                    txn.providers['providers'][provider_id] = provider
+            else:
+                txn.changes[provider_id] = provider
+            txn.providers_dirty = True
+        
+    @traced
+    def load_providers(self) -> Dict:
+        """加载所有提供商配置
+
+        在事务中返回事务的工作副本，修改后调用 save_providers() 即可在提交时生效。
+        """
+        if self._txn is not None:
+            return self._working_copy(self._txn)
+        return _clone(self._stored_providers())
+    
+    @traced
+    def get_provider(self, provider_id: str) -> Optional[Dict]:
+        """获取单个提供商配置"""
+        provider = self._read_provider(provider_id)
+        return _clone(provider) if provider is not None else None
+    
+    def find_providers(self, tag: Optional[str] = None, name: Optional[str] = None,
+                       base_url: Optional[str] = None) -> List[str]:
+        """按标签、名称或 base_url 查找提供商ID（SQLite 后端使用索引）"""
+        self._lock_transaction()
+        txn = self._txn
+        if (txn is not None and (txn.providers is not None or txn.changes)) \
+                or not self._providers_store.initialized():
+            return _match_providers(self._providers_view()['providers'], tag, name, base_url)
+        return self._providers_store.find(tag, name, base_url)
+    
+    def iter_providers(self) -> Iterator[Tuple[str, Dict]]:
+        """按顺序逐个返回 (provider_id, provider)（只读），SQLite 后端逐行读取"""
+        self._lock_transaction()
+        txn = self._txn
+        if (txn is None or (txn.providers is None and not txn.changes)) \
+                and self._providers_store.initialized() and hasattr(self._providers_store, 'iter'):
+            return self._providers_store.iter()
+        return iter(self._providers_view()['providers'].items())
+    
+    def count_providers(self) -> int:
+        """提供商数量"""
+        self._lock_transaction()
+        txn = self._txn
+        if (txn is None or (txn.providers is None and not txn.changes)) \
+                and self._providers_store.initialized():
+            return self._providers_store.count()
+        return len(self._providers_view()['providers'])
+    
+    @traced
+    def import_providers(self, records: Iterable[Tuple[str, Dict]], replace: bool = False,
+                         overwrite: bool = True,
+                         on_record: Optional[Callable[[str, str, Dict], None]] = None,
+                         dry_run: bool = False,
+                         on_read: Optional[Callable[[int], None]] = None):
+        """导入提供商，返回 provider_stream.ImportDiff
+
+        先计算现有提供商的内容指纹，每条导入记录按指纹分为 added / changed / unchanged /
+        skipped（内容不同但 overwrite 为 False），替换模式下文件中没有的提供商为 removed。
+        只写入新增、修改和删除的提供商，没有任何变化时不写入文件；dry_run 为 True 时只计算差异。
+        
+        records 先被逐条读出并暂存到临时文件，读取期间不持有配置锁；on_read(已读取条数) 在每条
+        记录读取后调用，可用于显示进度，抛出异常即取消导入。之后才在锁内比较和写入，
+        on_record(action, provider_id, provider) 在每条记录分类后调用。全部修改一次性提交，
+        任何异常都会放弃全部修改。SQLite 后端逐条写入数据库，不需要把导入内容全部放进内存。
+        """
+        import tempfile
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+            with span('import.spool', 'io'):
+                count = 0
+                for provider_id, provider in records:
+                    spool.write(json.dumps([provider_id, provider], ensure_ascii=False) + '\n')
+                    count += 1
+                    if on_read:
+                        on_read(count)
+            spool.seek(0)
+            
+            # 比较和写入之间持有锁，差异不会因为其他进程的修改而过时
+            with self._lock.shared() if dry_run else self._lock.exclusive():
+                return self._import_spooled((json.loads(line) for line in spool), replace, overwrite,
+                                            on_record, dry_run)
+    
+    def _import_spooled(self, records, replace: bool, overwrite: bool, on_record, dry_run: bool):
+        """在锁内比较已暂存的导入记录并写入修改（见 import_providers）"""
+        from provider_stream import ImportDiff, provider_fingerprint
+        
+        current = {provider_id: provider_fingerprint(provider)
+                   for provider_id, provider in self.iter_providers()}
+        diff = ImportDiff()
+        seen = set()
+        
+        def changes():
+            for provider_id, provider in records:
+                seen.add(provider_id)
+                fingerprint = current.get(provider_id)
+                if fingerprint is None:
+                    action = 'added'
+                elif fingerprint == provider_fingerprint(provider):
+                    action = 'unchanged'
+                else:
+                    action = 'changed' if overwrite else 'skipped'
+                diff.record(action, provider_id)
+                if on_record:
+                    on_record(action, provider_id, provider)
+                if action in ('added', 'changed'):
+                    # 同一ID在导入文件中重复出现时以最后一条为准
+                    current[provider_id] = provider_fingerprint(provider)
+                    yield provider_id, provider
+            if replace:
+                for provider_id in [pid for pid in current if pid not in seen]:
+                    diff.record('removed', provider_id)
+                    yield provider_id, None
+        
+        if dry_run:
+            for _ in changes():
+                pass
+            return diff
+        
+        store = self._providers_store
+        if self._txn is None and hasattr(store, 'apply_stream') and store.initialized():
+            history = self._history_baseline()
+            recorded = {}
+            
+            def recording(stream):
+                # 逐条保存历史对象，只在内存中保留修改过的提供商ID
+                for provider_id, provider in stream:
+                    recorded[provider_id] = history.put(provider) if provider is not None else None
+                    yield provider_id, provider
+            
+            store.apply_stream(recording(changes()) if history is not None else changes())
+            if recorded:
+                self._record_history(history, "导入", changes=recorded)
+        else:
+            with self.transaction(message="导入"):
+                for provider_id, provider in changes():
+                    self._write_provider(provider_id, provider)
+        return diff
+    
+    def migrate_storage(self, backend: str) -> int:
+        """把提供商配置迁移到另一个存储后端并切换使用，返回迁移的提供商数量
+
+        原后端的数据文件保留不动，可作为备份。
+        """
+        if backend not in STORAGE_BACKENDS:
+            raise ValueError(f"未知的存储后端: {backend}")
+        if self._txn is not None:
+            raise RuntimeError("不能在事务中迁移存储")
+        with self._lock.exclusive():
+            data = _clone(self._stored_providers())
+            if backend != self.storage:
+                store = self._open_store(backend)
+                store.write(data)
+                self.set_setting('storage', backend)
+                self.storage = backend
+                self._providers_store = store
+        return len(data['providers'])
+    
+    @contextmanager
+    def transaction(self, message: str = ''):
+        """批量修改事务
+
+        事务内的所有修改都作用于同一份内存副本，正常退出时一次性原子写入，
+        发生异常则放弃全部修改。嵌套调用会并入最外层事务。
+        每次提交记录为一个历史版本，message 为版本说明。
+        
+        事务第一次读取配置时才获取配置目录的排他锁，持有到提交完成，读取-修改-写入之间不会
+        丢失其他进程的修改；只写入的事务只在提交时加锁。事务内只应进行配置的读取和修改，
+        读取输入文件、网络请求等耗时操作应在进入事务之前完成，否则其他进程会一直等待。
+        等待锁超时时抛出 ConfigLockTimeout，不写入任何修改。
+
+        用法:
+            with config_manager.transaction():
+                config_manager.add_provider(...)
+                config_manager.delete_provider(...)
+        """
+        if self._txn is not None:
+            if message and not self._txn.message:
+                self._txn.message = message
+            yield self
+            return
+
+        txn = self._txn = _Transaction()
+        txn.message = message
+        with txn.locks:
+            try:
+                yield self
+            finally:
+                self._txn = None
+            if txn.providers_dirty or txn.current is not _UNSET:
+                with self._lock.exclusive():
+                    self._commit(txn)
+    
+    @traced
+    def _commit(self, txn: _Transaction):
+        """将事务中的修改写入磁盘，并记录为历史版本"""
+        if not txn.providers_dirty and txn.current is _UNSET:
+            return
+        history = self._history_baseline()
+        changes = providers = None
+        if txn.providers_dirty:
+            if txn.providers is None and self._providers_store.initialized():
+                self._providers_store.apply(txn.changes)
+                changes = txn.changes
+            else:
+                providers = self._working_copy(txn)
+                self._providers_store.write(providers)
+        if txn.current is not _UNSET:
+            self._current_store.write({'current_provider': txn.current})
+        
+        if history is not None:
+            if changes is not None:
+                changes = {provider_id: history.put(provider) if provider is not None else None
+                           for provider_id, provider in changes.items()}
+            self._record_history(history, txn.message, changes=changes, providers=providers,
+                                 current=None if txn.current is _UNSET else txn.current)
+    
+    def history(self):
+        """配置的历史版本记录（config_history.ConfigHistory），settings.json 中 history_keep 为 0 时返回 None"""
+        if self._config_history is _UNSET:
+            from config_history import ConfigHistory, HISTORY_KEEP
+            keep = self.get_setting('history_keep', HISTORY_KEEP)
+            self._config_history = ConfigHistory(self.history_dir, keep) if keep > 0 else None
+        return self._config_history
+    
+    def set_history_keep(self, keep: int) -> int:
+        """设置保留的历史版本数量并立即清理更早的版本，返回清理的版本数量；0 表示不再记录"""
+        with self._lock.exclusive():
+            self.set_setting('history_keep', max(0, keep))
+            self._config_history = _UNSET
+            history = self.history()
+            return history.prune() if history is not None else 0
+    
+    def _history_baseline(self):
+        """返回历史版本记录；还没有任何版本时先把写入前的配置记录为初始版本"""
+        history = self.history()
+        if history is not None and history.empty():
+            try:
+                history.commit_providers(self.iter_providers(), self.get_current_provider() or '', "初始版本")
+            except OSError as e:
+                print(f"⚠️  记录历史版本失败: {e}", file=sys.stderr)
+                return None
+        return history
+    
+    def _record_history(self, history, message: str, changes: Optional[Dict[str, Optional[str]]] = None,
+                        providers: Optional[Dict] = None, current: Optional[str] = None):
+        """记录已提交的修改（changes 为 {provider_id: 对象ID}，providers 为整体写入的完整配置）
+
+        配置已经写入，记录历史失败时只给出警告。
+        """
+        try:
+            if providers is not None:
+                history.commit_providers(providers['providers'].items(), current, message)
+            else:
+                history.commit(changes or {}, current, message)
+        except OSError as e:
+            print(f"⚠️  记录历史版本失败: {e}", file=sys.stderr)
+    
+    @traced
+    def rollback(self, rev: str, dry_run: bool = False):
+        """回滚到历史版本，返回 (版本摘要, provider_stream.ImportDiff)
+
+        只比较版本清单，只读取和写入与当前版本不同的提供商；回滚本身也记录为一个新版本，
+        可以再次回滚。dry_run 为 True 时只计算差异。
+        """
+        history = self.history()
+        if history is None:
+            raise ValueError("历史记录未启用（settings.json 中 history_keep 为 0）")
+        if self._txn is not None:
+            raise RuntimeError("不能在事务中回滚")
+        with self._lock.shared() if dry_run else self._lock.exclusive():
+            entry = history.resolve(rev)
+            target, current = history.manifest(entry['rev'])
+            head, head_current = history.manifest(history.head()['rev'])
+            diff = history.diff(head, target)
+            if not dry_run:
+                with self.transaction(message=f"回滚到 {entry['rev']}"):
+                    for provider_id in diff.added + diff.changed:
+                        self._write_provider(provider_id, history.get(target[provider_id]))
+                    for provider_id in diff.removed:
+                        self._write_provider(provider_id, None)
+                    if current != head_current:
+                        self.set_current_provider(current)
+        return entry, diff
+    
+    def get_setting(self, key: str, default=None):
+        """读取 settings.json 中的设置项"""
+        settings = self._settings_store.read()
+        if not isinstance(settings, dict):
+            return default
+        return settings.get(key, default)
+    
+    def set_setting(self, key: str, value):
+        """写入 settings.json 中的设置项"""
+        with self._lock.exclusive():
+            settings = self._settings_store.read()
+            settings = dict(settings) if isinstance(settings, dict) else {}
+            settings[key] = value
+            self._settings_store.write(settings)
+    
+    def lock_stats(self) -> Dict:
+        """本进程获取配置锁的次数、需要等待的次数和等待时间（毫秒）"""
+        return self._lock.stats()
+    
+    def cache_stats(self) -> Dict:
+        """获取配置缓存命中统计"""
+        return {
+            'providers': self._providers_store.stats(),
+            'current': self._current_store.stats()
+        }
+    
+    def get_default_providers(self) -> Dict:
+        """获取默认提供商配置"""
+        return {
+            "providers": {
+                "qwen": {
+                    "name": "阿里云通义千问",
+                    "base_url": "https://dashscope.aliyuncs.com/api/v2/apps/claude-code-proxy",
+                    "api_key": "",
+                    "description": "阿里云通义千问系列模型"
+                },
+                "kimi": {
+                    "name": "Kimi (月之暗面)",
+                    "base_url": "https://api.moonshot.cn/anthropic/",
+                    "api_key": "",
+                    "description": "月之暗面 Kimi 模型"
+                },
+                "zhipu": {
+                    "name": "智谱 GLM-4.5",
+                    "base_url": "https://open.bigmodel.cn/api/anthropic",
+                    "api_key": "",
+                    "description": "智谱 AI GLM-4.5 模型"
+                },
+                "custom": {
+                    "name": "自定义提供商",
+                    "base_url": "",
+                    "api_key": "",
+                    "description": "自定义 API 提供商"
+                }
+            }
+        }
+    
+    @traced
+    def save_providers(self, providers: Dict):
+        """保存提供商配置"""
+        with self.transaction():
+            self._txn.providers = providers
+            self._txn.changes = {}
+            self._txn.providers_dirty = True
+    
+    @traced
+    def get_current_provider(self) -> Optional[str]:
+        """获取当前激活的提供商"""
+        if self._txn is not None and self._txn.current is not _UNSET:
+            return self._txn.current
+        self._lock_transaction()
+        data = self._current_store.read()
+        if not isinstance(data, dict):
+            return None
+        return data.get('current_provider')
+    
+    @traced
+    def set_current_provider(self, provider_id: str):
+        """设置当前激活的提供商"""
+        with self.transaction():
+            self._txn.current = provider_id
+    
+    @traced
+    def add_provider(self, provider_id: str, name: str, base_url: str, api_key: str, description: str = ""):
+        """添加新的提供商配置"""
+        self._write_provider(provider_id, {
+            'name': name,
+            'base_url': base_url,
+            'api_key': api_key,
+            'description': description
+        })
+    
+    @traced
+    def update_provider(self, provider_id: str, **kwargs):
+        """更新提供商配置，api_keys 或 key_strategy 不合法时抛出 ValueError"""
+        kwargs = check_provider_fields(kwargs)
+        with self.transaction():
+            provider = self._read_provider(provider_id)
+            if provider is None:
+                return False
+            provider = _clone(provider)
+            # 已使用 Key 池时，更新 api_key 等同于替换主 Key
+            if 'api_key' in kwargs and 'api_keys' not in kwargs and provider.get('api_keys'):
+                provider['api_keys'][0]['key'] = kwargs['api_key']
+            # 替换 Key 池时主 Key 随之变为第一个 Key
+            if 'api_keys' in kwargs and 'api_key' not in kwargs:
+                kwargs['api_key'] = kwargs['api_keys'][0]['key'] if kwargs['api_keys'] else ''
+            provider.update(kwargs)
+            self._write_provider(provider_id, provider)
+        return True
+    
+    @traced
+    def add_api_key(self, provider_id: str, api_key: str, weight: int = 1) -> bool:
+        """为提供商添加一个 API Key（已存在时更新权重），Key 为空或权重不是正整数时抛出 ValueError"""
+        check_api_keys([{'key': api_key, 'weight': weight}])
+        with self.transaction():
+            provider = self._read_provider(provider_id)
+            if provider is None:
+                return False
+            provider = _clone(provider)
+            keys = provider_keys(provider)
+            for item in keys:
+                if item['key'] == api_key:
+                    item['weight'] = weight
+                    break
+            else:
+                keys.append({'key': api_key, 'weight': weight})
+            provider['api_keys'] = keys
+            provider['api_key'] = keys[0]['key']
+            self._write_provider(provider_id, provider)
+        return True
+    
+    @traced
+    def remove_api_key(self, provider_id: str, index: int) -> bool:
+        """按序号删除提供商的 API Key"""
+        with self.transaction():
+            provider = self._read_provider(provider_id)
+            if provider is None:
+                return False
+            provider = _clone(provider)
+            keys = provider_keys(provider)
+            if not 0 <= index < len(keys):
+                return False
+            del keys[index]
+            provider['api_keys'] = keys
+            provider['api_key'] = keys[0]['key'] if keys else ''
+            self._write_provider(provider_id, provider)
+        return True
+    
+    @traced
+    def get_key_pool(self, provider_id: str) -> Optional[KeyPool]:
+        """获取提供商的 Key 池（带持久化的轮询和冷却状态）"""
+        provider = self._read_provider(provider_id)
+        if provider is None:
+            return None
+        states = self._key_state_store.read()
+        state = states.get(provider_id) if isinstance(states, dict) else None
+        return KeyPool(provider_keys(provider), provider.get('key_strategy', 'round_robin'), state)
+    
+    @traced
+    def save_key_pool(self, provider_id: str, pool: KeyPool):
+        """保存 Key 池状态（只有一个 Key 时无需记录）"""
+        if len(pool.keys) < 2:
+            return
+        with self._lock.exclusive():
+            states = self._key_state_store.read()
+            states = dict(states) if isinstance(states, dict) else {}
+            states[provider_id] = pool.to_state()
+            self._key_state_store.write(states)
+    
+    @traced
+    def acquire_api_key(self, provider_id: str) -> Optional[str]:
+        """从 Key 池中为提供商选择一个 API Key
+
+        读取和保存轮询状态之间持有排他锁，并发切换的进程不会选中同一个位置。
+        """
+        with self._lock.exclusive():
+            pool = self.get_key_pool(provider_id)
+            if pool is None:
+                return None
+            api_key = pool.acquire()
+            self.save_key_pool(provider_id, pool)
+        return api_key
+    
+    def report_key_limited(self, provider_id: str, api_key: str, retry_after: Optional[float] = None):
+        """记录某个 Key 被限流，冷却期间不会被选中"""
+        with self._lock.exclusive():
+            pool = self.get_key_pool(provider_id)
+            if pool is not None:
+                pool.report_limited(api_key, retry_after)
+                self.save_key_pool(provider_id, pool)
+    
+    @traced
+    def delete_provider(self, provider_id: str):
+        """删除提供商配置"""
+        with self.transaction():
+            if self._read_provider(provider_id) is not None:
+                self._write_provider(provider_id, None)
+                
+                # 如果删除的是当前提供商，清除当前设置
+                if self.get_current_provider() == provider_id:
+                    self.set_current_provider("")
+                return True
+        return False
+    
+    @traced
+    def switch_provider(self, provider_id: str, update_env: bool = True) -> bool:
+        """切换到指定提供商
+
+        update_env 为 False 时只更新当前提供商，不修改环境变量和shell配置（配合本地路由代理使用）。
+        """
+        provider = self._read_provider(provider_id)
+        if provider is None:
+            return False
+            
+        if not provider_keys(provider) or not provider['base_url']:
+            return False
+        
+        # 设置环境变量
+        if update_env:
+            self.set_environment_variables(provider['base_url'], self.acquire_api_key(provider_id))
+        
+        # 保存当前提供商
+        self.set_current_provider(provider_id)
+        
+        return True
+    
+    @traced
+    def set_environment_variables(self, base_url: str, api_key: str):
+        """设置环境变量"""
+        if sys.platform == "win32":
+            self._set_windows_env(base_url, api_key)
+        else:
+            self._set_unix_env(base_url, api_key)
+    
+    @traced
+    def _set_windows_env(self, base_url: str, api_key: str):
+        """设置Windows环境变量"""
+        import subprocess
+        try:
+            # 设置用户环境变量（永久）
+            with span('setx ANTHROPIC_BASE_URL', 'subprocess'):
+                subprocess.run(['setx', 'ANTHROPIC_BASE_URL', base_url], check=True, capture_output=True)
+            with span('setx ANTHROPIC_AUTH_TOKEN', 'subprocess'):
+                subprocess.run(['setx', 'ANTHROPIC_AUTH_TOKEN', api_key], check=True, capture_output=True)
+            
+            # 设置当前会话环境变量
+            os.environ['ANTHROPIC_BASE_URL'] = base_url
+            os.environ['ANTHROPIC_AUTH_TOKEN'] = api_key
+            
+        except subprocess.CalledProcessError as e:
+            print(f"设置Windows环境变量失败: {e}")
+    
+    @traced
+    def _set_unix_env(self, base_url: str, api_key: str):
+        """设置Unix/Linux/macOS环境变量"""
+        # 设置当前会话环境变量
+        os.environ['ANTHROPIC_BASE_URL'] = base_url
+        os.environ['ANTHROPIC_AUTH_TOKEN'] = api_key
+        
+        # 并发切换时 rc 文件的读取和重写之间不能被其他进程修改
+        with self._lock.exclusive():
+            # 已安装 source 钩子时只需重写小的环境文件
+            if self.get_setting('shell_mode') == 'env_file':
+                self.write_env_files(base_url, api_key)
+                return
+            
+            # 更新shell配置文件
+            self._update_shell_config(self._shell_rc_file(), base_url, api_key)
+    
+    def _shell_rc_file(self) -> Path:
+        """当前 shell 的配置文件"""
+        shell = os.environ.get('SHELL', '/bin/bash')
+        if 'zsh' in shell:
+            return Path.home() / '.zshrc'
+        elif 'fish' in shell:
+            return Path.home() / '.config' / 'fish' / 'config.fish'
+        return Path.home() / '.bashrc'
+    
+    @traced
+    def _update_shell_config(self, rc_file: Path, base_url: str, api_key: str):
+        """更新shell配置文件"""
+        try:
+            # 读取现有内容
+            content = ""
+            if rc_file.exists():
+                with open(rc_file, 'r', encoding='utf-8') as f, span('read_rc', 'io', path=str(rc_file)):
+                    content = f.read()
+            
+            # 移除旧的Claude Code配置
+            new_lines = _strip_legacy_env_block(content.split('\n'))
+            
+            # 添加新的配置
+            new_lines.extend([
+                '',
+                LEGACY_ENV_MARKER,
+                f'export ANTHROPIC_BASE_URL={base_url}',
+                f'export ANTHROPIC_AUTH_TOKEN={api_key}'
+            ])
+            
+            # 写入文件
+            _write_rc_file(rc_file, '\n'.join(new_lines))
+                
+        except Exception as e:
+            print(f"更新shell配置文件失败: {e}")
+    
+    def env_file(self, shell: str = 'sh') -> Path:
+        """环境文件路径（env.sh 供 bash/zsh，env.fish 供 fish）"""
+        return self.config_dir / ('env.fish' if shell == 'fish' else 'env.sh')
+    
+    @traced
+    def write_env_files(self, base_url: str, api_key: str):
+        """原子重写各个 shell 的环境文件"""
+        for shell in ('sh', 'fish'):
+            atomic_write(self.env_file(shell), format_env_exports(base_url, api_key, shell), mode=0o600)
+    
+    def _env_hook_lines(self, rc_file: Path) -> List[str]:
+        """rc 文件中的 source 钩子"""
+        import shlex
+        if rc_file.suffix == '.fish':
+            path = shlex.quote(str(self.env_file('fish')))
+            return [ENV_HOOK_MARKER, f"test -f {path}; and source {path}"]
+        path = shlex.quote(str(self.env_file('sh')))
+        return [ENV_HOOK_MARKER, f"[ -f {path} ] && . {path}"]
+    
+    @traced
+    def install_env_hook(self, rc_file: Optional[Path] = None) -> Path:
+        """在 rc 文件中安装一次 source 钩子，并切换到环境文件模式
+
+        同时移除旧版写入的环境变量块；之后的切换只重写环境文件，不再改动 rc 文件。
+        """
+        rc_file = rc_file or self._shell_rc_file()
+        with self._lock.exclusive():
+            content = ""
+            if rc_file.exists():
+                with open(rc_file, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            
+            lines = _strip_legacy_env_block(content.split('\n'))
+            if ENV_HOOK_MARKER not in lines:
+                while lines and not lines[-1].strip():
+                    lines.pop()
+                if lines:
+                    lines.append('')
+                lines.extend(self._env_hook_lines(rc_file) + [''])
+            
+            _write_rc_file(rc_file, '\n'.join(lines))
+            self.set_setting('shell_mode', 'env_file')
+            
+            # 为当前提供商生成环境文件
+            current = self.get_current_provider()
+            provider = self.get_provider(current) if current else None
+            if provider and provider_keys(provider):
+                self.write_env_files(provider['base_url'], self.acquire_api_key(current))
+        return rc_file
+    
+    @traced
+    def uninstall_env_hook(self, rc_file: Optional[Path] = None) -> Path:
+        """移除 source 钩子，恢复为直接写入 rc 文件的模式"""
+        rc_file = rc_file or self._shell_rc_file()
+        with self._lock.exclusive():
+            if rc_file.exists():
+                with open(rc_file, 'r', encoding='utf-8') as f:
+                    lines = f.read().split('\n')
+                new_lines = []
+                skip_next = False
+                for line in lines:
+                    if line == ENV_HOOK_MARKER:
+                        skip_next = True
+                        continue
+                    if skip_next:
+                        skip_next = False
+                        continue
+                    new_lines.append(line)
+                while new_lines and not new_lines[-1].strip():
+                    new_lines.pop()
+                _write_rc_file(rc_file, '\n'.join(new_lines + ['']))
+            self.set_setting('shell_mode', 'rc')
+        return rc_file
+    
+    @traced
+    def provider_env(self, provider_id: str) -> Optional[Dict[str, str]]:
+        """在内存中解析提供商的环境变量，不写入任何文件
+
+        不修改 current.json、shell 配置和 Key 池状态，可供多个进程并发使用不同的提供商；
+        有多个 Key 时每次按权重随机选择（见 KeyPool.sample）。
+        """
+        provider = self._read_provider(provider_id)
+        if not provider or not provider.get('base_url') or not provider_keys(provider):
+            return None
+        return {
+            'ANTHROPIC_BASE_URL': provider['base_url'],
+            'ANTHROPIC_AUTH_TOKEN': self.get_key_pool(provider_id).sample()
+        }
+    
+    def render_env(self, provider_id: str, shell: str = 'sh') -> Optional[str]:
+        """生成指定提供商的环境变量语句，不写入任何文件（用于 eval）"""
+        env = self.provider_env(provider_id)
+        if env is None:
+            return None
+        return format_env_exports(env['ANTHROPIC_BASE_URL'], env['ANTHROPIC_AUTH_TOKEN'], shell)
+    
+    def _exec_env(self, provider_id: str) -> Dict[str, str]:
+        """当前环境加上提供商的环境变量，提供商不存在或未配置时抛出 KeyError"""
+        provider_env = self.provider_env(provider_id)
+        if provider_env is None:
+            raise KeyError(provider_id)
+        env = dict(os.environ)
+        # exec 后进程号不变，继承追踪变量的命令会覆盖本进程的 trace 文件
+        env.pop(TRACE_ENV, None)
+        env.update(provider_env)
+        return env
+    
+    if os.name == 'nt':
+        def exec_with_provider(self, provider_id: str, command: List[str]) -> int:
+            """使用指定提供商的环境变量执行命令，不写入任何文件
+
+            Windows 没有 exec：等待子进程结束并返回退出码。提供商不存在或未配置时抛出 KeyError。
+            """
+            import subprocess
+            return subprocess.call(command, env=self._exec_env(provider_id))
+    else:
+        def exec_with_provider(self, provider_id: str, command: List[str]) -> NoReturn:
+            """使用指定提供商的环境变量执行命令，不写入任何文件
+
+            exec 替换当前进程，成功时不会返回（atexit 不会执行，因此先写出 trace 文件）；
+            命令无法执行时抛出 OSError，提供商不存在或未配置时抛出 KeyError。
+            """
+            env = self._exec_env(provider_id)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            stop_tracing()
+            os.execvpe(command[0], command, env)
+    
+    @traced
+    def get_current_env_info(self) -> Dict:
+        """获取当前环境变量信息"""
+        return {
+            'base_url': os.environ.get('ANTHROPIC_BASE_URL', ''),
+            'api_key': os.environ.get('ANTHROPIC_AUTH_TOKEN', ''),
+            'current_provider': self.get_current_provider()
+        }
+    
+    @traced
+    def list_providers(self) -> Dict:
+        """列出所有提供商"""
+        providers = self._providers_view()
+        current = self.get_current_provider()
+        
+        result = {}
+        for provider_id, provider_info in providers['providers'].items():
+            result[provider_id] = {
+                **provider_info,
+                'is_current': provider_id == current,
+                'is_configured': bool(provider_keys(provider_info))
+            }
+        
+        return result
+    
+    @traced
+    def probe_providers(self, provider_ids: Optional[List[str]] = None, samples: int = 3,
+                        connect_timeout: float = 3.0, timeout: float = 10.0,
+                        ttl: float = PROBE_CACHE_TTL, refresh: bool = False,
+                        ssl_context=None) -> Dict:
+        """并发探测提供商的连接、TLS 和首字节耗时
+
+        返回 {provider_id: 汇总结果}，包含 p50/p95 等统计。结果缓存到 probe_cache.json，
+        有效期内且 base_url 未变化时直接使用缓存（结果中 cached 为 True）。
+        """
+        from provider_probe import run_probe
+        
+        providers = self._providers_view()['providers']
+        if provider_ids is None:
+            provider_ids = [pid for pid, info in providers.items() if info.get('base_url')]
+        
+        cache = self._probe_store.read()
+        cached = cache.get('results', {}) if isinstance(cache, dict) else {}
+        now = time.time()
+        
+        results = {}
+        targets = {}
+        for provider_id in provider_ids:
+            provider = providers.get(provider_id)
+            if not provider or not provider.get('base_url'):
+                continue
+            entry = cached.get(provider_id)
+            if (not refresh and entry and entry.get('base_url') == provider['base_url']
+                    and now - entry.get('probed_at', 0) < ttl):
+                results[provider_id] = {**entry, 'cached': True}
+            else:
+                targets[provider_id] = provider['base_url']
+        
+        fresh = run_probe(targets, samples=samples, connect_timeout=connect_timeout,
+                          timeout=timeout, ssl_context=ssl_context)
+        for provider_id, summary in fresh.items():
+            summary['base_url'] = targets[provider_id]
+            summary['probed_at'] = now
+            results[provider_id] = {**summary, 'cached': False}
+        
+        if fresh:
+            # 探测期间其他进程可能已经更新了缓存，在排他锁内重新读取后合并
+            with self._lock.exclusive():
+                cache = self._probe_store.read()
+                cached = cache.get('results', {}) if isinstance(cache, dict) else {}
+                history = cache.get('history', {}) if isinstance(cache, dict) else {}
+                # 已删除的提供商的结果和历史不再保留
+                history = {pid: entries for pid, entries in history.items() if pid in providers}
+                for provider_id, summary in fresh.items():
+                    # base_url 变化后旧的历史不再有参考价值
+                    entries = [entry for entry in history.get(provider_id, [])
+                               if entry.get('base_url') == summary['base_url']]
+                    entries.append({
+                        'at': now,
+                        'base_url': summary['base_url'],
+                        'p50_ms': summary['p50_ms'],
+                        'error_rate': summary['error_rate']
+                    })
+                    history[provider_id] = entries[-PROBE_HISTORY_SIZE:]
+                results_cache = {pid: entry for pid, entry in {**cached, **fresh}.items() if pid in providers}
+                self._probe_store.write({'results': results_cache, 'history': history})
+        
+        return results
+    
+    @traced
+    def rank_providers(self, provider_ids: Optional[List[str]] = None,
+                       half_life: float = PROBE_HALF_LIFE, **probe_kwargs) -> List[Dict]:
+        """按滚动延迟/错误率评分对已配置的提供商排序（评分越小越好）
+
+        排序前会调用 probe_providers()（有效期内使用缓存），评分相同时按提供商ID排序，
+        不可用的提供商排在最后。
+        """
+        from provider_probe import rolling_score
+        
+        providers = self._providers_view()['providers']
+        if provider_ids is None:
+            provider_ids = [pid for pid, info in providers.items()
+                            if provider_keys(info) and info.get('base_url')]
+        self.probe_providers(provider_ids, **probe_kwargs)
+        
+        cache = self._probe_store.read()
+        history = cache.get('history', {}) if isinstance(cache, dict) else {}
+        now = time.time()
+        
+        ranking = []
+        for provider_id in provider_ids:
+            provider = providers.get(provider_id)
+            if not provider:
+                continue
+            entries = [entry for entry in history.get(provider_id, [])
+                       if entry.get('base_url') == provider.get('base_url')]
+            ranking.append({
+                'id': provider_id,
+                'name': provider.get('name', provider_id),
+                'probes': len(entries),
+                **rolling_score(entries, now, half_life)
+            })
+        
+        ranking.sort(key=lambda item: (item['score'] is None, item['score'] or 0, item['id']))
+        return ranking
+    
+    @traced
+    def discover_models(self, provider_ids: Optional[List[str]] = None, ttl: float = MODELS_CACHE_TTL,
+                        refresh: bool = False, connect_timeout: float = 5.0, timeout: float = 15.0,
+                        ssl_context=None) -> Dict:
+        """并发查询提供商的模型列表
+
+        返回 {provider_id: 结果}，结果包含 models（[{'id', 'name', 'created'}]）、fetched_at、
+        checked_at、error 等字段。结果缓存到 models_cache.json：有效期内且 base_url 和 API Key
+        未变化时直接使用缓存（cached 为 True）；过期或 refresh 时带上次的 ETag 请求，服务器返回
+        304 时沿用缓存的列表（not_modified 为 True）。请求失败时保留上次的列表并记录 error。
+        """
+        from model_catalog import run_discovery
+        
+        providers = self._providers_view()['providers']
+        if provider_ids is None:
+            provider_ids = [pid for pid, info in providers.items()
+                            if provider_keys(info) and info.get('base_url')]
+        
+        cache = self._models_store.read()
+        cached = cache.get('providers', {}) if isinstance(cache, dict) else {}
+        now = time.time()
+        
+        results = {}
+        targets = {}
+        previous = {}
+        for provider_id in provider_ids:
+            provider = providers.get(provider_id)
+            keys = provider_keys(provider) if provider else []
+            if not keys or not provider.get('base_url'):
+                continue
+            key_id = key_fingerprint(keys[0]['key'])
+            entry = cached.get(provider_id)
+            if entry and (entry.get('base_url') != provider['base_url'] or entry.get('key_id') != key_id):
+                entry = None
+            if (not refresh and entry and not entry.get('error')
+                    and now - entry.get('checked_at', 0) < ttl):
+                results[provider_id] = {**entry, 'cached': True, 'not_modified': False}
+                continue
+            targets[provider_id] = {'base_url': provider['base_url'], 'api_key': keys[0]['key'],
+                                    'etag': entry.get('etag') if entry else None}
+            previous[provider_id] = {**(entry or {}), 'base_url': provider['base_url'], 'key_id': key_id}
+        
+        fresh = run_discovery(targets, connect_timeout=connect_timeout, timeout=timeout,
+                              ssl_context=ssl_context)
+        updates = {}
+        for provider_id, result in fresh.items():
+            entry = previous[provider_id]
+            if result['not_modified']:
+                entry.update(checked_at=now, error='')
+            elif result['ok']:
+                entry.update(models=result['models'], etag=result['etag'], fetched_at=now,
+                             checked_at=now, error='')
+            else:
+                # 失败时保留上次的列表，checked_at 不变，下次查询会重试
+                entry.setdefault('models', [])
+                entry['error'] = result['error']
+            updates[provider_id] = entry
+            results[provider_id] = {**entry, 'cached': False, 'not_modified': result['not_modified']}
+        
+        if updates:
+            # 查询期间其他进程可能已经更新了缓存，在排他锁内重新读取后合并；顺便清理已删除的提供商
+            with self._lock.exclusive():
+                cache = self._models_store.read()
+                cached = cache.get('providers', {}) if isinstance(cache, dict) else {}
+                merged = {pid: entry for pid, entry in {**cached, **updates}.items() if pid in providers}
+                self._models_store.write({'providers': merged})
+        
+        return results
+    
+    def cached_models(self) -> Dict:
+        """模型列表缓存（不发起网络请求），返回 {provider_id: 缓存条目}
+
+        只包含 base_url 与当前配置一致的条目，供 GUI 等只读场景使用。
+        """
+        cache = self._models_store.read()
+        cached = cache.get('providers', {}) if isinstance(cache, dict) else {}
+        providers = self._providers_view()['providers']
+        return {pid: entry for pid, entry in cached.items()
+                if pid in providers and entry.get('base_url') == providers[pid].get('base_url')}
+    
+    @traced
+    def apply_batch(self, lines: Iterable[str], atomic: bool = False) -> Dict:
+        """批量应用 JSON Lines 格式的操作
+
+        每行一个 JSON 对象，例如 {"op": "add", "id": "kimi2", "name": "...", "base_url": "...", "api_key": "..."}。
+        所有修改在同一个事务中一次性提交；atomic 为 True 时任意一行失败都会放弃全部修改。
+        先逐行解析和检查输入并暂存到临时文件，读取输入期间不持有配置锁（输入可能来自很慢或
+        一直不关闭的管道），全部读完后才在事务中应用；不会一次性把整个文件加载到内存中。
+        """
+        import tempfile
+        results = []
+        switch_target = None
+        committed = True
+        
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+            for line_no, line in enumerate(lines, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                
+                result = {'line': line_no, 'op': None, 'id': None, 'ok': False, 'error': ''}
+                try:
+                    try:
+                        operation = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"JSON格式错误: {e.msg}")
+                    if not isinstance(operation, dict):
+                        raise ValueError("每行必须是一个 JSON 对象")
+                    result['op'] = operation.get('op')
+                    result['id'] = operation.get('id')
+                    self._check_operation(operation)
+                    spool.write(json.dumps([len(results), operation], ensure_ascii=False) + '\n')
+                except ValueError as e:
+                    result['error'] = str(e)
+                    if atomic:
+                        committed = False
+                results.append(result)
+            
+            try:
+                if not committed:
+                    # 格式错误时不应用任何操作，只报告出错的行
+                    results = [result for result in results if result['error']]
+                    raise _BatchAborted()
+                spool.seek(0)
+                with self.transaction():
+                    for record in spool:
+                        index, operation = json.loads(record)
+                        result = results[index]
+                        try:
+                            if self._apply_operation(operation):
+                                switch_target = operation['id']
+                            result['ok'] = True
+                        except ValueError as e:
+                            result['error'] = str(e)
+                            if atomic:
+                                del results[index + 1:]
+                                raise _BatchAborted()
+            except _BatchAborted:
+                committed = False
+        
+        # 环境变量只需按最终生效的提供商设置一次
+        if committed and switch_target and self.get_current_provider() == switch_target:
+            provider = self._read_provider(switch_target)
+            self.set_environment_variables(provider['base_url'], self.acquire_api_key(switch_target))
+        
+        failed = sum(1 for result in results if not result['ok'])
+        return {
+            'results': results,
+            'committed': committed,
+            'applied': len(results) - failed if committed else 0,
+            'failed': failed
+        }
+    
+    def _check_operation(self, operation: Dict):
+        """检查批处理操作的格式（不读取配置），不合法时抛出 ValueError"""
+        op = operation.get('op')
+        provider_id = operation.get('id')
+        if op not in BATCH_OPERATIONS:
+            raise ValueError(f"未知操作: {op}")
+        if not provider_id or not isinstance(provider_id, str):
+            raise ValueError("缺少提供商ID")
+        if op == 'add' and (not operation.get('name') or not operation.get('base_url')):
+            raise ValueError("add 操作需要 name 和 base_url")
+        if op == 'update':
+            if not any(key in operation for key in PROVIDER_FIELDS):
+                raise ValueError("update 操作没有可更新的字段")
+            check_provider_fields({key: operation[key] for key in PROVIDER_FIELDS if key in operation})
+    
+    def _apply_operation(self, operation: Dict) -> bool:
+        """在当前事务中应用单个已检查过格式的批处理操作，返回是否为切换操作"""
+        op = operation['op']
+        provider_id = operation['id']
+        
+        if op == 'add':
+            self.add_provider(
+                provider_id, operation['name'], operation['base_url'],
+                operation.get('api_key', ''), operation.get('description', '')
+            )
+        elif op == 'update':
+            fields = {key: operation[key] for key in PROVIDER_FIELDS if key in operation}
+            if not self.update_provider(provider_id, **fields):
+                raise ValueError(f"提供商 '{provider_id}' 不存在")
+        elif op == 'delete':
+            if not self.delete_provider(provider_id):
+                raise ValueError(f"提供商 '{provider_id}' 不存在")
+        elif op == 'switch':
+            provider = self._read_provider(provider_id)
+            if not provider or not provider_keys(provider) or not provider.get('base_url'):
+                raise ValueError(f"提供商 '{provider_id}' 不存在或未配置")
+            self.set_current_provider(provider_id)
+            return True
+        return False
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 提供商配置的历史版本
+每次写入提供商配置或切换当前提供商时在 ~/.claude_code_config/history/ 中记录一个版本：
+
+  objects/ab/cdef...   单个提供商配置，文件名是内容指纹，内容相同的配置在所有版本中只保存一份
+  revs/<版本号>.json   版本内容，只记录相对上一个版本修改过的提供商（每隔 FULL_SNAPSHOT_EVERY
+                       个版本保存一次完整清单），存储空间随修改量增长，与提供商总数无关
+  log.jsonl            版本列表，每行一个版本的摘要
+  base.json            清理旧版本后最早保留的版本的完整清单（该版本的父版本已被删除）
+
+超过保留数量的旧版本和不再被引用的配置会被自动清理。
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from atomic_io import atomic_write
+from provider_stream import ImportDiff, canonical_json
+from tracing import span
+
+# 默认保留的版本数量（settings.json 中的 history_keep，0 表示不记录历史）
+HISTORY_KEEP = 100
+# 每隔多少个版本保存一次完整清单，限制还原版本时需要回放的修改数量
+FULL_SNAPSHOT_EVERY = 50
+# 超出保留数量这么多个版本后才清理，分摊清理的开销
+PRUNE_SLACK = 20
+# 清理时不删除最近修改过的配置对象，避免删除其他进程正在写入的版本引用的对象
+PRUNE_GRACE = 3600
+# 版本摘要中最多记录的提供商ID数量
+SUMMARY_IDS = 5
+
+
+def object_id(provider: Dict) -> str:
+    """配置对象的ID，与 provider_stream.provider_fingerprint() 相同（十六进制）"""
+    return hashlib.blake2b(canonical_json(provider).encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ConfigHistory:
+    """history/ 目录中的版本记录
+
+    版本的清单是有序的 {provider_id: 对象ID}，与存储后端中提供商的顺序一致：
+    修改保留原位置，新增追加到末尾。
+    """
+
+    def __init__(self, directory: Path, keep: int = HISTORY_KEEP):
+        self.directory = Path(directory)
+        self.objects_dir = self.directory / 'objects'
+        self.revs_dir = self.directory / 'revs'
+        self.log_file = self.directory / 'log.jsonl'
+        self.base_file = self.directory / 'base.json'
+        self.keep = keep
+        self._dirs = set()
+        # 最近一次还原的版本清单（版本内容不会改变，可以一直复用）
+        self._manifest_cache = None
+
+    def _ensure_dir(self, path: Path):
+        if path not in self._dirs:
+            # 历史记录中包含 API Key，目录只允许当前用户访问
+            for directory in (self.directory, path.parent, path):
+                directory.mkdir(mode=0o700, exist_ok=True)
+            self._dirs.add(path)
+
+    def empty(self) -> bool:
+        return not self.log_file.exists()
+
+    def entries(self) -> List[Dict]:
+        """所有版本的摘要，按时间顺序"""
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def head(self) -> Optional[Dict]:
+        entries = self.entries()
+        return entries[-1] if entries else None
+
+    def resolve(self, spec: str) -> Dict:
+        """按版本号（可以是前缀）、HEAD 或 HEAD~N 查找版本"""
+        entries = self.entries()
+        if not entries:
+            raise ValueError("没有历史版本")
+        if spec == 'HEAD' or spec.startswith('HEAD~'):
+            back = spec[5:] or '0'
+            if not back.isdigit() or int(back) >= len(entries):
+                raise ValueError(f"版本不存在: {spec}")
+            return entries[-1 - int(back)]
+        matches = [entry for entry in entries if entry['rev'].startswith(spec)]
+        if not matches:
+            raise ValueError(f"版本不存在: {spec}")
+        if len(matches) > 1:
+            raise ValueError(f"版本号 '{spec}' 不唯一，请输入更多字符")
+        return matches[0]
+
+    # 配置对象
+
+    def _object_path(self, oid: str) -> str:
+        # 导入时会写入大量对象，使用字符串路径避免 pathlib 的开销
+        return os.path.join(self.objects_dir, oid[:2], oid[2:])
+
+    def put(self, provider: Dict) -> str:
+        """保存一个提供商配置，返回对象ID；相同内容的对象已存在时不重复写入"""
+        oid = object_id(provider)
+        path = self._object_path(oid)
+        if not os.path.exists(path):
+            if oid[:2] not in self._dirs:
+                self._ensure_dir(self.objects_dir / oid[:2])
+                self._dirs.add(oid[:2])
+            # 保留原有的字段顺序，指纹按排序后的内容计算。对象数量可能很多，不使用 atomic_write()，
+            # 直接以 0600 权限写入临时文件后 rename，写入中断时不会留下内容不完整的对象
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                try:
+                    os.write(fd, json.dumps(provider, ensure_ascii=False).encode('utf-8'))
+                finally:
+                    os.close(fd)
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+        return oid
+
+    def get(self, oid: str) -> Dict:
+        """读取提供商配置，内容与对象ID不符时抛出 ValueError"""
+        with open(self._object_path(oid), 'r', encoding='utf-8') as f:
+            provider = json.load(f)
+        if object_id(provider) != oid:
+            raise ValueError(f"历史记录中的配置对象已损坏: {oid}")
+        return provider
+
+    # 版本
+
+    def _rev_path(self, rev: str) -> Path:
+        return self.revs_dir / f"{rev}.json"
+
+    def _read_rev(self, rev: str) -> Dict:
+        with open(self._rev_path(rev), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _read_base(self) -> Optional[Dict]:
+        """清理后保存的基础清单 {'rev', 'providers'}，没有清理过时为 None"""
+        try:
+            with open(self.base_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, rev: str) -> Tuple[Dict[str, str], str]:
+        """还原版本的清单，返回 ({provider_id: 对象ID}, 当前提供商)
+
+        从最近的完整清单（或 base.json 中的基础清单）开始依次回放之后的修改，最多读取
+        FULL_SNAPSHOT_EVERY 个版本文件，不需要读取任何提供商配置。
+        """
+        cached = self._manifest_cache
+        if cached is not None and cached[0] == rev:
+            return dict(cached[1]), cached[2]
+
+        with span('history.manifest', 'io', rev=rev):
+            chain = []
+            base = None
+            at = rev
+            body = self._read_rev(at)
+            current = body['current']
+            while 'providers' not in body:
+                if base is None:
+                    base = self._read_base() or {}
+                if base.get('rev') == at:
+                    body = base
+                    break
+                chain.append(body)
+                at = body['parent']
+                body = self._read_rev(at)
+            manifest = dict(body['providers'])
+            for body in reversed(chain):
+                for provider_id, oid in body['changes'].items():
+                    if oid is None:
+                        manifest.pop(provider_id, None)
+                    else:
+                        manifest[provider_id] = oid
+        self._manifest_cache = (rev, manifest, current)
+        return dict(manifest), current
+
+    def _append(self, body: Dict, summary: Dict) -> str:
+        """写入版本文件并追加到版本列表，返回版本号"""
+        text = json.dumps(body, ensure_ascii=False)
+        rev = hashlib.blake2b(text.encode('utf-8'), digest_size=6).hexdigest()
+        self._ensure_dir(self.revs_dir)
+        atomic_write(self._rev_path(rev), text, mode=0o600)
+        entry = {'rev': rev, 'parent': body['parent'], 'time': body['time'], **summary}
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.chmod(self.log_file, 0o600)
+        return rev
+
+    def commit(self, changes: Dict[str, Optional[str]], current: Optional[str] = None,
+               message: str = '', manifest: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """记录一个新版本
+
+        changes 为相对上一个版本修改过的 {provider_id: 对象ID}（None 表示删除），current 为
+        None 时沿用上一个版本的当前提供商。manifest 不为 None 时保存为完整清单（第一个版本
+        或提供商顺序发生变化时）。没有任何修改时不记录，返回 None。
+        """
+        entries = self.entries()
+        head = entries[-1] if entries else None
+        if current is None:
+            current = head['current'] if head else ''
+        if head is not None and not changes and current == head['current']:
+            return None
+
+        body = {'parent': head['rev'] if head else None, 'time': time.time(),
+                'message': message, 'current': current}
+        depth = head['depth'] + 1 if head else 0
+        if manifest is None and depth >= FULL_SNAPSHOT_EVERY:
+            manifest, _ = self.manifest(head['rev'])
+            for provider_id, oid in changes.items():
+                if oid is None:
+                    manifest.pop(provider_id, None)
+                else:
+                    manifest[provider_id] = oid
+        if manifest is not None:
+            body['providers'] = manifest
+            depth = 0
+        else:
+            body['changes'] = changes
+
+        removed = [pid for pid, oid in changes.items() if oid is None]
+        written = [pid for pid, oid in changes.items() if oid is not None]
+        summary = {'message': message, 'current': current, 'depth': depth,
+                   'written': len(written), 'removed': len(removed),
+                   'ids': (written + removed)[:SUMMARY_IDS]}
+        with span('history.commit', 'io', changes=len(changes)):
+            rev = self._append(body, summary)
+        if len(entries) + 1 > self.keep + PRUNE_SLACK:
+            self.prune()
+        return rev
+
+    def commit_providers(self, providers: Iterable[Tuple[str, Dict]], current: Optional[str] = None,
+                         message: str = '') -> Optional[str]:
+        """按完整的提供商配置记录新版本（用于整体写入和第一个版本），只记录修改过的提供商"""
+        manifest = {provider_id: self.put(provider) for provider_id, provider in providers}
+        head = self.head()
+        if head is None:
+            return self.commit(manifest, current, message, manifest=manifest)
+
+        previous, _ = self.manifest(head['rev'])
+        changes = {pid: None for pid in previous if pid not in manifest}
+        changes.update((pid, oid) for pid, oid in manifest.items() if previous.get(pid) != oid)
+        for provider_id, oid in changes.items():
+            if oid is None:
+                previous.pop(provider_id)
+            else:
+                previous[provider_id] = oid
+        # 顺序发生变化时无法只用修改记录表示，保存完整清单
+        ordered = list(previous) == list(manifest)
+        return self.commit(changes, current, message, manifest=None if ordered else manifest)
+
+    def diff(self, old: Dict[str, str], new: Dict[str, str]) -> ImportDiff:
+        """比较两个版本的清单（新增 / 修改 / 删除相对 old 而言）"""
+        diff = ImportDiff()
+        for provider_id, oid in new.items():
+            previous = old.get(provider_id)
+            if previous is None:
+                diff.record('added', provider_id)
+            elif previous != oid:
+                diff.record('changed', provider_id)
+            else:
+                diff.record('unchanged', provider_id)
+        for provider_id in old:
+            if provider_id not in new:
+                diff.record('removed', provider_id)
+        return diff
+
+    def prune(self, keep: Optional[int] = None) -> int:
+        """只保留最近 keep 个版本，删除更早的版本和不再被引用的配置对象，返回删除的版本数量"""
+        keep = self.keep if keep is None else keep
+        entries = self.entries()
+        if keep <= 0 or len(entries) <= keep:
+            return 0
+
+        with span('history.prune', 'io', revs=len(entries) - keep):
+            dropped, kept = entries[:-keep], entries[-keep:]
+            # 版本号是版本内容的指纹，不能改写最早保留的版本；它的完整清单单独保存在 base.json，
+            # 之后还原时不再依赖被删除的版本
+            first = kept[0]
+            base = None
+            if 'providers' not in self._read_rev(first['rev']):
+                manifest, _ = self.manifest(first['rev'])
+                base = {'rev': first['rev'], 'providers': manifest}
+                atomic_write(self.base_file, json.dumps(base, ensure_ascii=False), mode=0o600)
+            else:
+                try:
+                    self.base_file.unlink()
+                except FileNotFoundError:
+                    pass
+            kept[0] = dict(first, parent=None, depth=0)
+            atomic_write(self.log_file, ''.join(json.dumps(entry, ensure_ascii=False) + '\n'
+                                                 for entry in kept), mode=0o600)
+            for entry in dropped:
+                try:
+                    self._rev_path(entry['rev']).unlink()
+                except FileNotFoundError:
+                    pass
+            self._manifest_cache = None
+
+            referenced = set(base['providers'].values()) if base else set()
+            for entry in kept:
+                body = self._read_rev(entry['rev'])
+                referenced.update(body.get('providers', body.get('changes', {})).values())
+            deadline = time.time() - PRUNE_GRACE
+            for directory in self.objects_dir.glob('??'):
+                for path in directory.iterdir():
+                    if directory.name + path.name not in referenced and path.stat().st_mtime < deadline:
+                        path.unlink()
+        return len(dropped)
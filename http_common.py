@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 的 HTTP/1.1 辅助函数和熔断器
+routing_proxy、model_catalog 和 task_runner 共用，不依赖其中任何一个模块。
+"""
+
+import asyncio
+import time
+from typing import List, Tuple
+
+
+class ProxyError(Exception):
+    """需要以 HTTP 错误响应返回给客户端的异常"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class CircuitBreaker:
+    """单个提供商的熔断器（closed / open / half_open）
+
+    连续失败达到阈值后进入 open 状态，直接跳过该提供商；reset_timeout 秒后进入
+    half_open，只放行一个试探请求，成功则恢复 closed，失败则重新 open。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def allow(self) -> bool:
+        """是否允许向该提供商发送请求（half_open 时会占用唯一的试探名额）"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """请求被对冲取消，不计成功也不计失败"""
+        self.trial_in_flight = False
+
+
+async def read_headers(reader: asyncio.StreamReader) -> List[Tuple[str, str]]:
+    """读取 HTTP 头部直到空行"""
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, sep, value = line.decode('latin-1').partition(':')
+        if not sep:
+            raise ProxyError(400, "无效的HTTP头部")
+        headers.append((name.strip(), value.strip()))
+
+
+def find_header(headers: List[Tuple[str, str]], name: str, default: str = '') -> str:
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return default
+
+
+async def read_chunked_body(reader: asyncio.StreamReader, limit: int) -> bytes:
+    """读取并解码 chunked 编码的请求体或响应体"""
+    body = bytearray()
+    while True:
+        size_line = await reader.readline()
+        try:
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            raise ProxyError(400, "无效的chunked编码")
+        if size == 0:
+            await read_headers(reader)
+            return bytes(body)
+        if len(body) + size > limit:
+            raise ProxyError(413, "请求体过大")
+        body += await reader.readexactly(size)
+        await reader.readexactly(2)
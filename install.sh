@@ -208,14 +208,26 @@ else
     python_cmd=""
 fi
 
+# 配置管理器由多个模块组成（config_manager.py 只是入口），缺少任何一个都无法运行
+config_manager_modules="config_manager config_cli config_core atomic_io tracing config_history provider_stream
+sqlite_store provider_probe model_catalog http_common routing_proxy switch_daemon task_runner"
+config_manager_ready=""
+
 if [ -n "$python_cmd" ]; then
-    # 下载配置管理器（如果不存在）
-    if [ ! -f "config_manager.py" ]; then
-        echo "正在下载配置管理器..."
-        curl -fsSL https://raw.githubusercontent.com/sxyseo/kimi-cc/main/config_manager.py -o config_manager.py 2>/dev/null || echo "[警告] 下载配置管理器失败"
-    fi
+    # 下载配置管理器（只下载缺少的模块）
+    config_manager_ready=1
+    for module in $config_manager_modules; do
+        if [ ! -f "$module.py" ]; then
+            echo "正在下载 $module.py..."
+            if ! curl -fsSL "https://raw.githubusercontent.com/sxyseo/kimi-cc/main/$module.py" -o "$module.py"; then
+                echo "[警告] 下载 $module.py 失败"
+                rm -f "$module.py"
+                config_manager_ready=""
+            fi
+        fi
+    done
     
-    if [ -f "config_manager.py" ]; then
+    if [ -n "$config_manager_ready" ]; then
         # 根据选择的提供商设置ID
         case "$base_url_choice" in
             2) provider_id="kimi" ;;
@@ -223,11 +235,15 @@ if [ -n "$python_cmd" ]; then
             *) provider_id="qwen" ;;
         esac
         
-        # 更新配置
-        $python_cmd config_manager.py update "$provider_id" --api_key "$api_key" 2>/dev/null || echo "[警告] 更新配置失败"
-        $python_cmd config_manager.py switch "$provider_id" 2>/dev/null || echo "[警告] 切换配置失败"
-        
-        echo "[成功] 配置已保存到配置管理器"
+        # 更新配置（不隐藏输出，失败时可以看到原因）
+        if $python_cmd config_manager.py update "$provider_id" --api_key "$api_key" \
+            && $python_cmd config_manager.py switch "$provider_id"; then
+            echo "[成功] 配置已保存到配置管理器"
+        else
+            echo "[警告] 保存到配置管理器失败，原因见上面的错误信息"
+        fi
+    else
+        echo "[警告] 配置管理器下载不完整，跳过配置管理功能"
     fi
 fi
 
@@ -252,7 +268,7 @@ echo "🚀 然后您可以开始使用 Claude Code:"
 echo "   claude"
 echo ""
 echo "🔧 配置管理功能:"
-if [ -n "$python_cmd" ] && [ -f "config_manager.py" ]; then
+if [ -n "$config_manager_ready" ]; then
     echo "   • 查看所有提供商: $python_cmd config_manager.py list"
     echo "   • 快速切换提供商: $python_cmd switch_provider.py <provider_id>"
     echo "   • 启动GUI管理器: $python_cmd claude_config_gui.py"
@@ -409,14 +409,30 @@ if !errorLevel! equ 0 (
     )
 )
 
+:: 配置管理器由多个模块组成（config_manager.py 只是入口），缺少任何一个都无法运行
+set "config_manager_modules=config_manager config_cli config_core atomic_io tracing config_history provider_stream sqlite_store provider_probe model_catalog http_common routing_proxy switch_daemon task_runner"
+set "config_manager_ready="
+
 if defined python_cmd (
-    :: 下载配置管理器（如果不存在）
-    if not exist "config_manager.py" (
-        echo 正在下载配置管理器...
-        powershell -Command "try { Invoke-WebRequest -Uri 'https://raw.githubusercontent.com/sxyseo/kimi-cc/main/config_manager.py' -OutFile 'config_manager.py' } catch { Write-Host '[警告] 下载配置管理器失败' }" 2>nul
+    :: 下载配置管理器（只下载缺少的模块）
+    set "config_manager_ready=1"
+    for %%m in (!config_manager_modules!) do (
+        if not exist "%%m.py" (
+            echo 正在下载 %%m.py...
+            powershell -Command "try { Invoke-WebRequest -Uri 'https://raw.githubusercontent.com/sxyseo/kimi-cc/main/%%m.py' -OutFile '%%m.py' } catch { exit 1 }" 2>nul
+            if !errorLevel! neq 0 (
+                echo [警告] 下载 %%m.py 失败
+                if exist "%%m.py" del "%%m.py"
+                set "config_manager_ready="
+            )
+        )
+    )
+    
+    if not defined config_manager_ready (
+        echo [警告] 配置管理器下载不完整，跳过配置管理功能
     )
     
-    if exist "config_manager.py" (
+    if defined config_manager_ready (
         :: 根据选择的提供商设置ID
         if "!base_url_choice!"=="2" (
             set "provider_id=kimi"
@@ -426,11 +442,16 @@ if defined python_cmd (
             set "provider_id=qwen"
         )
         
-        :: 更新配置
-        !python_cmd! config_manager.py update "!provider_id!" --api_key "!api_key!" >nul 2>&1
-        !python_cmd! config_manager.py switch "!provider_id!" >nul 2>&1
-        
-        echo [成功] 配置已保存到配置管理器
+        :: 更新配置（不隐藏输出，失败时可以看到原因）
+        !python_cmd! config_manager.py update "!provider_id!" --api_key "!api_key!"
+        if !errorLevel! equ 0 (
+            !python_cmd! config_manager.py switch "!provider_id!"
+        )
+        if !errorLevel! equ 0 (
+            echo [成功] 配置已保存到配置管理器
+        ) else (
+            echo [警告] 保存到配置管理器失败，原因见上面的错误信息
+        )
     )
 )
 
@@ -464,7 +485,7 @@ echo.
 
 echo 配置管理功能:
 if defined python_cmd (
-    if exist "config_manager.py" (
+    if defined config_manager_ready (
         echo    • 查看所有提供商: !python_cmd! config_manager.py list
         echo    • 快速切换提供商: !python_cmd! switch_provider.py ^<provider_id^>
         echo    • 启动GUI管理器: !python_cmd! claude_config_gui.py
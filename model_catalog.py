@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 提供商模型目录
+使用 asyncio 并发请求各提供商的模型列表接口（{base_url}/v1/models），兼容 Anthropic 和
+OpenAI 两种返回格式，统一整理为 {id, name, created} 的列表。
+"""
+
+import asyncio
+import json
+import ssl
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from http_common import ProxyError, find_header, read_chunked_body, read_headers
+
+MODELS_PATH = '/v1/models'
+ANTHROPIC_VERSION = '2023-06-01'
+# 分页接口每页请求的数量和最多请求的页数
+PAGE_LIMIT = 1000
+MAX_PAGES = 20
+MAX_RESPONSE_SIZE = 8 * 1024 * 1024
+
+
+def models_url(base_url: str) -> Optional[str]:
+    """模型列表接口的地址，Base URL 无效时返回 None"""
+    parts = urlsplit(base_url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    path = parts.path.rstrip('/')
+    # Base URL 已经以 /v1 结尾时不再重复
+    path = path + '/models' if path.endswith('/v1') else path + MODELS_PATH
+    return f"{parts.scheme}://{parts.netloc}{path}"
+
+
+def _created(item: Dict) -> Optional[str]:
+    created = item.get('created_at', item.get('created'))
+    if isinstance(created, (int, float)) and not isinstance(created, bool):
+        return datetime.fromtimestamp(created, timezone.utc).isoformat()
+    return created if isinstance(created, str) else None
+
+
+def normalize_models(payload) -> Tuple[List[Dict], Optional[str]]:
+    """整理一页模型列表，返回 (模型列表, 下一页的游标)
+
+    支持 Anthropic 格式（data + has_more / last_id）、OpenAI 格式（data）以及直接返回
+    列表或 {"models": [...]} 的实现；每个模型整理为 {'id', 'name', 'created'}，
+    有 owned_by 时一并保留。
+    """
+    if isinstance(payload, dict):
+        items = payload.get('data', payload.get('models'))
+    else:
+        items = payload
+    if not isinstance(items, list):
+        raise ValueError("无法识别的模型列表格式")
+
+    models = []
+    for item in items:
+        if isinstance(item, str):
+            item = {'id': item}
+        if not isinstance(item, dict):
+            continue
+        model_id = item.get('id') or item.get('name') or item.get('model')
+        if not isinstance(model_id, str) or not model_id:
+            continue
+        model = {
+            'id': model_id,
+            'name': item.get('display_name') or item.get('name') or model_id,
+            'created': _created(item)
+        }
+        if isinstance(item.get('owned_by'), str):
+            model['owned_by'] = item['owned_by']
+        models.append(model)
+
+    cursor = None
+    if isinstance(payload, dict) and payload.get('has_more') and isinstance(payload.get('last_id'), str):
+        cursor = payload['last_id']
+    return models, cursor
+
+
+def _error_message(body: bytes) -> str:
+    """从错误响应中取出提示信息（Anthropic 和 OpenAI 都使用 {"error": {"message": ...}}）"""
+    try:
+        error = json.loads(body.decode('utf-8')).get('error')
+    except (ValueError, AttributeError):
+        return ''
+    if isinstance(error, dict):
+        return str(error.get('message', ''))
+    return error if isinstance(error, str) else ''
+
+
+async def http_get(url: str, headers: Dict[str, str], connect_timeout: float = 5.0, timeout: float = 15.0,
+                   ssl_context: Optional[ssl.SSLContext] = None) -> Tuple[int, List[Tuple[str, str]], bytes]:
+    """发送 GET 请求，返回 (状态码, 响应头, 响应体)；timeout 为发送请求到读完响应的总时间"""
+    parts = urlsplit(url)
+    use_tls = parts.scheme == 'https'
+    port = parts.port or (443 if use_tls else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    context = (ssl_context or ssl.create_default_context()) if use_tls else None
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=context,
+                                server_hostname=parts.hostname if context else None),
+        connect_timeout)
+
+    async def exchange():
+        host_header = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        lines = [f"GET {path} HTTP/1.1", f"Host: {host_header}",
+                 "User-Agent: claude-config-models/1.0", "Accept: application/json",
+                 "Accept-Encoding: identity", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        fields = status_line.decode('latin-1').split()
+        if len(fields) < 2 or not fields[0].startswith('HTTP/') or not fields[1].isdigit():
+            raise ValueError("无效的HTTP响应")
+        status = int(fields[1])
+        response_headers = await read_headers(reader)
+        if status in (204, 304):
+            return status, response_headers, b''
+        if 'chunked' in find_header(response_headers, 'transfer-encoding').lower():
+            return status, response_headers, await read_chunked_body(reader, MAX_RESPONSE_SIZE)
+        length = find_header(response_headers, 'content-length')
+        if length.isdigit():
+            if int(length) > MAX_RESPONSE_SIZE:
+                raise ValueError("响应过大")
+            return status, response_headers, await reader.readexactly(int(length))
+        body = bytearray()
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                return status, response_headers, bytes(body)
+            body += chunk
+            if len(body) > MAX_RESPONSE_SIZE:
+                raise ValueError("响应过大")
+
+    try:
+        return await asyncio.wait_for(exchange(), timeout)
+    finally:
+        writer.close()
+
+
+async def fetch_models(base_url: str, api_key: str, etag: Optional[str] = None,
+                       connect_timeout: float = 5.0, timeout: float = 15.0,
+                       ssl_context: Optional[ssl.SSLContext] = None) -> Dict:
+    """获取单个提供商的模型列表
+
+    etag 不为空时带 If-None-Match 请求，服务器返回 304 时 not_modified 为 True、models 为空。
+    分页接口会依次请求后续页面（后续页面不做条件请求）。
+    """
+    result = {'ok': False, 'status': None, 'not_modified': False, 'etag': None,
+              'models': [], 'error': '', 'elapsed_ms': None}
+    url = models_url(base_url)
+    if url is None:
+        result['error'] = f"无效的URL: {base_url}"
+        return result
+
+    headers = {
+        'x-api-key': api_key,
+        'Authorization': f"Bearer {api_key}",
+        'anthropic-version': ANTHROPIC_VERSION
+    }
+    start = time.perf_counter()
+    try:
+        models = []
+        seen = set()
+        cursor = None
+        for _ in range(MAX_PAGES):
+            page_url, page_headers = url, dict(headers)
+            if cursor:
+                page_url += ('&' if '?' in url else '?') + urlencode({'after_id': cursor, 'limit': PAGE_LIMIT})
+            elif etag:
+                page_headers['If-None-Match'] = etag
+            status, response_headers, body = await http_get(page_url, page_headers, connect_timeout,
+                                                            timeout, ssl_context)
+            result['status'] = status
+            if status == 304 and etag and not cursor:
+                result.update(ok=True, not_modified=True, etag=etag)
+                return result
+            if status != 200:
+                message = _error_message(body)
+                result['error'] = f"HTTP {status}" + (f": {message}" if message else "")
+                return result
+            if not cursor:
+                result['etag'] = find_header(response_headers, 'etag') or None
+
+            page_models, cursor = normalize_models(json.loads(body.decode('utf-8')))
+            for model in page_models:
+                if model['id'] not in seen:
+                    seen.add(model['id'])
+                    models.append(model)
+            if not cursor:
+                break
+        result['ok'] = True
+        result['models'] = models
+    except asyncio.TimeoutError:
+        result['error'] = "超时"
+    except (OSError, ValueError, ConnectionError, ssl.SSLError, ProxyError, asyncio.IncompleteReadError) as e:
+        result['error'] = str(e) or e.__class__.__name__
+    finally:
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+async def fetch_many(targets: Dict[str, Dict], connect_timeout: float = 5.0, timeout: float = 15.0,
+                     concurrency: int = 16, ssl_context: Optional[ssl.SSLContext] = None) -> Dict[str, Dict]:
+    """并发获取多个提供商的模型列表
+
+    targets 为 {provider_id: {'base_url', 'api_key', 'etag'}}。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch_target(target):
+        async with semaphore:
+            return await fetch_models(target['base_url'], target['api_key'], target.get('etag'),
+                                      connect_timeout, timeout, ssl_context)
+
+    provider_ids = list(targets)
+    results = await asyncio.gather(*(fetch_target(targets[pid]) for pid in provider_ids))
+    return dict(zip(provider_ids, results))
+
+
+def run_discovery(targets: Dict[str, Dict], **kwargs) -> Dict[str, Dict]:
+    """同步接口，供 ConfigManager 和命令行调用"""
+    if not targets:
+        return {}
+    return asyncio.run(fetch_many(targets, **kwargs))
+
+
+def format_models(models: List[Dict], limit: int = 10) -> str:
+    """模型ID列表的简短文本，超过 limit 个时省略"""
+    text = ', '.join(model['id'] for model in models[:limit])
+    if len(models) > limit:
+        text += f" 等 {len(models)} 个"
+    return text
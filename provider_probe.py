@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 提供商延迟探测
+使用 asyncio 并发探测所有提供商的连接、TLS 握手和首字节耗时
+"""
+
+import asyncio
+import math
+import socket
+import ssl
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """计算百分位数（最近秩法），空列表返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+async def probe_url(url: str, connect_timeout: float = 3.0, timeout: float = 10.0,
+                    ssl_context: Optional[ssl.SSLContext] = None) -> Dict:
+    """探测单个 URL 一次，返回各阶段耗时（毫秒）
+
+    任何 HTTP 响应都视为可达，5xx 视为错误；不会发送 API Key。
+    """
+    sample = {
+        'connect_ms': None, 'tls_ms': None, 'ttfb_ms': None, 'total_ms': None,
+        'status': None, 'ok': False, 'error': ''
+    }
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        sample['error'] = f"无效的URL: {url}"
+        return sample
+
+    use_tls = parts.scheme == 'https'
+    port = parts.port or (443 if use_tls else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    loop = asyncio.get_running_loop()
+    writer = None
+    start = time.perf_counter()
+    try:
+        # 单独计时 TCP 连接（含 DNS 解析），再在同一 socket 上完成 TLS 握手
+        infos = await asyncio.wait_for(
+            loop.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM), connect_timeout)
+        family, sock_type, proto, _, address = infos[0]
+        sock = socket.socket(family, sock_type, proto)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, address), connect_timeout)
+        except BaseException:
+            sock.close()
+            raise
+        sample['connect_ms'] = _elapsed_ms(start)
+
+        tls_start = time.perf_counter()
+        if use_tls:
+            context = ssl_context or ssl.create_default_context()
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(sock=sock, ssl=context, server_hostname=parts.hostname),
+                connect_timeout)
+            sample['tls_ms'] = _elapsed_ms(tls_start)
+        else:
+            reader, writer = await asyncio.open_connection(sock=sock)
+
+        host_header = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host_header}\r\n"
+            "User-Agent: claude-config-probe/1.0\r\n"
+            "Accept: */*\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        request_start = time.perf_counter()
+        writer.write(request.encode('ascii'))
+        await writer.drain()
+
+        first_byte = await asyncio.wait_for(reader.read(1), timeout)
+        if not first_byte:
+            raise ConnectionError("连接被服务器关闭")
+        sample['ttfb_ms'] = _elapsed_ms(request_start)
+
+        status_line = first_byte + await asyncio.wait_for(reader.readline(), timeout)
+        fields = status_line.decode('latin-1').split()
+        if len(fields) < 2 or not fields[0].startswith('HTTP/') or not fields[1].isdigit():
+            raise ValueError("无效的HTTP响应")
+        sample['status'] = int(fields[1])
+        sample['ok'] = sample['status'] < 500
+        if not sample['ok']:
+            sample['error'] = f"HTTP {sample['status']}"
+    except asyncio.TimeoutError:
+        sample['error'] = "超时"
+    except (OSError, ValueError, ConnectionError, ssl.SSLError) as e:
+        sample['error'] = str(e) or e.__class__.__name__
+    finally:
+        sample['total_ms'] = _elapsed_ms(start)
+        if writer is not None:
+            writer.close()
+
+    return sample
+
+
+def summarize_samples(samples: List[Dict]) -> Dict:
+    """汇总多次采样，计算 p50/p95 和错误率"""
+    ok_samples = [sample for sample in samples if sample['ok']]
+    totals = [sample['total_ms'] for sample in ok_samples]
+    ttfbs = [sample['ttfb_ms'] for sample in ok_samples]
+
+    def median_of(key):
+        return percentile([sample[key] for sample in ok_samples if sample[key] is not None], 50)
+
+    errors = [sample['error'] for sample in samples if not sample['ok']]
+    return {
+        'ok': bool(ok_samples),
+        'samples': len(samples),
+        'errors': len(errors),
+        'error_rate': round(len(errors) / len(samples), 4) if samples else 1.0,
+        'last_error': errors[-1] if errors else '',
+        'status': ok_samples[-1]['status'] if ok_samples else None,
+        'p50_ms': percentile(totals, 50),
+        'p95_ms': percentile(totals, 95),
+        'ttfb_p50_ms': percentile(ttfbs, 50),
+        'ttfb_p95_ms': percentile(ttfbs, 95),
+        'connect_ms': median_of('connect_ms'),
+        'tls_ms': median_of('tls_ms'),
+    }
+
+
+async def probe_many(targets: Dict[str, str], samples: int = 3, connect_timeout: float = 3.0,
+                     timeout: float = 10.0, concurrency: int = 16,
+                     ssl_context: Optional[ssl.SSLContext] = None) -> Dict[str, Dict]:
+    """并发探测多个提供商
+
+    targets 为 {provider_id: base_url}；同一提供商的采样依次进行，不同提供商并发执行。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def probe_target(url):
+        async with semaphore:
+            results = []
+            for _ in range(max(1, samples)):
+                results.append(await probe_url(url, connect_timeout, timeout, ssl_context))
+            return summarize_samples(results)
+
+    provider_ids = list(targets)
+    summaries = await asyncio.gather(*(probe_target(targets[pid]) for pid in provider_ids))
+    return dict(zip(provider_ids, summaries))
+
+
+def run_probe(targets: Dict[str, str], **kwargs) -> Dict[str, Dict]:
+    """同步接口，供 ConfigManager 和命令行调用"""
+    if not targets:
+        return {}
+    return asyncio.run(probe_many(targets, **kwargs))
+
+
+def rolling_score(history: List[Dict], now: float, half_life: float) -> Dict:
+    """根据探测历史计算指数衰减的滚动评分（越小越好）
+
+    每条历史记录的权重为 0.5 ** (距今时间 / half_life)。评分为加权 p50 延迟除以
+    加权成功率，近似于获得一次成功响应的期望耗时；几乎总是失败的提供商评分为 None。
+    """
+    total_weight = latency_weight = 0.0
+    latency_sum = error_sum = 0.0
+    for entry in history:
+        weight = 0.5 ** (max(0.0, now - entry['at']) / half_life)
+        total_weight += weight
+        error_sum += weight * entry['error_rate']
+        if entry.get('p50_ms') is not None:
+            latency_weight += weight
+            latency_sum += weight * entry['p50_ms']
+
+    if not total_weight or not latency_weight:
+        return {'score': None, 'latency_ms': None, 'error_rate': 1.0 if total_weight else None}
+
+    latency = latency_sum / latency_weight
+    error_rate = error_sum / total_weight
+    score = round(latency / (1 - error_rate), 2) if error_rate < 0.95 else None
+    return {'score': score, 'latency_ms': round(latency, 2), 'error_rate': round(error_rate, 4)}
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 提供商配置的流式导入导出
+JSON Lines 格式每行一个提供商（{"id": ..., 其余字段}），第一行可以是 {"export_info": {...}}；
+文件名以 .gz / .xz 结尾时自动压缩或解压。导出和 JSON Lines 导入逐条处理，
+内存占用与提供商数量无关。导入时按内容指纹与现有配置比较，只写入有变化的提供商。
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+EXPORT_FORMATS = ('json', 'jsonl')
+COMPRESSIONS = ('gzip', 'xz')
+EXPORT_VERSION = "1.0.0"
+
+# 每处理多少条记录报告一次进度
+PROGRESS_EVERY = 10000
+
+_COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.xz': 'xz'}
+_JSONL_SUFFIXES = ('.jsonl', '.ndjson')
+
+
+def detect_compression(path) -> Optional[str]:
+    """根据文件名后缀判断压缩格式（.gz / .xz），未压缩时返回 None"""
+    return _COMPRESSION_SUFFIXES.get(Path(path).suffix.lower())
+
+
+def detect_format(path) -> str:
+    """根据文件名判断导入导出格式：.jsonl / .ndjson（可带压缩后缀）为 jsonl，其余为 json"""
+    path = Path(path)
+    if detect_compression(path):
+        path = path.with_suffix('')
+    return 'jsonl' if path.suffix.lower() in _JSONL_SUFFIXES else 'json'
+
+
+def _wrap(raw, mode: str, compression: Optional[str]):
+    """在二进制文件对象外包装压缩/解压"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode=mode)
+    if compression == 'xz':
+        return lzma.LZMAFile(raw, mode=mode)
+    return raw
+
+
+def strip_keys(provider: Dict) -> Dict:
+    """移除提供商配置中的 API Key"""
+    provider = dict(provider)
+    provider['api_key'] = ""
+    if 'api_keys' in provider:
+        provider['api_keys'] = []
+    return provider
+
+
+def canonical_json(provider: Dict) -> str:
+    """提供商配置的规范 JSON 文本（字段排序、无空白），用于计算内容指纹"""
+    return json.dumps(provider, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+
+def provider_fingerprint(provider: Dict) -> bytes:
+    """提供商配置的内容指纹，与字段顺序无关"""
+    return hashlib.blake2b(canonical_json(provider).encode('utf-8'), digest_size=16).digest()
+
+
+class ImportDiff:
+    """导入与现有配置的差异
+
+    added / changed / removed / skipped 为提供商ID列表，unchanged 只记录数量。
+    removed 只在替换模式下出现；skipped 是内容不同但未选择覆盖的提供商。
+    """
+
+    def __init__(self):
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.removed: List[str] = []
+        self.skipped: List[str] = []
+        self.unchanged = 0
+
+    def record(self, action: str, provider_id: str):
+        if action == 'unchanged':
+            self.unchanged += 1
+        else:
+            getattr(self, action).append(provider_id)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def imported(self) -> int:
+        """写入的提供商数量（新增 + 修改）"""
+        return len(self.added) + len(self.changed)
+
+    def with_options(self, replace: bool, overwrite: bool) -> 'ImportDiff':
+        """由替换 + 覆盖模式的预览推导其他导入方式的结果"""
+        diff = ImportDiff()
+        diff.added = list(self.added)
+        diff.changed = list(self.changed) if overwrite else []
+        diff.skipped = list(self.skipped) + ([] if overwrite else list(self.changed))
+        diff.removed = list(self.removed) if replace else []
+        diff.unchanged = self.unchanged
+        return diff
+
+    def summary(self) -> Dict[str, int]:
+        return {'added': len(self.added), 'changed': len(self.changed), 'removed': len(self.removed),
+                'unchanged': self.unchanged, 'skipped': len(self.skipped)}
+
+    def format(self, limit: int = 20) -> str:
+        """差异的文本形式，每类最多列出 limit 个ID"""
+        lines = []
+        for label, mark, ids in (("新增", '+', self.added), ("修改", '~', self.changed),
+                                 ("删除", '-', self.removed), ("跳过（未覆盖）", '○', self.skipped)):
+            if not ids:
+                continue
+            lines.append(f"{label} {len(ids)} 个:")
+            lines.extend(f"  {mark} {provider_id}" for provider_id in ids[:limit])
+            if len(ids) > limit:
+                lines.append(f"  ... 还有 {len(ids) - limit} 个")
+        lines.append(f"未变化 {self.unchanged} 个")
+        return '\n'.join(lines)
+
+
+def _indent(text: str, width: int) -> str:
+    """把多行 JSON 文本整体缩进，用于逐条写出与 json.dump(indent=2) 相同的文档"""
+    return text.replace('\n', '\n' + ' ' * width)
+
+
+class ProviderReader:
+    """逐条读取导入文件中的提供商，迭代得到 (provider_id, provider)
+
+    JSON Lines 格式逐行解析；JSON 文档格式需要一次解析整个文件（标准库没有流式 JSON 解析器）。
+    position / total_bytes 是已读取和总的文件字节数（压缩文件按压缩后的大小计算），用于显示进度。
+    """
+
+    def __init__(self, path, fmt: Optional[str] = None, compression: Optional[str] = None):
+        self.path = Path(path)
+        self.format = fmt or detect_format(self.path)
+        self.compression = compression if compression is not None else detect_compression(self.path)
+        self.export_info = None
+        self.raw = open(self.path, 'rb')
+        self.total_bytes = os.fstat(self.raw.fileno()).st_size
+
+    @property
+    def position(self) -> int:
+        return self.raw.tell()
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict]]:
+        stream = io.TextIOWrapper(_wrap(self.raw, 'rb', self.compression), encoding='utf-8')
+        if self.format == 'json':
+            data = json.load(stream)
+            if not isinstance(data, dict) or not isinstance(data.get('providers'), dict):
+                raise ValueError("配置文件格式不正确，缺少 'providers' 字段")
+            self.export_info = data.get('export_info')
+            yield from data['providers'].items()
+            return
+
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"第 {line_no} 行不是有效的JSON: {e}")
+            if not isinstance(record, dict):
+                raise ValueError(f"第 {line_no} 行必须是对象")
+            if 'export_info' in record and 'id' not in record:
+                self.export_info = record['export_info']
+                continue
+            provider_id = record.pop('id', None)
+            if not isinstance(provider_id, str) or not provider_id:
+                raise ValueError(f"第 {line_no} 行缺少提供商 id")
+            yield provider_id, record
+
+    def close(self):
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def export_providers(config_manager, path, include_keys: bool = False, fmt: Optional[str] = None,
+                     compression: Optional[str] = None,
+                     progress: Optional[Callable[[int, int], None]] = None,
+                     every: int = PROGRESS_EVERY) -> int:
+    """逐条导出提供商配置，返回导出的数量
+
+    先写入同目录的临时文件（权限 0600），完成后再替换目标文件；中途出错或在 progress
+    回调中抛出异常（取消）时不会留下不完整的文件。
+    """
+    path = Path(path)
+    fmt = fmt or detect_format(path)
+    if compression is None:
+        compression = detect_compression(path)
+    total = config_manager.count_providers()
+    export_info = {
+        "version": EXPORT_VERSION,
+        "export_time": datetime.now().isoformat(),
+        "total_providers": total
+    }
+
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.absolute().parent))
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as raw, _wrap(raw, 'wb', compression) as stream, \
+                io.TextIOWrapper(stream, encoding='utf-8') as f:
+            if fmt == 'jsonl':
+                f.write(json.dumps({'export_info': export_info}, ensure_ascii=False) + '\n')
+            else:
+                f.write('{\n  "export_info": ' + _indent(json.dumps(export_info, ensure_ascii=False, indent=2), 2)
+                        + ',\n  "providers": {')
+
+            for provider_id, provider in config_manager.iter_providers():
+                if not include_keys:
+                    provider = strip_keys(provider)
+                if fmt == 'jsonl':
+                    f.write(json.dumps({'id': provider_id, **provider}, ensure_ascii=False) + '\n')
+                else:
+                    f.write((',\n    ' if count else '\n    ') + json.dumps(provider_id, ensure_ascii=False)
+                            + ': ' + _indent(json.dumps(provider, ensure_ascii=False, indent=2), 4))
+                count += 1
+                if progress and count % every == 0:
+                    progress(count, total)
+
+            if fmt == 'json':
+                f.write('\n  }\n}' if count else '}\n}')
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if progress:
+        progress(count, total)
+    return count
@@ -0,0 +1,668 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 本地路由代理
+将 ANTHROPIC_BASE_URL 指向本代理后，请求会被转发到 providers.json 中的当前提供商，
+上游连接通过 keep-alive 连接池复用；切换提供商只需更新 current.json，无需重启 shell。
+"""
+
+import asyncio
+import json
+import ssl
+import sys
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from config_manager import KeyPool, provider_keys
+from http_common import CircuitBreaker, ProxyError, find_header, read_chunked_body, read_headers
+from provider_probe import percentile
+
+# 逐跳头部，不能原样转发
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'proxy-connection',
+    'te', 'trailer', 'trailers', 'transfer-encoding', 'upgrade'
+}
+# 由代理重新生成的请求头部
+REWRITTEN_REQUEST_HEADERS = {'host', 'content-length', 'authorization', 'x-api-key', 'expect'}
+# 客户端可通过该头部为单个请求指定提供商
+PROVIDER_HEADER = 'x-claude-provider'
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8787
+# 单次读取上限，同时也是每个连接读写缓冲区的上限，保证流式转发的内存占用有界
+READ_CHUNK_SIZE = 64 * 1024
+MAX_REQUEST_BODY = 32 * 1024 * 1024
+# /_proxy/metrics 保留的最近请求数
+METRICS_WINDOW = 1000
+# 对冲请求：样本不足时的默认等待时间（秒），以及计算 p95 所需的最少样本数
+DEFAULT_HEDGE_DELAY = 3.0
+MIN_HEDGE_SAMPLES = 10
+# 这些上游状态码会触发故障转移；除 429（全部 Key 都被限流）外都计入熔断器
+FAILOVER_STATUSES = {429, 500, 502, 503, 504, 529}
+# 幂等方法（RFC 9110）：请求发出后连接断开时可以安全地重新发送
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE'}
+
+
+class RequestMaybeProcessed(ProxyError):
+    """非幂等请求已经发给上游后连接断开：上游可能已经处理（并计费），不能重试或转移到其他提供商"""
+
+    def __init__(self, provider_id: str, error: BaseException):
+        super().__init__(502, f"提供商 '{provider_id}' 的连接在请求发出后断开（{str(error) or error.__class__.__name__}），"
+                              f"请求可能已被处理，未自动重试")
+
+
+class UpstreamResponse:
+    """已收到响应头的上游响应
+
+    started_at 为这次尝试开始获取上游连接的时刻（含建立连接、TLS 握手和失效连接的重试），
+    headers_at 为读完响应头的时刻。
+    """
+
+    def __init__(self, provider_id: str, conn, status_line: bytes, headers: List[Tuple[str, str]], ttfb: float,
+                 api_key: str = '', started_at: float = 0.0):
+        self.provider_id = provider_id
+        self.api_key = api_key
+        self.conn = conn
+        self.status_line = status_line
+        self.headers = headers
+        self.ttfb = ttfb
+        self.headers_at = time.perf_counter()
+        self.started_at = started_at or self.headers_at
+        fields = status_line.split(None, 2)
+        self.status = int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else 502
+
+
+class UpstreamConnection:
+    """一条到上游提供商的连接"""
+
+    def __init__(self, key: Tuple[str, str, int], reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def is_usable(self, idle_timeout: float) -> bool:
+        return (not self.writer.is_closing() and not self.reader.at_eof()
+                and time.monotonic() - self.last_used < idle_timeout)
+
+    def close(self):
+        self.writer.close()
+
+
+class UpstreamPool:
+    """按 (scheme, host, port) 分组的 keep-alive 连接池"""
+
+    def __init__(self, max_idle_per_host: int = 8, idle_timeout: float = 60.0,
+                 connect_timeout: float = 10.0, ssl_context: Optional[ssl.SSLContext] = None):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.connect_timeout = connect_timeout
+        self.ssl_context = ssl_context
+        self.opened = 0
+        self.reused = 0
+        self._idle: Dict[Tuple[str, str, int], deque] = {}
+
+    async def acquire(self, scheme: str, host: str, port: int) -> Tuple[UpstreamConnection, bool]:
+        """获取连接，优先复用空闲连接；返回 (连接, 是否复用)"""
+        key = (scheme, host, port)
+        idle = self._idle.get(key)
+        while idle:
+            conn = idle.pop()
+            if conn.is_usable(self.idle_timeout):
+                self.reused += 1
+                return conn, True
+            conn.close()
+
+        context = None
+        if scheme == 'https':
+            context = self.ssl_context or ssl.create_default_context()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context, server_hostname=host if context else None,
+                                    limit=READ_CHUNK_SIZE),
+            self.connect_timeout)
+        self.opened += 1
+        return UpstreamConnection(key, reader, writer), False
+
+    def release(self, conn: UpstreamConnection, reusable: bool):
+        """归还连接；不可复用或空闲连接已满时直接关闭"""
+        idle = self._idle.setdefault(conn.key, deque())
+        if reusable and len(idle) < self.max_idle_per_host and not conn.writer.is_closing():
+            conn.last_used = time.monotonic()
+            idle.append(conn)
+        else:
+            conn.close()
+
+    def close_all(self):
+        for idle in self._idle.values():
+            while idle:
+                idle.pop().close()
+
+    def stats(self) -> Dict:
+        return {
+            'opened': self.opened,
+            'reused': self.reused,
+            'idle': sum(len(idle) for idle in self._idle.values())
+        }
+
+
+class HttpRequest:
+    """解析后的客户端请求"""
+
+    def __init__(self, method: str, target: str, version: str, headers: List[Tuple[str, str]], body: bytes):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = body
+        self.received_at = time.perf_counter()
+
+    def header(self, name: str, default: str = '') -> str:
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return default
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.header('connection').lower()
+        if self.version == 'HTTP/1.0':
+            return 'keep-alive' in connection
+        return 'close' not in connection
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """解析 retry-after 头（秒数或 HTTP 日期），无法解析时返回 None"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def error_body(message: str) -> bytes:
+    """生成 Anthropic 格式的错误响应体"""
+    return json.dumps({
+        'type': 'error',
+        'error': {'type': 'api_error', 'message': message}
+    }, ensure_ascii=False).encode('utf-8')
+
+
+class RoutingProxy:
+    """把请求转发到当前提供商的反向代理"""
+
+    def __init__(self, config_manager, pool: Optional[UpstreamPool] = None, access_log: bool = False,
+                 fallback: Optional[List[str]] = None, hedge_delay: float = DEFAULT_HEDGE_DELAY,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.config_manager = config_manager
+        self.pool = pool or UpstreamPool()
+        self.access_log = access_log
+        self.fallback = list(fallback or [])
+        self.hedge_delay = hedge_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.requests = 0
+        self.errors = 0
+        self.metrics = deque(maxlen=METRICS_WINDOW)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.ttfb_history: Dict[str, deque] = {}
+        self.key_pools: Dict[str, Tuple[tuple, KeyPool]] = {}
+
+    def breaker(self, provider_id: str) -> CircuitBreaker:
+        if provider_id not in self.breakers:
+            self.breakers[provider_id] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self.breakers[provider_id]
+
+    def route(self, request: HttpRequest) -> List[str]:
+        """本次请求的候选提供商顺序：主提供商（请求头指定或当前提供商）+ 备用列表"""
+        primary = request.header(PROVIDER_HEADER) or self.config_manager.get_current_provider()
+        route = []
+        for provider_id in [primary] + self.fallback:
+            if provider_id and provider_id not in route:
+                route.append(provider_id)
+        if not route:
+            raise ProxyError(503, "未设置当前提供商，请先执行 switch")
+        return route
+
+    def resolve_provider(self, provider_id: str) -> Dict:
+        provider = self.config_manager.get_provider(provider_id)
+        if not provider or not provider.get('base_url') or not provider_keys(provider):
+            raise ProxyError(503, f"提供商 '{provider_id}' 不存在或未配置")
+        return provider
+
+    def key_pool(self, provider_id: str, provider: Dict) -> KeyPool:
+        """提供商的内存 Key 池，Key 列表或策略变化时重建"""
+        keys = provider_keys(provider)
+        signature = (tuple((item['key'], item.get('weight', 1)) for item in keys), provider.get('key_strategy'))
+        cached = self.key_pools.get(provider_id)
+        if cached is None or cached[0] != signature:
+            pool = KeyPool(keys, provider.get('key_strategy', 'round_robin'))
+            self.key_pools[provider_id] = (signature, pool)
+            return pool
+        return cached[1]
+
+    def hedge_deadline(self, provider_id: str) -> float:
+        """等待首字节的期限：样本足够时取该提供商最近的首字节 p95"""
+        history = self.ttfb_history.get(provider_id)
+        if not history or len(history) < MIN_HEDGE_SAMPLES:
+            return self.hedge_delay
+        return percentile(list(history), 95)
+
+    async def read_request(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> Optional[HttpRequest]:
+        """读取一个完整的客户端请求，连接关闭时返回 None"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        except ValueError:
+            raise ProxyError(400, "无效的请求行")
+        headers = await read_headers(reader)
+
+        if find_header(headers, 'expect').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+
+        body = b''
+        if 'chunked' in find_header(headers, 'transfer-encoding').lower():
+            body = await read_chunked_body(reader, MAX_REQUEST_BODY)
+        else:
+            length = find_header(headers, 'content-length')
+            if length:
+                if not length.isdigit():
+                    raise ProxyError(400, "无效的Content-Length")
+                if int(length) > MAX_REQUEST_BODY:
+                    raise ProxyError(413, "请求体过大")
+                body = await reader.readexactly(int(length))
+        return HttpRequest(method, target, version, headers, body)
+
+    def build_upstream_request(self, request: HttpRequest, provider: Dict,
+                               api_key: str) -> Tuple[Tuple[str, str, int], bytes]:
+        """构造发往上游的请求，返回 (连接键, 请求字节)"""
+        base = urlsplit(provider['base_url'])
+        if base.scheme not in ('http', 'https') or not base.hostname:
+            raise ProxyError(502, f"无效的Base URL: {provider['base_url']}")
+        port = base.port or (443 if base.scheme == 'https' else 80)
+        path = base.path.rstrip('/') + request.target if request.target.startswith('/') else request.target
+
+        host_header = base.hostname if base.port is None else f"{base.hostname}:{base.port}"
+        lines = [f"{request.method} {path} HTTP/1.1", f"Host: {host_header}"]
+        sent_api_key = False
+        for name, value in request.headers:
+            lower = name.lower()
+            if lower == 'x-api-key':
+                sent_api_key = True
+            if lower in HOP_BY_HOP_HEADERS or lower in REWRITTEN_REQUEST_HEADERS or lower == PROVIDER_HEADER:
+                continue
+            lines.append(f"{name}: {value}")
+        lines.append(f"Authorization: Bearer {api_key}")
+        if sent_api_key:
+            lines.append(f"x-api-key: {api_key}")
+        if request.body or request.method in ('POST', 'PUT', 'PATCH'):
+            lines.append(f"Content-Length: {len(request.body)}")
+        lines.append("Connection: keep-alive")
+
+        head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        return (base.scheme, base.hostname, port), head + request.body
+
+    async def send_upstream(self, provider_id: str, request: HttpRequest) -> UpstreamResponse:
+        """发送请求并读取响应头
+
+        复用的连接已失效时换新连接重试一次。请求写出后连接才断开时，只有幂等方法会重试；
+        非幂等请求（如 POST /v1/messages）可能已被上游处理，抛出 RequestMaybeProcessed（502），
+        也不会再转移到其他提供商。
+        """
+        provider = self.resolve_provider(provider_id)
+        api_key = self.key_pool(provider_id, provider).acquire()
+        key, payload = self.build_upstream_request(request, provider, api_key)
+        started_at = time.perf_counter()
+        idempotent = request.method in IDEMPOTENT_METHODS
+        while True:
+            conn, reused = await self.pool.acquire(*key)
+            written = False
+            try:
+                if conn.writer.is_closing() or conn.reader.at_eof():
+                    raise ConnectionError("上游连接已关闭")
+                written = True
+                conn.writer.write(payload)
+                await conn.writer.drain()
+                sent_at = time.perf_counter()
+                status_line = await conn.reader.readline()
+                if not status_line:
+                    raise ConnectionError("上游连接已关闭")
+                upstream_ttfb = time.perf_counter() - sent_at
+                try:
+                    headers = await read_headers(conn.reader)
+                except ProxyError as e:
+                    # 上游的响应头无效是网关错误，不是客户端请求的问题
+                    raise ProxyError(502, f"提供商 '{provider_id}' 返回了无效的响应头: {e.message}")
+                return UpstreamResponse(provider_id, conn, status_line, headers, upstream_ttfb, api_key, started_at)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                conn.close()
+                if written and not idempotent:
+                    raise RequestMaybeProcessed(provider_id, e)
+                if not reused:
+                    raise
+            except BaseException:
+                # 被对冲取消或超时时不能把半途的连接留在池外
+                conn.close()
+                raise
+
+    async def attempt(self, provider_id: str, request: HttpRequest) -> UpstreamResponse:
+        """向单个提供商发起请求，并把结果计入熔断器"""
+        breaker = self.breaker(provider_id)
+        tried_keys = set()
+        try:
+            while True:
+                response = await self.send_upstream(provider_id, request)
+                if response.status != 429:
+                    break
+                # Key 被限流：按 retry-after 冷却，还有其他可用 Key 时立即换 Key 重试
+                pool = self.key_pool(provider_id, self.resolve_provider(provider_id))
+                pool.report_limited(response.api_key, parse_retry_after(find_header(response.headers, 'retry-after')))
+                tried_keys.add(response.api_key)
+                if not [item for item in pool.available() if item['key'] not in tried_keys]:
+                    break
+                response.conn.close()
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+        except BaseException:
+            breaker.record_failure()
+            raise
+        if response.status == 429:
+            # 全部 Key 都被限流：不是提供商故障，也不是有效的首字节样本
+            breaker.record_cancelled()
+        elif response.status in FAILOVER_STATUSES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+            self.ttfb_history.setdefault(provider_id, deque(maxlen=200)).append(response.ttfb)
+        return response
+
+    async def dispatch(self, request: HttpRequest) -> Tuple[UpstreamResponse, int]:
+        """按路由顺序发送请求，支持故障转移和对冲
+
+        主提供商在首字节期限内没有响应时，向下一个提供商发送对冲请求，采用最先返回的
+        响应并取消其余请求；连接失败、返回 5xx 或全部 Key 都被限流（429）时立即尝试下一个。
+        熔断中的提供商直接跳过。
+        返回 (响应, 发起的尝试次数)。
+        """
+        candidates = iter(self.route(request))
+        pending = {}
+        attempts = 0
+        last_error = None
+        last_response = None
+        newest = None
+        exhausted = False
+
+        def start_next() -> bool:
+            nonlocal attempts, last_error, newest, exhausted
+            for provider_id in candidates:
+                if not self.breaker(provider_id).allow():
+                    last_error = last_error or ProxyError(503, f"提供商 '{provider_id}' 已熔断")
+                    continue
+                task = asyncio.ensure_future(self.attempt(provider_id, request))
+                pending[task] = provider_id
+                attempts += 1
+                newest = provider_id
+                return True
+            exhausted = True
+            return False
+
+        try:
+            start_next()
+            while pending:
+                deadline = None
+                if self.fallback and not exhausted:
+                    deadline = self.hedge_deadline(newest)
+                done, _ = await asyncio.wait(list(pending), timeout=deadline,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 首字节超时：对冲到下一个提供商，继续等待已发出的请求
+                    start_next()
+                    continue
+
+                for task in done:
+                    provider_id = pending.pop(task)
+                    try:
+                        response = task.result()
+                    except RequestMaybeProcessed:
+                        raise
+                    except ProxyError as e:
+                        last_error = e
+                    except asyncio.TimeoutError:
+                        last_error = ProxyError(504, f"连接提供商 '{provider_id}' 超时")
+                    except (ConnectionError, OSError, ssl.SSLError, asyncio.IncompleteReadError) as e:
+                        last_error = ProxyError(502, f"连接提供商 '{provider_id}' 失败: {e}")
+                    else:
+                        if response.status not in FAILOVER_STATUSES:
+                            return response, attempts
+                        # 保留最后一个错误响应，所有候选都失败时原样返回给客户端
+                        if last_response:
+                            last_response.conn.close()
+                        last_response = response
+                        continue
+
+                if not pending:
+                    start_next()
+
+            if last_response:
+                return last_response, attempts
+            raise last_error or ProxyError(503, "没有可用的提供商")
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                # 同一轮中同时完成的失败方也要关闭连接
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    task.result().conn.close()
+
+    async def forward(self, request: HttpRequest, writer: asyncio.StreamWriter) -> bool:
+        """转发请求并把响应流式写回客户端，返回客户端连接是否可以继续使用"""
+        dispatched_at = time.perf_counter()
+        upstream, attempts = await self.dispatch(request)
+        provider_id = upstream.provider_id
+        conn, status_line, headers = upstream.conn, upstream.status_line, upstream.headers
+        upstream_ttfb, status = upstream.ttfb, upstream.status
+        chunked = 'chunked' in find_header(headers, 'transfer-encoding').lower()
+        length = find_header(headers, 'content-length')
+        no_body = request.method == 'HEAD' or status in (204, 304) or 100 <= status < 200
+        upstream_reusable = 'close' not in find_header(headers, 'connection').lower()
+        # 上游既不是 chunked 也没有 Content-Length 时只能读到连接关闭为止
+        until_eof = not no_body and not chunked and not length.isdigit()
+        client_keep_alive = request.keep_alive and not until_eof
+
+        response = [status_line.decode('latin-1').rstrip('\r\n')]
+        for name, value in headers:
+            if name.lower() in HOP_BY_HOP_HEADERS:
+                continue
+            response.append(f"{name}: {value}")
+        if chunked and not no_body:
+            response.append("Transfer-Encoding: chunked")
+        response.append("Connection: keep-alive" if client_keep_alive else "Connection: close")
+
+        # 代理额外增加的首字节延迟 = 收到请求到开始分派的耗时 + 收到上游响应头到写出响应头的耗时；
+        # 分派期间等待上游的时间（建立连接、TLS、对冲等待、失败的尝试和失效连接的重试）都不计入
+        overhead = (dispatched_at - request.received_at) + (time.perf_counter() - upstream.headers_at)
+        response.append(f"X-Proxy-Overhead-Ms: {overhead * 1000:.2f}")
+        writer.write(('\r\n'.join(response) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+        complete = False
+        try:
+            if no_body:
+                pass
+            elif chunked:
+                await self.relay_chunked(conn.reader, writer)
+            elif not until_eof:
+                await self.relay_exact(conn.reader, writer, int(length))
+            else:
+                upstream_reusable = False
+                while True:
+                    data = await conn.reader.read(READ_CHUNK_SIZE)
+                    if not data:
+                        break
+                    writer.write(data)
+                    await writer.drain()
+            await writer.drain()
+            complete = True
+        finally:
+            self.pool.release(conn, complete and upstream_reusable)
+            self.record_metric(request, provider_id, status, upstream_ttfb, overhead, complete, attempts,
+                               upstream.headers_at - upstream.started_at)
+
+        return client_keep_alive
+
+    def record_metric(self, request: HttpRequest, provider_id: str, status: int,
+                      upstream_ttfb: float, overhead: float, complete: bool, attempts: int = 1,
+                      upstream_time: Optional[float] = None):
+        """记录单个请求的耗时指标，upstream_time 为采用的那次尝试从获取连接到收到响应头的耗时"""
+        metric = {
+            'method': request.method,
+            'path': request.target,
+            'provider': provider_id,
+            'status': status,
+            'upstream_ttfb_ms': round(upstream_ttfb * 1000, 2),
+            'upstream_ms': round((upstream_time if upstream_time is not None else upstream_ttfb) * 1000, 2),
+            'overhead_ms': round(overhead * 1000, 2),
+            'total_ms': round((time.perf_counter() - request.received_at) * 1000, 2),
+            'complete': complete,
+            'attempts': attempts
+        }
+        self.metrics.append(metric)
+        if self.access_log:
+            print(f"{metric['method']} {metric['path']} -> {provider_id} {status} "
+                  f"上游首字节 {metric['upstream_ttfb_ms']:.1f}ms 代理开销 {metric['overhead_ms']:.2f}ms "
+                  f"总计 {metric['total_ms']:.1f}ms 尝试 {attempts} 次", file=sys.stderr)
+
+    async def relay_exact(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, remaining: int):
+        """按固定长度转发响应体"""
+        while remaining > 0:
+            data = await reader.read(min(READ_CHUNK_SIZE, remaining))
+            if not data:
+                raise asyncio.IncompleteReadError(b'', remaining)
+            remaining -= len(data)
+            writer.write(data)
+            await writer.drain()
+
+    async def relay_chunked(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """原样转发 chunked 编码的响应体（不解码、不重组）
+
+        SSE 事件以 chunk 为单位到达，每读到一段数据就立即写给客户端并等待缓冲区排空，
+        不会累积完整响应。
+        """
+        while True:
+            size_line = await reader.readline()
+            if not size_line:
+                raise asyncio.IncompleteReadError(b'', None)
+            writer.write(size_line)
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                # 转发 trailer 和结束空行
+                while True:
+                    line = await reader.readline()
+                    writer.write(line)
+                    if line in (b'\r\n', b'\n', b''):
+                        return
+            await self.relay_exact(reader, writer, size + 2)
+
+    def metrics_response(self) -> bytes:
+        """本地指标接口 /_proxy/metrics"""
+        overheads = [metric['overhead_ms'] for metric in self.metrics]
+        ttfbs = [metric['upstream_ttfb_ms'] for metric in self.metrics]
+        return json.dumps({
+            'window': len(self.metrics),
+            'overhead_p50_ms': percentile(overheads, 50),
+            'overhead_p95_ms': percentile(overheads, 95),
+            'upstream_ttfb_p50_ms': percentile(ttfbs, 50),
+            'upstream_ttfb_p95_ms': percentile(ttfbs, 95),
+            'recent': list(self.metrics)[-20:]
+        }, ensure_ascii=False).encode('utf-8')
+
+    def status_response(self) -> bytes:
+        """本地状态接口 /_proxy/status"""
+        return json.dumps({
+            'current_provider': self.config_manager.get_current_provider(),
+            'requests': self.requests,
+            'errors': self.errors,
+            'fallback': self.fallback,
+            'key_pools': {
+                provider_id: {'keys': len(pool.keys), 'available': len(pool.available())}
+                for provider_id, (_, pool) in self.key_pools.items()
+            },
+            'breakers': {
+                provider_id: {'state': breaker.state, 'failures': breaker.failures}
+                for provider_id, breaker in self.breakers.items()
+            },
+            'pool': self.pool.stats()
+        }, ensure_ascii=False).encode('utf-8')
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个客户端连接上的所有请求"""
+        # 限制写缓冲区，慢客户端会通过 drain() 反压到上游读取
+        writer.transport.set_write_buffer_limits(high=READ_CHUNK_SIZE)
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader, writer)
+                    if request is None:
+                        break
+                    self.requests += 1
+                    if request.target == '/_proxy/status':
+                        self.write_response(writer, 200, self.status_response(), request.keep_alive)
+                        keep_alive = request.keep_alive
+                    elif request.target == '/_proxy/metrics':
+                        self.write_response(writer, 200, self.metrics_response(), request.keep_alive)
+                        keep_alive = request.keep_alive
+                    else:
+                        keep_alive = await self.forward(request, writer)
+                except ProxyError as e:
+                    self.errors += 1
+                    self.write_response(writer, e.status, error_body(e.message), False)
+                    keep_alive = False
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError):
+            self.errors += 1
+        finally:
+            writer.close()
+
+    def write_response(self, writer: asyncio.StreamWriter, status: int, body: bytes, keep_alive: bool):
+        reasons = {200: 'OK', 400: 'Bad Request', 413: 'Payload Too Large', 502: 'Bad Gateway',
+                   503: 'Service Unavailable', 504: 'Gateway Timeout'}
+        head = (
+            f"HTTP/1.1 {status} {reasons.get(status, 'Error')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+
+    async def serve_forever(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, ready=None):
+        server = await asyncio.start_server(self.handle_client, host, port, limit=READ_CHUNK_SIZE)
+        if ready:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.close_all()
+
+
+def serve(config_manager, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, ready=None,
+          access_log: bool = False, fallback: Optional[List[str]] = None,
+          hedge_delay: float = DEFAULT_HEDGE_DELAY):
+    """启动代理（阻塞直到被中断）"""
+    proxy = RoutingProxy(config_manager, access_log=access_log, fallback=fallback, hedge_delay=hedge_delay)
+    asyncio.run(proxy.serve_forever(host, port, ready))
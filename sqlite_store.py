@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 提供商配置的 SQLite 存储
+每个提供商一行，按 id 主键和 name / base_url / tag 索引查询；单个提供商的读取和修改
+只涉及对应的行，不需要解析和重写整个配置。使用 WAL 模式，读取不会被写入阻塞。
+"""
+
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tracing import span
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS providers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    base_url TEXT NOT NULL DEFAULT '',
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_providers_name ON providers(name);
+CREATE INDEX IF NOT EXISTS idx_providers_base_url ON providers(base_url);
+CREATE INDEX IF NOT EXISTS idx_providers_position ON providers(position);
+CREATE TABLE IF NOT EXISTS provider_tags (
+    provider_id TEXT NOT NULL REFERENCES providers(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (provider_id, tag)
+);
+CREATE INDEX IF NOT EXISTS idx_provider_tags_tag ON provider_tags(tag);
+"""
+
+
+def _provider_tags(provider: Dict) -> List[str]:
+    tags = provider.get('tags') or []
+    return sorted({tag for tag in tags if isinstance(tag, str) and tag})
+
+
+class SqliteProviderStore:
+    """providers.db 存储，接口与 JsonProviderStore 相同
+
+    read() 返回的完整文档按 PRAGMA data_version 缓存：其他连接提交修改后才重新加载，
+    本连接的修改直接同步到缓存中。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.files = [self.path, Path(f"{self.path}-wal")]
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._version = None
+        self._data = None
+
+    def connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # 数据库中包含 API Key。先以 0600 创建数据库文件，SQLite 创建 -wal / -shm 时沿用数据库文件的权限；
+            # 之前的版本按 umask 创建的文件在这里一并修正
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+            conn = sqlite3.connect(str(self.path), timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            for path in (self.path, f"{self.path}-wal", f"{self.path}-shm"):
+                try:
+                    os.chmod(path, 0o600)
+                except FileNotFoundError:
+                    pass
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            self._version = None
+            self._data = None
+
+    def _data_version(self) -> int:
+        return self.connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def _cache_valid(self) -> bool:
+        return self._version is not None and self._version == self._data_version()
+
+    def initialized(self) -> bool:
+        """是否已经写入过配置（未初始化时由调用方使用默认配置）"""
+        if self._cache_valid():
+            return self._data is not None
+        row = self.connection().execute("SELECT value FROM meta WHERE key = 'initialized'").fetchone()
+        return row is not None
+
+    def read(self) -> Optional[Dict]:
+        """读取完整文档（返回值只读），未初始化时返回 None"""
+        if self._cache_valid():
+            self.hits += 1
+            return self._data
+
+        self.misses += 1
+        conn = self.connection()
+        with span('sqlite.load', 'io', path=self.path.name):
+            version = self._data_version()
+            if self.initialized():
+                rows = conn.execute("SELECT id, data FROM providers ORDER BY position")
+                data = {'providers': {provider_id: json.loads(text) for provider_id, text in rows}}
+            else:
+                data = None
+        self._version = version
+        self._data = data
+        return data
+
+    def get(self, provider_id: str) -> Optional[Dict]:
+        """按主键读取单个提供商（返回值只读）"""
+        if self._cache_valid():
+            self.hits += 1
+            return self._data['providers'].get(provider_id) if self._data else None
+        row = self.connection().execute(
+            "SELECT data FROM providers WHERE id = ?", (provider_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter(self) -> Iterator[Tuple[str, Dict]]:
+        """按顺序逐行读取提供商，不加载整个表"""
+        if self._cache_valid():
+            yield from (self._data['providers'].items() if self._data else ())
+            return
+        # 使用独立的游标逐行取出，内存占用与行数无关
+        for provider_id, text in self.connection().execute(
+                "SELECT id, data FROM providers ORDER BY position"):
+            yield provider_id, json.loads(text)
+
+    def find(self, tag: Optional[str] = None, name: Optional[str] = None,
+             base_url: Optional[str] = None) -> List[str]:
+        """按索引查询提供商ID"""
+        sql = "SELECT p.id FROM providers p"
+        conditions, params = [], []
+        if tag is not None:
+            sql += " JOIN provider_tags t ON t.provider_id = p.id"
+            conditions.append("t.tag = ?")
+            params.append(tag)
+        if name is not None:
+            conditions.append("p.name = ?")
+            params.append(name)
+        if base_url is not None:
+            conditions.append("p.base_url = ?")
+            params.append(base_url)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY p.position"
+        return [row[0] for row in self.connection().execute(sql, params)]
+
+    def _upsert(self, conn: sqlite3.Connection, provider_id: str, provider: Dict) -> str:
+        text = json.dumps(provider, ensure_ascii=False)
+        conn.execute(
+            "INSERT INTO providers (id, name, base_url, position, data) VALUES "
+            "(?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM providers), ?) "
+            "ON CONFLICT(id) DO UPDATE SET name = excluded.name, base_url = excluded.base_url, "
+            "data = excluded.data",
+            (provider_id, provider.get('name', ''), provider.get('base_url', ''), text))
+        conn.execute("DELETE FROM provider_tags WHERE provider_id = ?", (provider_id,))
+        conn.executemany("INSERT INTO provider_tags (provider_id, tag) VALUES (?, ?)",
+                         [(provider_id, tag) for tag in _provider_tags(provider)])
+        return text
+
+    def _mark_initialized(self, conn: sqlite3.Connection):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('initialized', '1')")
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                     (str(SCHEMA_VERSION),))
+
+    def write(self, data: Dict):
+        """整体替换所有提供商（用于导入和迁移）"""
+        conn = self.connection()
+        with span('sqlite.write', 'io', path=self.path.name, rows=len(data['providers'])):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM provider_tags")
+                conn.execute("DELETE FROM providers")
+                conn.executemany(
+                    "INSERT INTO providers (id, name, base_url, position, data) VALUES (?, ?, ?, ?, ?)",
+                    [(provider_id, provider.get('name', ''), provider.get('base_url', ''), position,
+                      json.dumps(provider, ensure_ascii=False))
+                     for position, (provider_id, provider) in enumerate(data['providers'].items(), 1)])
+                conn.executemany(
+                    "INSERT INTO provider_tags (provider_id, tag) VALUES (?, ?)",
+                    [(provider_id, tag) for provider_id, provider in data['providers'].items()
+                     for tag in _provider_tags(provider)])
+                self._mark_initialized(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        # 下次读取时重新加载
+        self._version = None
+        self._data = None
+
+    def apply(self, changes: Dict[str, Optional[Dict]]):
+        """只写入修改过的提供商（值为 None 表示删除）"""
+        conn = self.connection()
+        cache_valid = self._cache_valid()
+        with span('sqlite.apply', 'io', path=self.path.name, rows=len(changes)):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                texts = {}
+                for provider_id, provider in changes.items():
+                    if provider is None:
+                        conn.execute("DELETE FROM providers WHERE id = ?", (provider_id,))
+                    else:
+                        texts[provider_id] = self._upsert(conn, provider_id, provider)
+                self._mark_initialized(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                self._version = None
+                self._data = None
+                raise
+
+        if not cache_valid or self._data is None:
+            return
+        # 本连接的提交不会改变 data_version，直接更新缓存（解码得到独立的副本）
+        providers = self._data['providers']
+        for provider_id, provider in changes.items():
+            if provider is None:
+                providers.pop(provider_id, None)
+            else:
+                providers[provider_id] = json.loads(texts[provider_id])
+
+    def apply_stream(self, changes: Iterable[Tuple[str, Optional[Dict]]]) -> int:
+        """在一个事务中逐条写入修改（None 表示删除），返回写入的条数
+
+        不需要把全部修改放进内存；changes 抛出异常时回滚。没有任何修改时不提交写事务。
+        """
+        conn = self.connection()
+        written = 0
+        with span('sqlite.apply_stream', 'io', path=self.path.name):
+            try:
+                for provider_id, provider in changes:
+                    if not written:
+                        conn.execute("BEGIN IMMEDIATE")
+                    if provider is None:
+                        conn.execute("DELETE FROM providers WHERE id = ?", (provider_id,))
+                    else:
+                        self._upsert(conn, provider_id, provider)
+                    written += 1
+                if written:
+                    self._mark_initialized(conn)
+                    conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                if written:
+                    self._version = None
+                    self._data = None
+        return written
+
+    def count(self) -> int:
+        return self.connection().execute("SELECT COUNT(*) FROM providers").fetchone()[0]
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses}
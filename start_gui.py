@@ -8,14 +8,11 @@ Claude Code 配置管理器启动脚本
 import sys
 import subprocess
 import os
+from importlib.util import find_spec
 
 def check_dependencies():
-    """检查依赖"""
-    try:
-        import PySide6
-        return True
-    except ImportError:
-        return False
+    """检查依赖（只查找模块，不导入 PySide6，导入由 GUI 完成）"""
+    return find_spec('PySide6') is not None
 
 def install_dependencies():
     """安装依赖"""
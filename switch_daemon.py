@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 切换守护进程
+常驻内存保存已解析的配置，通过 Unix 域套接字响应 list/switch/status 请求，
+让 claude-switch 无需每次重新加载配置。守护进程未运行时客户端返回 None，由调用方回退到进程内执行。
+
+客户端（request_daemon）在 claude-switch 的启动路径上，只导入 json、os、socket 和 sys：
+不使用 pathlib 和 typing（注解不在运行时求值），tracing 只在已经通过 --trace 启用时使用。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sys
+
+# 客户端默认超时（秒）；切换需要写入配置文件，超时更长
+DEFAULT_TIMEOUT = 0.5
+SWITCH_TIMEOUT = 5.0
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+
+def default_socket_path() -> str:
+    """守护进程套接字路径，可通过 CLAUDE_CONFIG_DAEMON_SOCKET 覆盖"""
+    override = os.environ.get('CLAUDE_CONFIG_DAEMON_SOCKET')
+    if override:
+        return override
+    return os.path.join(os.path.expanduser('~'), '.claude_code_config', 'daemon.sock')
+
+
+def request_daemon(request: dict, socket_path: str | os.PathLike | None = None,
+                   timeout: float = DEFAULT_TIMEOUT) -> dict | None:
+    """向守护进程发送请求，守护进程不可用时返回 None"""
+    if not hasattr(socket, 'AF_UNIX') or os.environ.get('CLAUDE_CONFIG_NO_DAEMON'):
+        return None
+    path = os.fspath(socket_path or default_socket_path())
+    if not os.path.exists(path):
+        return None
+    # 只有 --trace 已经导入并启用了 tracing 时才记录耗时
+    tracing = sys.modules.get('tracing')
+    if tracing is not None and tracing.is_enabled():
+        with tracing.span('request_daemon', 'ipc', cmd=request.get('cmd')):
+            return _exchange(path, request, timeout)
+    return _exchange(path, request, timeout)
+
+
+def _exchange(path: str, request: dict, timeout: float) -> dict | None:
+    """发送一行 JSON 请求并读取一行 JSON 响应，失败时返回 None
+
+    请求发出后等待响应超时时返回错误响应而不是 None：守护进程可能仍在执行这个请求（例如切换），
+    调用方回退到进程内再执行一次会重复切换，并与守护进程争用 rc 文件和环境文件。
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+            data = b''
+            try:
+                while not data.endswith(b'\n') and len(data) < MAX_MESSAGE_SIZE:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    data += chunk
+            except socket.timeout:
+                return {'ok': False, 'error': f"守护进程在 {timeout:g} 秒内没有响应，操作可能仍在进行，"
+                                              f"请稍后用 --status 确认"}
+        response = json.loads(data.decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    return response if isinstance(response, dict) else None
+
+
+def _public_provider(provider_id: str, info: dict) -> dict:
+    """去掉 API Key 后的提供商信息"""
+    return {
+        'id': provider_id,
+        'name': info.get('name', provider_id),
+        'description': info.get('description', ''),
+        'base_url': info.get('base_url', ''),
+        'is_current': info.get('is_current', False),
+        'is_configured': info.get('is_configured', False)
+    }
+
+
+def handle_request(config_manager, request: dict) -> dict:
+    """处理单个请求"""
+    command = request.get('cmd')
+
+    if command == 'ping':
+        return {'ok': True, 'pid': os.getpid(), 'lock': config_manager.lock_stats()}
+
+    if command == 'list':
+        providers = config_manager.list_providers()
+        return {
+            'ok': True,
+            'current': config_manager.get_current_provider(),
+            'providers': [_public_provider(pid, info) for pid, info in providers.items()]
+        }
+
+    if command == 'switch':
+        provider_id = request.get('provider')
+        if not isinstance(provider_id, str) or not provider_id:
+            return {'ok': False, 'error': "缺少提供商ID"}
+        if not config_manager.switch_provider(provider_id, update_env=request.get('update_env', True)):
+            return {'ok': False, 'error': f"提供商 '{provider_id}' 不存在或未配置"}
+        provider = config_manager.get_provider(provider_id)
+        return {'ok': True, 'provider': _public_provider(provider_id, {**provider, 'is_current': True})}
+
+    if command == 'status':
+        current = config_manager.get_current_provider()
+        provider = config_manager.get_provider(current) if current else None
+        return {
+            'ok': True,
+            'current': current,
+            'provider': _public_provider(current, provider) if provider else None
+        }
+
+    return {'ok': False, 'error': f"未知命令: {command}"}
+
+
+def serve_daemon(config_manager, socket_path: str | os.PathLike | None = None, ready=None):
+    """在前台运行守护进程（阻塞直到收到 shutdown 请求或被中断）"""
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError("当前平台不支持 Unix 域套接字")
+
+    path = os.fspath(socket_path or default_socket_path())
+    if request_daemon({'cmd': 'ping'}, path) is not None:
+        raise OSError(f"守护进程已在运行: {path}")
+    if os.path.exists(path):
+        # 上次异常退出留下的套接字文件
+        os.unlink(path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen(64)
+    if ready:
+        ready(path)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                conn.settimeout(SWITCH_TIMEOUT)
+                try:
+                    data = b''
+                    while not data.endswith(b'\n') and len(data) < MAX_MESSAGE_SIZE:
+                        chunk = conn.recv(65536)
+                        if not chunk:
+                            break
+                        data += chunk
+                    try:
+                        request = json.loads(data.decode('utf-8'))
+                        if not isinstance(request, dict):
+                            raise ValueError
+                    except ValueError:
+                        response = {'ok': False, 'error': "无效的请求"}
+                    else:
+                        if request.get('cmd') == 'shutdown':
+                            conn.sendall(b'{"ok": true}\n')
+                            break
+                        try:
+                            response = handle_request(config_manager, request)
+                        except Exception as e:
+                            # 等待配置锁超时、配置文件损坏等：把原因返回给客户端，守护进程继续运行
+                            print(f"守护进程请求处理失败: {e!r}", file=sys.stderr)
+                            response = {'ok': False, 'error': str(e) or e.__class__.__name__}
+                    conn.sendall(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                except OSError as e:
+                    print(f"守护进程请求处理失败: {e}", file=sys.stderr)
+    finally:
+        server.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
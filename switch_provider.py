@@ -7,53 +7,148 @@ Claude Code 提供商快速切换脚本
 
 import sys
 import os
-from config_manager import ConfigManager
+from switch_daemon import request_daemon, SWITCH_TIMEOUT
+
+def print_usage():
+    """显示使用方法"""
+    print("\n使用方法:")
+    print(f"  python {sys.argv[0]} <provider_id>")
+    print(f"  python {sys.argv[0]} --status")
+    print(f"  python {sys.argv[0]} --trace trace.json <provider_id>   # 记录各阶段耗时")
+    print(f"  eval \"$(python {sys.argv[0]} --print-env <provider_id>)\"")
+    print("\n示例:")
+    print(f"  python {sys.argv[0]} qwen     # 切换到通义千问")
+    print(f"  python {sys.argv[0]} kimi     # 切换到Kimi")
+    print(f"  python {sys.argv[0]} zhipu    # 切换到智谱GLM-4.5")
+
+def print_providers(providers):
+    """显示可用提供商"""
+    print("Claude Code 提供商快速切换")
+    print("=" * 40)
+
+    print("可用提供商:")
+    for provider_id, info in providers.items():
+        if info['is_configured']:
+            status = "✓ 当前" if info['is_current'] else "○ 可用"
+            print(f"  {status} {provider_id}: {info['name']}")
+
+    print_usage()
+
+def print_switched(provider_name, base_url, api_key_set):
+    """显示切换结果"""
+    print(f"✓ 已成功切换到: {provider_name}")
+    print(f"  Base URL: {base_url}")
+    print(f"  API Key: {'已设置' if api_key_set else '未设置'}")
+
+def print_switch_failed(provider_id, error=None):
+    print(f"✗ 切换失败: {error or f'提供商 {provider_id!r} 不存在或未配置'}")
+    print("\n请先使用GUI界面或命令行工具配置提供商:")
+    print("  python config_manager.py list")
+
+def print_env(provider_id):
+    """输出环境变量语句供 eval 使用，只影响当前 shell，不写入任何文件"""
+    from config_manager import ConfigManager, detect_shell
+    exports = ConfigManager().render_env(provider_id, detect_shell())
+    if exports is None:
+        print(f"✗ 提供商 '{provider_id}' 不存在或未配置", file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.write(exports)
+
+def print_daemon_error(response):
+    """输出守护进程返回的错误并以 1 退出"""
+    print(f"✗ {response.get('error') or '守护进程请求失败'}", file=sys.stderr)
+    sys.exit(1)
+
+def run_with_daemon():
+    """通过常驻守护进程执行，守护进程未运行时返回 False"""
+    if len(sys.argv) < 2:
+        response = request_daemon({'cmd': 'list'})
+        if response is None:
+            return False
+        if not response.get('ok'):
+            print_daemon_error(response)
+        print_providers({item['id']: item for item in response['providers']})
+        return True
+
+    if sys.argv[1] == '--status':
+        response = request_daemon({'cmd': 'status'})
+        if response is None:
+            return False
+        if not response.get('ok'):
+            print_daemon_error(response)
+        provider = response.get('provider')
+        if provider:
+            print(f"当前提供商: {provider['name']} ({provider['id']})")
+            print(f"  Base URL: {provider['base_url']}")
+        else:
+            print("当前提供商: 未设置")
+        return True
+
+    provider_id = sys.argv[1].lower()
+    response = request_daemon({'cmd': 'switch', 'provider': provider_id}, timeout=SWITCH_TIMEOUT)
+    if response is None:
+        return False
+    if response.get('ok'):
+        provider = response['provider']
+        print_switched(provider['name'], provider['base_url'], True)
+    else:
+        print_switch_failed(provider_id, response.get('error'))
+    return True
 
 def main():
     """主函数"""
+    if len(sys.argv) >= 3 and sys.argv[1] == '--trace':
+        from tracing import start_tracing
+        start_tracing(sys.argv[2])
+        del sys.argv[1:3]
+
+    if len(sys.argv) >= 2 and sys.argv[1] == '--print-env':
+        if len(sys.argv) < 3:
+            print_usage()
+            sys.exit(1)
+        print_env(sys.argv[2].lower())
+        return
+
+    if run_with_daemon():
+        return
+
+    # 守护进程未运行，在当前进程中执行
+    from config_manager import ConfigManager
     config_manager = ConfigManager()
-    
+
     if len(sys.argv) < 2:
-        # 显示可用提供商
-        print("Claude Code 提供商快速切换")
-        print("=" * 40)
-        
-        providers = config_manager.list_providers()
-        current = config_manager.get_current_provider()
-        
-        print("可用提供商:")
-        for provider_id, info in providers.items():
-            if info['is_configured']:
-                status = "✓ 当前" if info['is_current'] else "○ 可用"
-                print(f"  {status} {provider_id}: {info['name']}")
-        
-        print("\n使用方法:")
-        print(f"  python {sys.argv[0]} <provider_id>")
-        print("\n示例:")
-        print(f"  python {sys.argv[0]} qwen     # 切换到通义千问")
-        print(f"  python {sys.argv[0]} kimi     # 切换到Kimi")
-        print(f"  python {sys.argv[0]} zhipu    # 切换到智谱GLM-4.5")
+        print_providers(config_manager.list_providers())
+        return
+
+    if sys.argv[1] == '--status':
+        env_info = config_manager.get_current_env_info()
+        current = env_info['current_provider']
+        provider = config_manager.get_provider(current) if current else None
+        if provider:
+            print(f"当前提供商: {provider['name']} ({current})")
+            print(f"  Base URL: {provider['base_url']}")
+        else:
+            print("当前提供商: 未设置")
         return
-    
+
     provider_id = sys.argv[1].lower()
-    
+
     # 尝试切换
     if config_manager.switch_provider(provider_id):
-        providers = config_manager.load_providers()
-        if provider_id in providers['providers']:
-            provider_name = providers['providers'][provider_id]['name']
-            print(f"✓ 已成功切换到: {provider_name}")
-            
+        provider = config_manager.get_provider(provider_id)
+        if provider:
             # 显示当前环境变量
             env_info = config_manager.get_current_env_info()
-            print(f"  Base URL: {env_info['base_url']}")
-            print(f"  API Key: {'已设置' if env_info['api_key'] else '未设置'}")
+            print_switched(provider['name'], env_info['base_url'], bool(env_info['api_key']))
         else:
             print(f"✓ 已切换到: {provider_id}")
     else:
-        print(f"✗ 切换失败: 提供商 '{provider_id}' 不存在或未配置")
-        print("\n请先使用GUI界面或命令行工具配置提供商:")
-        print("  python config_manager.py list")
+        print_switch_failed(provider_id)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    try:
+        main()
+    except TimeoutError as e:
+        # 等待配置锁超时（config_manager.ConfigLockTimeout）
+        print(f"✗ {e}", file=sys.stderr)
+        sys.exit(1)
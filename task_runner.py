@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 多提供商并行任务执行器
+把一批任务同时分派给多个提供商，每个提供商按权重限制并发数；
+子进程通过环境变量指定提供商，某个提供商持续失败时熔断并把任务重新排队到其他提供商。
+"""
+
+import asyncio
+import json
+import os
+import shlex
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from http_common import CircuitBreaker
+
+DEFAULT_COMMAND = 'claude -p {prompt}'
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 30.0
+
+
+def parse_weights(spec: str) -> Dict[str, int]:
+    """解析 "kimi:4,qwen:2" 形式的提供商并发权重（省略权重时为 1）"""
+    weights = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        provider_id, _, weight = item.partition(':')
+        try:
+            weights[provider_id.strip()] = int(weight) if weight else 1
+        except ValueError:
+            raise ValueError(f"无效的并发权重: {item}")
+        if weights[provider_id.strip()] < 1:
+            raise ValueError(f"并发权重必须大于 0: {item}")
+    return weights
+
+
+def load_tasks(lines: Iterable[str]) -> List[Dict]:
+    """读取 JSON Lines 格式的任务列表
+
+    每行是一个字符串（作为 prompt）或对象：{"id": ..., "prompt": ...} 或 {"id": ..., "args": [...]}，
+    args 为完整的命令行，会替代命令模板。空行和 # 开头的行会被忽略。
+    """
+    tasks = []
+    seen = set()
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"第 {line_no} 行不是有效的JSON: {e}")
+        if isinstance(item, str):
+            item = {'prompt': item}
+        if not isinstance(item, dict):
+            raise ValueError(f"第 {line_no} 行必须是字符串或对象")
+        args = item.get('args')
+        if args is not None and (not isinstance(args, list) or not args
+                                 or not all(isinstance(arg, str) for arg in args)):
+            raise ValueError(f"第 {line_no} 行的 args 必须是非空的字符串列表")
+        if args is None and not isinstance(item.get('prompt'), str):
+            raise ValueError(f"第 {line_no} 行缺少 prompt 或 args")
+        task_id = str(item.get('id') or f"task-{len(tasks) + 1}")
+        if task_id in seen:
+            raise ValueError(f"第 {line_no} 行的任务ID重复: {task_id}")
+        seen.add(task_id)
+        tasks.append({'id': task_id, 'prompt': item.get('prompt', ''), 'args': args})
+    return tasks
+
+
+def build_command(template: List[str], task: Dict) -> List[str]:
+    """根据命令模板生成任务的命令行，替换 {prompt} 和 {id} 占位符"""
+    if task['args']:
+        return list(task['args'])
+    return [arg.replace('{prompt}', task['prompt']).replace('{id}', task['id']) for arg in template]
+
+
+class TaskRunner:
+    """按提供商权重并发执行任务
+
+    每个提供商启动与权重相同数量的工作协程，从共享队列中领取任务。失败的任务
+    优先交给尚未尝试过的健康提供商；提供商连续失败达到阈值后熔断，期间不再领取任务。
+    """
+
+    def __init__(self, config_manager, weights: Dict[str, int], command: str = DEFAULT_COMMAND,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, timeout: Optional[float] = None,
+                 output_dir: Optional[Path] = None,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+                 on_event: Optional[Callable[[Dict], None]] = None):
+        self.config_manager = config_manager
+        self.weights = dict(weights)
+        self.template = shlex.split(command)
+        self.max_attempts = max(1, max_attempts)
+        self.timeout = timeout
+        self.output_dir = output_dir
+        self.on_event = on_event
+        self.providers = {}
+        self.key_pools = {}
+        self.breakers = {}
+        for provider_id in self.weights:
+            provider = config_manager.get_provider(provider_id)
+            if not provider or not provider.get('base_url'):
+                raise KeyError(provider_id)
+            pool = config_manager.get_key_pool(provider_id)
+            if not pool.keys:
+                raise KeyError(provider_id)
+            self.providers[provider_id] = provider
+            self.key_pools[provider_id] = pool
+            self.breakers[provider_id] = CircuitBreaker(failure_threshold, reset_timeout)
+        if not self.template:
+            raise ValueError("命令模板不能为空")
+
+    def emit(self, event: str, **fields):
+        if self.on_event:
+            self.on_event({'event': event, 'time': round(time.time(), 3), **fields})
+
+    def provider_env(self, provider_id: str) -> Dict[str, str]:
+        """子进程的环境变量（Key 池只在内存中轮询，不写入任何文件）"""
+        env = dict(os.environ)
+        env['ANTHROPIC_BASE_URL'] = self.providers[provider_id]['base_url']
+        env['ANTHROPIC_AUTH_TOKEN'] = self.key_pools[provider_id].acquire()
+        return env
+
+    def _available(self, provider_id: str) -> bool:
+        breaker = self.breakers[provider_id]
+        if breaker.state != CircuitBreaker.OPEN:
+            return True
+        return time.monotonic() - breaker.opened_at >= breaker.reset_timeout
+
+    def _next_task(self, provider_id: str) -> Optional[Dict]:
+        """为提供商挑选任务：跳过已在该提供商失败、且还有其他健康提供商可尝试的任务"""
+        healthy = {pid for pid in self.breakers if self._available(pid)}
+        for task in self.pending:
+            if provider_id not in task['tried'] or healthy <= task['tried']:
+                return task
+        return None
+
+    async def _execute(self, task: Dict, provider_id: str) -> Dict:
+        """启动子进程执行一次任务"""
+        command = build_command(self.template, task)
+        stdout = None
+        if self.output_dir:
+            stdout = open(self.output_dir / f"{task['id']}.log", 'wb')
+        start = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command, env=self.provider_env(provider_id), stdin=asyncio.subprocess.DEVNULL,
+                stdout=stdout, stderr=asyncio.subprocess.STDOUT if stdout else None)
+            try:
+                exit_code = await asyncio.wait_for(process.wait(), self.timeout)
+                error = '' if exit_code == 0 else f"退出码 {exit_code}"
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                exit_code, error = None, "超时"
+        except OSError as e:
+            exit_code, error = None, f"无法执行 {command[0]}: {e}"
+        finally:
+            if stdout:
+                stdout.close()
+        return {'exit_code': exit_code, 'error': error,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+    async def _worker(self, provider_id: str):
+        breaker = self.breakers[provider_id]
+        while True:
+            async with self.condition:
+                while True:
+                    if not self.unfinished:
+                        return
+                    task = self._next_task(provider_id)
+                    if task is not None and breaker.allow():
+                        self.pending.remove(task)
+                        break
+                    # 熔断期间定期醒来检查是否可以进入 half_open
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), 0.5)
+                    except asyncio.TimeoutError:
+                        pass
+
+            task['attempts'] += 1
+            task['tried'].add(provider_id)
+            self.emit('start', id=task['id'], provider=provider_id, attempt=task['attempts'])
+            outcome = await self._execute(task, provider_id)
+
+            async with self.condition:
+                if outcome['error'] == '':
+                    breaker.record_success()
+                    self.unfinished -= 1
+                    self.results[task['id']] = {
+                        'id': task['id'], 'ok': True, 'provider': provider_id,
+                        'attempts': task['attempts'], **outcome}
+                    self.emit('done', id=task['id'], provider=provider_id, **outcome)
+                else:
+                    was_open = breaker.state == CircuitBreaker.OPEN
+                    breaker.record_failure()
+                    if breaker.state == CircuitBreaker.OPEN and not was_open:
+                        self.emit('breaker_open', provider=provider_id,
+                                  reset_timeout=breaker.reset_timeout)
+                    if task['attempts'] < self.max_attempts:
+                        self.pending.appendleft(task)
+                        self.emit('retry', id=task['id'], provider=provider_id, **outcome)
+                    else:
+                        self.unfinished -= 1
+                        self.results[task['id']] = {
+                            'id': task['id'], 'ok': False, 'provider': provider_id,
+                            'attempts': task['attempts'], **outcome}
+                        self.emit('failed', id=task['id'], provider=provider_id, **outcome)
+                self.condition.notify_all()
+
+    async def run(self, tasks: List[Dict]) -> List[Dict]:
+        """执行全部任务，按输入顺序返回每个任务的最终结果"""
+        if self.output_dir:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.pending = deque(dict(task, attempts=0, tried=set()) for task in tasks)
+        self.unfinished = len(tasks)
+        self.results = {}
+        self.condition = asyncio.Condition()
+        workers = [self._worker(provider_id)
+                   for provider_id, weight in self.weights.items() for _ in range(weight)]
+        await asyncio.gather(*workers)
+        return [self.results[task['id']] for task in tasks]
+
+
+def run_tasks(config_manager, tasks: List[Dict], weights: Dict[str, int], **kwargs) -> List[Dict]:
+    """同步接口，供命令行调用"""
+    if not tasks:
+        return []
+    return asyncio.run(TaskRunner(config_manager, weights, **kwargs).run(tasks))
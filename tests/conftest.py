@@ -0,0 +1,18 @@
+"""测试公共设置：把仓库根目录加入 sys.path，并为 ConfigManager 提供独立的配置目录"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def config_manager(tmp_path, monkeypatch):
+    """使用临时 HOME 和配置目录的 ConfigManager，不连接守护进程"""
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('CLAUDE_CONFIG_NO_DAEMON', '1')
+    monkeypatch.delenv('CLAUDE_CONFIG_TRACE', raising=False)
+    from config_manager import ConfigManager
+    return ConfigManager(tmp_path / '.claude_code_config')
@@ -0,0 +1,220 @@
+"""config_core 的测试：rc 文件写入、配置锁、事务和批量操作"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import config_cli
+from config_core import ENV_HOOK_MARKER, LEGACY_ENV_MARKER, ConfigLock, ConfigLockTimeout
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+needs_flock = pytest.mark.skipif(fcntl is None, reason="需要 fcntl.flock")
+
+
+def test_rc_file_symlink_survives_rewrites(config_manager, tmp_path):
+    dotfiles = tmp_path / 'dotfiles'
+    dotfiles.mkdir()
+    target = dotfiles / 'bashrc'
+    target.write_text('alias ll="ls -l"\n', encoding='utf-8')
+    rc_file = tmp_path / '.bashrc'
+    rc_file.symlink_to(target)
+
+    config_manager.add_provider('a', 'A', 'http://a.invalid', 'k1')
+    config_manager._update_shell_config(rc_file, 'http://a.invalid', 'k1')
+    assert rc_file.is_symlink() and LEGACY_ENV_MARKER in target.read_text(encoding='utf-8')
+
+    assert config_manager.install_env_hook(rc_file) == rc_file
+    assert rc_file.is_symlink() and os.readlink(rc_file) == str(target)
+    content = target.read_text(encoding='utf-8')
+    assert ENV_HOOK_MARKER in content and LEGACY_ENV_MARKER not in content
+    assert content.startswith('alias ll="ls -l"\n')
+
+    config_manager.uninstall_env_hook(rc_file)
+    assert rc_file.is_symlink()
+    assert target.read_text(encoding='utf-8') == 'alias ll="ls -l"\n'
+
+
+def test_config_manager_module_keeps_names():
+    import config_core
+    import config_manager
+    # config_manager.py 只是入口，导入时仍提供拆分前的全部名称
+    assert config_manager.ConfigManager is config_core.ConfigManager
+    assert config_manager._strip_legacy_env_block is config_core._strip_legacy_env_block
+    assert callable(config_manager._atomic_write) and callable(config_manager.main)
+
+
+def hold_lock(path):
+    """用另一个文件句柄持有排他锁（与另一个进程持有时相同，flock 按打开的文件区分）"""
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+@needs_flock
+def test_lock_is_reentrant(tmp_path):
+    lock = ConfigLock(tmp_path / '.lock', timeout=0.1)
+    with lock.exclusive():
+        with lock.shared(), lock.exclusive():
+            pass
+        # 嵌套的持有释放后仍然持有锁
+        fd = os.open(str(tmp_path / '.lock'), os.O_RDWR)
+        try:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        finally:
+            os.close(fd)
+    with lock.shared():
+        with pytest.raises(RuntimeError):
+            with lock.exclusive():
+                pass
+    assert lock.stats()['acquired'] == 2 and lock.stats()['contended'] == 0
+    lock.close()
+
+
+@needs_flock
+def test_lock_waits_for_other_process(tmp_path):
+    path = tmp_path / '.lock'
+    holder = subprocess.Popen([sys.executable, '-c', textwrap.dedent(f"""
+        import fcntl, os, sys, time
+        fd = os.open({str(path)!r}, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        print('locked', flush=True)
+        time.sleep(0.3)
+    """)], stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == 'locked'
+        lock = ConfigLock(path, timeout=0.05)
+        with pytest.raises(ConfigLockTimeout):
+            with lock.shared():
+                pass
+        # 持有锁的进程退出后可以获取
+        lock.timeout = 10
+        with lock.exclusive():
+            pass
+        assert lock.stats()['contended'] == 2 and lock.stats()['acquired'] == 1
+        lock.close()
+    finally:
+        holder.wait(10)
+
+
+@needs_flock
+def test_cli_reports_lock_timeout(config_manager, monkeypatch, capsys):
+    config_manager.add_provider('a', 'A', 'http://a.invalid', 'k1')
+    monkeypatch.setenv('CLAUDE_CONFIG_LOCK_TIMEOUT', '0.05')
+    monkeypatch.setattr(sys, 'argv', ['config_manager.py', 'delete', 'a'])
+    fd = hold_lock(config_manager.lock_file)
+    try:
+        with pytest.raises(SystemExit) as exit_info:
+            config_cli.run()
+    finally:
+        os.close(fd)
+    assert exit_info.value.code == 1
+    assert "等待配置锁超过 0.05 秒" in capsys.readouterr().err
+    assert config_manager.get_provider('a') is not None
+
+
+def lock_is_free(path):
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def snapshot(config_manager):
+    return config_manager.config_file.read_bytes(), config_manager.current_config_file.read_bytes()
+
+
+@pytest.fixture
+def configured(config_manager):
+    config_manager.add_provider('a', 'A', 'http://a.invalid', 'k1')
+    config_manager.add_provider('b', 'B', 'http://b.invalid', 'k2')
+    config_manager.switch_provider('a', update_env=False)
+    return config_manager
+
+
+def test_failed_transaction_writes_nothing(configured):
+    before = snapshot(configured)
+    with pytest.raises(ZeroDivisionError):
+        with configured.transaction():
+            configured.add_provider('c', 'C', 'http://c.invalid', 'k3')
+            configured.delete_provider('b')
+            configured.set_current_provider('c')
+            1 / 0
+    assert snapshot(configured) == before
+    assert configured.get_current_provider() == 'a' and configured.get_provider('c') is None
+    assert configured.get_provider('b') is not None
+
+
+@needs_flock
+def test_transaction_locks_on_first_read(configured):
+    with configured.transaction():
+        configured.add_provider('c', 'C', 'http://c.invalid', 'k3')
+        # 只写入不读取时不持有锁
+        assert lock_is_free(configured.lock_file)
+        configured.get_provider('a')
+        assert not lock_is_free(configured.lock_file)
+        configured.update_provider('a', description='changed')
+    assert lock_is_free(configured.lock_file)
+    assert configured.get_provider('a')['description'] == 'changed' and configured.get_provider('c')
+
+
+def batch(*operations):
+    return [json.dumps(operation) for operation in operations]
+
+
+def test_atomic_batch_failure_leaves_files_unchanged(configured):
+    before = snapshot(configured)
+    report = configured.apply_batch(batch(
+        {'op': 'add', 'id': 'c', 'name': 'C', 'base_url': 'http://c.invalid', 'api_key': 'k3'},
+        {'op': 'switch', 'id': 'c'},
+        {'op': 'delete', 'id': 'b'},
+        {'op': 'update', 'id': 'missing', 'description': 'x'},
+        {'op': 'add', 'id': 'd', 'name': 'D', 'base_url': 'http://d.invalid'},
+    ), atomic=True)
+    assert not report['committed'] and report['applied'] == 0
+    # 出错之后的操作没有执行，不出现在结果中
+    assert [result['ok'] for result in report['results']] == [True, True, True, False]
+    assert snapshot(configured) == before
+    assert configured.get_current_provider() == 'a' and configured.get_provider('c') is None
+
+    # 格式错误在应用任何操作之前发现
+    report = configured.apply_batch(batch({'op': 'delete', 'id': 'b'}, {'op': 'bogus', 'id': 'x'}), atomic=True)
+    assert not report['committed'] and [result['line'] for result in report['results']] == [2]
+    assert snapshot(configured) == before
+
+
+def test_non_atomic_batch_skips_failed_operations(configured):
+    report = configured.apply_batch(batch(
+        {'op': 'delete', 'id': 'b'},
+        {'op': 'update', 'id': 'missing', 'description': 'x'},
+        {'op': 'switch', 'id': 'nope'},
+    ) + ['not json'], atomic=False)
+    assert report['committed'] and report['applied'] == 1 and report['failed'] == 3
+    assert configured.get_provider('b') is None and configured.get_current_provider() == 'a'
+
+
+@needs_flock
+def test_batch_input_is_read_without_lock(configured):
+    def lines():
+        # 读取输入期间（可能是很慢的管道）不持有配置锁
+        for line in batch({'op': 'add', 'id': 'c', 'name': 'C', 'base_url': 'http://c.invalid', 'api_key': 'k3'},
+                          {'op': 'switch', 'id': 'c'}):
+            assert lock_is_free(configured.lock_file)
+            yield line
+        assert lock_is_free(configured.lock_file)
+
+    report = configured.apply_batch(lines(), atomic=True)
+    assert report['committed'] and report['applied'] == 2
+    assert configured.get_current_provider() == 'c'
@@ -0,0 +1,87 @@
+"""config_history 的测试：内容寻址的对象、定期完整清单、清理后还原"""
+
+import config_history
+from config_history import FULL_SNAPSHOT_EVERY, ConfigHistory, object_id
+
+
+def provider(n, url='http://a.invalid'):
+    return {'name': f"P{n}", 'base_url': url, 'api_key': f"k{n}"}
+
+
+def object_files(history):
+    return sorted(path for path in history.objects_dir.glob('??/*'))
+
+
+def test_identical_objects_are_stored_once(tmp_path):
+    history = ConfigHistory(tmp_path / 'history')
+    first = history.put({'name': 'A', 'api_key': 'k'})
+    # 指纹按排序后的内容计算，字段顺序不同也是同一个对象
+    assert history.put({'api_key': 'k', 'name': 'A'}) == first == object_id({'name': 'A', 'api_key': 'k'})
+    assert len(object_files(history)) == 1
+
+    history.commit_providers([('a', provider(1)), ('b', provider(2))], 'a', "初始版本")
+    history.commit_providers([('a', provider(1)), ('b', provider(2, 'http://b.invalid'))], None, "修改 b")
+    # 第二个版本只记录修改过的 b，a 的配置只保存一份
+    assert len(object_files(history)) == 4
+    assert history._read_rev(history.head()['rev'])['changes'] == {'b': object_id(provider(2, 'http://b.invalid'))}
+
+
+def test_full_manifest_every_n_revisions(tmp_path):
+    history = ConfigHistory(tmp_path / 'history', keep=1000)
+    history.commit_providers([('a', provider(0))], 'a')
+    expected = {}
+    for n in range(1, FULL_SNAPSHOT_EVERY + 5):
+        expected[n] = history.commit({f"p{n}": history.put(provider(n))}, message=str(n))
+
+    entries = history.entries()
+    assert [entry['depth'] for entry in entries[FULL_SNAPSHOT_EVERY - 1:FULL_SNAPSHOT_EVERY + 2]] == \
+        [FULL_SNAPSHOT_EVERY - 1, 0, 1]
+    full = history._read_rev(expected[FULL_SNAPSHOT_EVERY])
+    assert 'changes' not in full and len(full['providers']) == FULL_SNAPSHOT_EVERY + 1
+
+    manifest, current = history.manifest(expected[FULL_SNAPSHOT_EVERY + 4])
+    assert current == 'a' and list(manifest) == ['a'] + [f"p{n}" for n in range(1, FULL_SNAPSHOT_EVERY + 5)]
+
+
+def test_prune_then_restore_revision_before_prune_point(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_history, 'PRUNE_GRACE', -60)
+    history = ConfigHistory(tmp_path / 'history', keep=1000)
+    history.commit_providers([('a', provider(0))], 'a')
+    revs = [history.commit({'a': history.put(provider(n))}, message=str(n)) for n in range(1, 8)]
+    revs.append(history.commit({'b': history.put(provider(100))}, current='b'))
+    expected = {rev: history.manifest(rev) for rev in revs}
+
+    assert history.prune(keep=4) == 5
+    kept = [entry['rev'] for entry in history.entries()]
+    assert kept == revs[-4:] and history.entries()[0]['parent'] is None
+    # 最早保留的版本只记录了修改，它的完整清单写入 base.json
+    base = history._read_base()
+    assert base == {'rev': kept[0], 'providers': dict(expected[kept[0]][0])}
+    assert not any(history._rev_path(rev).exists() for rev in revs[:4])
+
+    history._manifest_cache = None
+    for rev in kept:
+        assert history.manifest(rev) == expected[rev]
+    # 不再被引用的对象被删除，基础清单引用的对象保留
+    oids = {path.parent.name + path.name for path in object_files(history)}
+    assert oids == {object_id(provider(n)) for n in (5, 6, 7, 100)}
+
+    later = history.commit({'a': history.put(provider(1))}, message="later")
+    history._manifest_cache = None
+    assert history.manifest(kept[0]) == expected[kept[0]]
+    assert history.manifest(later)[0] == {'a': object_id(provider(1)), 'b': object_id(provider(100))}
+
+
+def test_rollback_after_prune(config_manager):
+    config_manager.add_provider('a', 'A', 'http://a.invalid', 'k1')
+    for n in range(2, 6):
+        config_manager.update_provider('a', base_url=f"http://a{n}.invalid")
+    config_manager.add_provider('b', 'B', 'http://b.invalid', 'k2')
+    assert config_manager.set_history_keep(3) > 0
+
+    history = config_manager.history()
+    entry, diff = config_manager.rollback('HEAD~2')
+    assert entry['rev'] == history.entries()[0]['rev']
+    assert diff.removed == ['b'] and diff.changed == ['a']
+    assert config_manager.get_provider('b') is None
+    assert config_manager.get_provider('a')['base_url'] == 'http://a4.invalid'
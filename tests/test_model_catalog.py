@@ -0,0 +1,178 @@
+"""model_catalog 的测试：在后台线程运行离线的模型列表桩服务器"""
+
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from model_catalog import fetch_models, models_url, normalize_models, run_discovery
+
+ETAG = '"v1"'
+PAGES = {
+    None: {'data': [{'id': 'claude-a', 'display_name': 'A', 'created_at': '2025-01-01T00:00:00Z'},
+                    {'id': 'claude-b'}], 'has_more': True, 'last_id': 'claude-b'},
+    'claude-b': {'data': [{'id': 'claude-b'}, {'id': 'claude-c', 'created_at': 0}], 'has_more': False},
+}
+
+
+class CatalogServer:
+    """按路径返回不同响应的 HTTP/1.1 桩服务器，记录收到的请求"""
+
+    def __init__(self):
+        self.requests = []
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, '127.0.0.1', 0))
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def handle(self, reader, writer):
+        target = (await reader.readline()).decode('latin-1').split()[1]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        self.requests.append((target, headers))
+        parts = urlsplit(target)
+        await self.respond(writer, parts.path, parse_qs(parts.query), headers)
+        await writer.drain()
+        writer.close()
+
+    async def respond(self, writer, path, query, headers):
+        def send(status, body=b'', extra=()):
+            head = [f"HTTP/1.1 {status} Stub", f"Content-Length: {len(body)}", *extra]
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+        if path == '/anthropic/v1/models':
+            if headers.get('if-none-match') == ETAG and 'after_id' not in query:
+                send(304)
+            else:
+                page = PAGES[query.get('after_id', [None])[0]]
+                send(200, json.dumps(page).encode(), [f"ETag: {ETAG}"])
+        elif path == '/openai/v1/models':
+            body = json.dumps({'object': 'list', 'data': [{'id': 'gpt-x', 'owned_by': 'me', 'created': 0}]})
+            writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n")
+            for start in range(0, len(body), 7):
+                chunk = body[start:start + 7].encode()
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            writer.write(b"0\r\n\r\n")
+        elif path == '/denied/v1/models':
+            send(401, json.dumps({'error': {'type': 'authentication_error', 'message': 'bad key'}}).encode())
+        elif path == '/slow/v1/models':
+            await asyncio.sleep(2)
+            send(200, b'[]')
+        else:
+            send(404)
+
+
+@pytest.fixture
+def server():
+    server = CatalogServer()
+    yield server
+    server.close()
+
+
+def fetch(url, **kwargs):
+    return asyncio.run(fetch_models(url, 'test-key', **kwargs))
+
+
+def test_models_url():
+    assert models_url('https://api.example.com') == 'https://api.example.com/v1/models'
+    assert models_url('https://api.example.com/anthropic/') == 'https://api.example.com/anthropic/v1/models'
+    assert models_url('http://host:8080/api/v1') == 'http://host:8080/api/v1/models'
+    assert models_url('not a url') is None
+
+
+def test_normalize_models_formats():
+    assert normalize_models(['a', {'name': 'b'}, 3, {}])[0] == [
+        {'id': 'a', 'name': 'a', 'created': None}, {'id': 'b', 'name': 'b', 'created': None}]
+    models, cursor = normalize_models({'models': [{'model': 'm'}], 'has_more': True, 'last_id': 'm'})
+    assert models[0]['id'] == 'm' and cursor == 'm'
+    with pytest.raises(ValueError):
+        normalize_models({'object': 'error'})
+
+
+def test_fetch_follows_pages_and_sends_keys(server):
+    result = fetch(server.url + '/anthropic')
+    assert result['ok'] and result['status'] == 200 and result['etag'] == ETAG
+    assert [model['id'] for model in result['models']] == ['claude-a', 'claude-b', 'claude-c']
+    assert result['models'][0]['name'] == 'A'
+    assert result['models'][2]['created'] == '1970-01-01T00:00:00+00:00'
+    (first, first_headers), (second, _) = server.requests
+    assert first == '/anthropic/v1/models'
+    assert parse_qs(urlsplit(second).query)['after_id'] == ['claude-b']
+    assert first_headers['x-api-key'] == 'test-key'
+    assert first_headers['authorization'] == 'Bearer test-key'
+    assert first_headers['anthropic-version']
+
+
+def test_fetch_not_modified_with_etag(server):
+    result = fetch(server.url + '/anthropic', etag=ETAG)
+    assert result['ok'] and result['not_modified'] and result['models'] == []
+    assert len(server.requests) == 1
+
+
+def test_fetch_chunked_openai_format(server):
+    result = fetch(server.url + '/openai')
+    assert result['ok'] and result['etag'] is None
+    assert result['models'] == [{'id': 'gpt-x', 'name': 'gpt-x', 'created': '1970-01-01T00:00:00+00:00',
+                                 'owned_by': 'me'}]
+
+
+@pytest.mark.parametrize('path, kwargs, error', [
+    ('/denied', {}, 'HTTP 401: bad key'),
+    ('/missing', {}, 'HTTP 404'),
+    ('/slow', {'timeout': 0.3}, '超时'),
+])
+def test_fetch_errors(server, path, kwargs, error):
+    result = fetch(server.url + path, **kwargs)
+    assert not result['ok'] and result['error'] == error
+    assert result['elapsed_ms'] is not None
+
+
+def test_run_discovery_many(server):
+    results = run_discovery({
+        'a': {'base_url': server.url + '/anthropic', 'api_key': 'k'},
+        'o': {'base_url': server.url + '/openai', 'api_key': 'k'},
+        'bad': {'base_url': 'ftp://nowhere', 'api_key': 'k'},
+    })
+    assert len(results['a']['models']) == 3 and len(results['o']['models']) == 1
+    assert results['bad']['error'].startswith('无效的URL')
+    assert run_discovery({}) == {}
+
+
+def test_discover_models_cache(server, config_manager):
+    config_manager.add_provider('a', 'A', server.url + '/anthropic', 'k1')
+    config_manager.add_provider('d', 'D', server.url + '/denied', 'k2')
+
+    first = config_manager.discover_models()
+    assert len(first['a']['models']) == 3 and not first['a']['cached']
+    assert first['d']['error'] == 'HTTP 401: bad key'
+    requests = len(server.requests)
+
+    # 有效期内直接使用缓存；失败的条目会重新请求
+    second = config_manager.discover_models()
+    assert second['a']['cached'] and len(server.requests) == requests + 1
+
+    # 强制刷新时带上 ETag，304 时沿用缓存的列表
+    third = config_manager.discover_models(['a'], refresh=True)
+    assert third['a']['not_modified'] and len(third['a']['models']) == 3
+    assert server.requests[-1][1]['if-none-match'] == ETAG
+
+    # 更换 API Key 后缓存失效
+    config_manager.update_provider('a', api_key='k3')
+    assert not config_manager.discover_models(['a'])['a']['cached']
+
+    config_manager.delete_provider('d')
+    config_manager.discover_models(['a'], refresh=True)
+    cache = json.loads(config_manager.models_cache_file.read_text(encoding='utf-8'))
+    assert set(cache['providers']) == {'a'}
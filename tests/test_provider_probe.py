@@ -0,0 +1,176 @@
+"""provider_probe 的测试：使用本地 asyncio 桩服务器，不访问外部网络"""
+
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from provider_probe import percentile, probe_many, probe_url, rolling_score, summarize_samples
+
+
+async def read_request(reader):
+    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+        pass
+
+
+def respond(status, delay=0.0):
+    async def handler(reader, writer):
+        await read_request(reader)
+        await asyncio.sleep(delay)
+        writer.write(f"HTTP/1.1 {status} Stub\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        writer.close()
+    return handler
+
+
+async def close_immediately(reader, writer):
+    await read_request(reader)
+    writer.close()
+
+
+async def garbage(reader, writer):
+    await read_request(reader)
+    writer.write(b"SSH-2.0-OpenSSH\r\n")
+    await writer.drain()
+    writer.close()
+
+
+async def probe_stub(handler, **kwargs):
+    server = await asyncio.start_server(handler, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        return await probe_url(f"http://127.0.0.1:{port}/v1", **kwargs)
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_probe_measures_connect_and_ttfb():
+    sample = asyncio.run(probe_stub(respond(200, delay=0.2)))
+    assert sample['ok'] and sample['status'] == 200 and sample['error'] == ''
+    assert sample['connect_ms'] is not None and sample['tls_ms'] is None
+    assert sample['ttfb_ms'] >= 150
+    assert sample['total_ms'] >= sample['ttfb_ms']
+
+
+def test_probe_client_errors_count_as_reachable():
+    sample = asyncio.run(probe_stub(respond(404)))
+    assert sample['ok'] and sample['status'] == 404
+
+
+@pytest.mark.parametrize('handler, error', [
+    (respond(503), 'HTTP 503'),
+    (close_immediately, '连接被服务器关闭'),
+    (garbage, '无效的HTTP响应'),
+])
+def test_probe_error_classification(handler, error):
+    sample = asyncio.run(probe_stub(handler))
+    assert not sample['ok']
+    assert sample['error'] == error
+
+
+def test_probe_timeout():
+    sample = asyncio.run(probe_stub(respond(200, delay=2.0), timeout=0.2))
+    assert not sample['ok'] and sample['error'] == '超时'
+    assert sample['connect_ms'] is not None and sample['ttfb_ms'] is None
+
+
+def test_probe_connection_refused():
+    sample = asyncio.run(probe_url(f"http://127.0.0.1:{unused_port()}/"))
+    assert not sample['ok'] and sample['error']
+    assert sample['connect_ms'] is None
+
+
+def test_probe_invalid_url():
+    sample = asyncio.run(probe_url('ftp://example.com'))
+    assert not sample['ok'] and sample['error'].startswith('无效的URL')
+
+
+def test_probe_many_summarizes_each_target():
+    async def run():
+        good = await asyncio.start_server(respond(200), '127.0.0.1', 0)
+        bad = await asyncio.start_server(respond(502), '127.0.0.1', 0)
+        try:
+            return await probe_many({
+                'good': f"http://127.0.0.1:{good.sockets[0].getsockname()[1]}",
+                'bad': f"http://127.0.0.1:{bad.sockets[0].getsockname()[1]}",
+            }, samples=3)
+        finally:
+            good.close()
+            bad.close()
+
+    results = asyncio.run(run())
+    assert results['good']['ok'] and results['good']['samples'] == 3
+    assert results['good']['error_rate'] == 0 and results['good']['p50_ms'] is not None
+    assert not results['bad']['ok'] and results['bad']['error_rate'] == 1.0
+    assert results['bad']['last_error'] == 'HTTP 502' and results['bad']['p50_ms'] is None
+
+
+def test_summarize_samples_percentiles():
+    samples = [{'ok': True, 'status': 200, 'error': '', 'total_ms': float(ms), 'ttfb_ms': ms / 2,
+                'connect_ms': 1.0, 'tls_ms': None} for ms in range(1, 21)]
+    samples.append({'ok': False, 'status': None, 'error': '超时', 'total_ms': 3000.0, 'ttfb_ms': None,
+                    'connect_ms': None, 'tls_ms': None})
+    summary = summarize_samples(samples)
+    assert summary['p50_ms'] == 10.0 and summary['p95_ms'] == 19.0
+    assert summary['errors'] == 1 and summary['last_error'] == '超时'
+    assert summary['tls_ms'] is None
+    assert percentile([], 50) is None
+
+
+def test_rolling_score_decays_old_samples():
+    now = 10000.0
+    history = [{'at': now - 600, 'p50_ms': 100.0, 'error_rate': 0.0},
+               {'at': now, 'p50_ms': 300.0, 'error_rate': 0.0}]
+    # 一个半衰期之前的样本权重为 0.5：(0.5 * 100 + 300) / 1.5
+    assert rolling_score(history, now, half_life=600)['latency_ms'] == pytest.approx(233.33, abs=0.01)
+    # 半衰期越短，旧样本的影响越小
+    assert rolling_score(history, now, half_life=60)['latency_ms'] == pytest.approx(300.0, abs=0.5)
+
+
+def test_rolling_score_penalizes_errors():
+    now = 10000.0
+    flaky = rolling_score([{'at': now, 'p50_ms': 100.0, 'error_rate': 0.5}], now, 600)
+    assert flaky['score'] == 200.0 and flaky['error_rate'] == 0.5
+    down = rolling_score([{'at': now, 'p50_ms': None, 'error_rate': 1.0}], now, 600)
+    assert down == {'score': None, 'latency_ms': None, 'error_rate': 1.0}
+    assert rolling_score([], now, 600)['score'] is None
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+def test_probe_cache_drops_deleted_providers(config_manager):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        config_manager.add_provider('a', 'A', url, 'k1')
+        config_manager.add_provider('b', 'B', url, 'k2')
+        config_manager.probe_providers(['a', 'b'], samples=1)
+        config_manager.delete_provider('b')
+        config_manager.probe_providers(['a'], samples=1, refresh=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+    cache = json.loads(config_manager.probe_cache_file.read_text(encoding='utf-8'))
+    assert set(cache['results']) == {'a'} and set(cache['history']) == {'a'}
+    assert len(cache['history']['a']) == 2
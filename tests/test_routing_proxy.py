@@ -0,0 +1,375 @@
+"""routing_proxy 的测试：代理和上游都是本地 asyncio 服务器，不访问外部网络"""
+
+import asyncio
+import contextlib
+import socket
+import time
+
+import pytest
+
+from http_common import CircuitBreaker, find_header, read_headers
+from routing_proxy import RoutingProxy
+
+
+class Upstream:
+    """可按请求序号定制响应的上游桩服务器，记录收到的请求和建立的连接数"""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self.connections = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    def close(self):
+        self.server.close()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        index = 0
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode('latin-1').split(' ', 2)
+                headers = await read_headers(reader)
+                body = await reader.readexactly(int(find_header(headers, 'content-length') or 0))
+                self.requests.append({'method': method, 'target': target, 'headers': headers, 'body': body})
+                keep_alive = await self.respond(writer, index)
+                index += 1
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def reply(status=200, body=b'{"ok":true}', headers=()):
+    """固定响应，保持连接"""
+    async def respond(writer, index):
+        head = [f"HTTP/1.1 {status} Stub", f"Content-Length: {len(body)}", *headers]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        return True
+    return respond
+
+
+@contextlib.asynccontextmanager
+async def proxy_server(config_manager, **kwargs):
+    proxy = RoutingProxy(config_manager, **kwargs)
+    server = await asyncio.start_server(proxy.handle_client, '127.0.0.1', 0)
+    try:
+        yield proxy, server.sockets[0].getsockname()[1]
+    finally:
+        server.close()
+        proxy.pool.close_all()
+
+
+async def send(port, method='POST', path='/v1/messages', body=b'{}', headers=()):
+    """发送一个请求（Connection: close），返回 (状态码, 响应头, 原始响应体)"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    head = [f"{method} {path} HTTP/1.1", "Host: proxy", f"Content-Length: {len(body)}", "Connection: close",
+            *headers]
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+    data = await reader.read()
+    writer.close()
+    head, _, payload = data.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = [tuple(part.strip() for part in line.split(':', 1)) for line in lines[1:]]
+    return int(lines[0].split()[1]), headers, payload
+
+
+def use_providers(config_manager, **urls):
+    for provider_id, url in urls.items():
+        config_manager.add_provider(provider_id, provider_id.upper(), url, f"key-{provider_id}")
+    config_manager.switch_provider(next(iter(urls)), update_env=False)
+
+
+def drop_second_request(status=200):
+    """第一个请求正常响应并保持连接；同一连接上的第二个请求读完后直接断开（模拟失效的 keep-alive 连接）"""
+    ok = reply(status)
+
+    async def respond(writer, index):
+        if index == 0:
+            return await ok(writer, index)
+        return False
+    return respond
+
+
+@pytest.mark.parametrize('method, replayed', [('POST', False), ('GET', True)])
+def test_stale_connection_replays_only_idempotent_requests(config_manager, method, replayed):
+    async def run():
+        upstream = await Upstream(drop_second_request()).start()
+        use_providers(config_manager, a=upstream.url)
+        try:
+            async with proxy_server(config_manager) as (proxy, port):
+                assert (await send(port, method))[0] == 200
+                status, _, body = await send(port, method)
+                return status, body, upstream, proxy
+        finally:
+            upstream.close()
+
+    status, body, upstream, proxy = asyncio.run(run())
+    if replayed:
+        # 幂等请求在新连接上重试一次
+        assert status == 200 and len(upstream.requests) == 3 and upstream.connections == 2
+    else:
+        # 非幂等请求可能已被处理，直接返回 502，不在新连接上重放
+        assert status == 502 and '未自动重试' in body.decode('utf-8')
+        assert len(upstream.requests) == 2 and upstream.connections == 1
+    assert proxy.pool.reused == 1
+
+
+def test_post_is_not_failed_over_after_send(config_manager):
+    async def run():
+        primary = await Upstream(drop_second_request()).start()
+        backup = await Upstream(reply()).start()
+        use_providers(config_manager, a=primary.url, b=backup.url)
+        try:
+            async with proxy_server(config_manager, fallback=['b']) as (_, port):
+                await send(port)
+                return (await send(port))[0], backup
+        finally:
+            primary.close()
+            backup.close()
+
+    status, backup = asyncio.run(run())
+    assert status == 502 and backup.requests == []
+
+
+def test_malformed_upstream_headers_are_bad_gateway(config_manager):
+    async def garbage(writer, index):
+        writer.write(b"HTTP/1.1 200 OK\r\nnot a header line\r\n\r\n")
+        return False
+
+    async def run():
+        upstream = await Upstream(garbage).start()
+        use_providers(config_manager, a=upstream.url)
+        try:
+            async with proxy_server(config_manager) as (_, port):
+                return await send(port)
+        finally:
+            upstream.close()
+
+    status, _, body = asyncio.run(run())
+    assert status == 502 and '无效的响应头' in body.decode('utf-8')
+
+
+def test_keep_alive_connections_are_reused(config_manager):
+    async def run():
+        upstream = await Upstream(reply()).start()
+        use_providers(config_manager, a=upstream.url, b=upstream.url)
+        try:
+            async with proxy_server(config_manager) as (proxy, port):
+                statuses = [(await send(port))[0] for _ in range(3)]
+                statuses.append((await send(port, headers=['X-Claude-Provider: b', 'x-api-key: client']))[0])
+                return statuses, upstream, proxy.pool.stats()
+        finally:
+            upstream.close()
+
+    statuses, upstream, stats = asyncio.run(run())
+    assert statuses == [200] * 4
+    assert upstream.connections == 1 and stats == {'opened': 1, 'reused': 3, 'idle': 1}
+    first, last = upstream.requests[0]['headers'], upstream.requests[-1]['headers']
+    assert find_header(first, 'authorization') == 'Bearer key-a' and find_header(first, 'connection') == 'keep-alive'
+    # 请求头指定的提供商生效，客户端的 Key 被替换，路由头不会转发给上游
+    assert find_header(last, 'authorization') == 'Bearer key-b' and find_header(last, 'x-api-key') == 'key-b'
+    assert find_header(last, 'x-claude-provider') == ''
+
+
+def test_sse_chunks_are_relayed_as_they_arrive(config_manager):
+    first_seen = None
+
+    async def stream(writer, index):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        writer.write(b"d\r\ndata: first\n\n\r\n")
+        await writer.drain()
+        # 客户端收到第一个事件之后才发送第二个，代理缓冲整个响应时会一直等下去
+        await asyncio.wait_for(first_seen.wait(), 5)
+        writer.write(b"e\r\ndata: second\n\n\r\n0\r\n\r\n")
+        return True
+
+    async def run():
+        nonlocal first_seen
+        first_seen = asyncio.Event()
+        upstream = await Upstream(stream).start()
+        use_providers(config_manager, a=upstream.url)
+        try:
+            async with proxy_server(config_manager) as (proxy, port):
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(b"POST /v1/messages HTTP/1.1\r\nHost: proxy\r\nContent-Length: 2\r\n"
+                             b"Connection: close\r\n\r\n{}")
+                data = b''
+                while b'data: first' not in data:
+                    data += await asyncio.wait_for(reader.read(1024), 5)
+                first_seen.set()
+                data += await asyncio.wait_for(reader.read(), 5)
+                writer.close()
+                return data, proxy
+        finally:
+            upstream.close()
+
+    data, proxy = asyncio.run(run())
+    head, _, body = data.partition(b'\r\n\r\n')
+    assert b'Transfer-Encoding: chunked' in head and b'X-Proxy-Overhead-Ms: ' in head
+    assert body == b"d\r\ndata: first\n\n\r\ne\r\ndata: second\n\n\r\n0\r\n\r\n"
+    metric = proxy.metrics[-1]
+    assert metric['complete'] and metric['provider'] == 'a' and metric['attempts'] == 1
+
+
+def test_proxy_errors_without_usable_provider(config_manager):
+    async def run():
+        async with proxy_server(config_manager) as (_, port):
+            unset = await send(port)
+            config_manager.add_provider('a', 'A', 'http://a.invalid', '')
+            unconfigured = await send(port, headers=['X-Claude-Provider: a'])
+            return unset, unconfigured
+
+    unset, unconfigured = asyncio.run(run())
+    assert unset[0] == 503 and "未设置当前提供商" in unset[2].decode('utf-8')
+    assert unconfigured[0] == 503 and "不存在或未配置" in unconfigured[2].decode('utf-8')
+
+
+def slow(delay, status=200):
+    ok = reply(status)
+
+    async def respond(writer, index):
+        await asyncio.sleep(delay)
+        return await ok(writer, index)
+    return respond
+
+
+def unused_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def test_circuit_breaker_state_machine():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    # half_open 只放行一个试探请求；试探失败重新 open
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    # 被取消的试探不计结果，释放名额
+    breaker.record_cancelled()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0 and breaker.allow()
+
+
+@pytest.mark.parametrize('primary', ['refused', 503])
+def test_failover_to_backup_provider(config_manager, primary):
+    async def run():
+        bad = await Upstream(reply(primary)).start() if primary != 'refused' else None
+        backup = await Upstream(reply()).start()
+        use_providers(config_manager, a=bad.url if bad else unused_url(), b=backup.url)
+        try:
+            async with proxy_server(config_manager, fallback=['b']) as (proxy, port):
+                status, headers, _ = await send(port)
+                return status, headers, proxy
+        finally:
+            backup.close()
+            if bad:
+                bad.close()
+
+    status, headers, proxy = asyncio.run(run())
+    assert status == 200 and proxy.metrics[-1]['provider'] == 'b' and proxy.metrics[-1]['attempts'] == 2
+    assert proxy.breakers['a'].failures == 1 and proxy.breakers['b'].state == CircuitBreaker.CLOSED
+
+
+def test_all_candidates_failing_returns_last_error_response(config_manager):
+    async def run():
+        a = await Upstream(reply(502)).start()
+        b = await Upstream(reply(529)).start()
+        use_providers(config_manager, a=a.url, b=b.url)
+        try:
+            async with proxy_server(config_manager, fallback=['b']) as (_, port):
+                return (await send(port))[0]
+        finally:
+            a.close()
+            b.close()
+
+    assert asyncio.run(run()) == 529
+
+
+def test_open_breaker_skips_provider(config_manager):
+    async def run():
+        bad = await Upstream(reply(500)).start()
+        backup = await Upstream(reply()).start()
+        use_providers(config_manager, a=bad.url, b=backup.url)
+        try:
+            async with proxy_server(config_manager, fallback=['b'], failure_threshold=2,
+                                    reset_timeout=60) as (proxy, port):
+                statuses = [(await send(port))[0] for _ in range(4)]
+                return statuses, bad, proxy
+        finally:
+            bad.close()
+            backup.close()
+
+    statuses, bad, proxy = asyncio.run(run())
+    assert statuses == [200] * 4
+    # 连续失败两次后熔断，之后的请求不再发给 a
+    assert len(bad.requests) == 2 and proxy.breakers['a'].state == CircuitBreaker.OPEN
+    assert [metric['attempts'] for metric in proxy.metrics] == [2, 2, 1, 1]
+
+
+def test_hedged_request_uses_first_response(config_manager):
+    async def run():
+        primary = await Upstream(slow(2.0)).start()
+        backup = await Upstream(reply()).start()
+        use_providers(config_manager, a=primary.url, b=backup.url)
+        try:
+            async with proxy_server(config_manager, fallback=['b'], hedge_delay=0.05) as (proxy, port):
+                started = time.perf_counter()
+                status = (await send(port))[0]
+                return status, time.perf_counter() - started, primary, proxy
+        finally:
+            primary.close()
+            backup.close()
+
+    status, elapsed, primary, proxy = asyncio.run(run())
+    assert status == 200 and elapsed < 1.0
+    assert len(primary.requests) == 1 and proxy.metrics[-1]['provider'] == 'b'
+    # 被取消的慢请求不计入熔断器
+    assert proxy.breakers['a'].failures == 0 and proxy.breakers['a'].state == CircuitBreaker.CLOSED
+
+
+def test_rate_limited_key_is_rotated_before_failover(config_manager):
+    async def limited_first_key(writer, index):
+        status = 429 if len(upstream.requests) == 1 else 200
+        return await reply(status, headers=['retry-after: 30'])(writer, index)
+
+    async def run():
+        nonlocal upstream
+        upstream = await Upstream(limited_first_key).start()
+        use_providers(config_manager, a=upstream.url)
+        config_manager.add_api_key('a', 'key-a2')
+        try:
+            async with proxy_server(config_manager) as (proxy, port):
+                status = (await send(port))[0]
+                return status, proxy
+        finally:
+            upstream.close()
+
+    upstream = None
+    status, proxy = asyncio.run(run())
+    assert status == 200
+    assert [find_header(request['headers'], 'authorization') for request in upstream.requests] == \
+        ['Bearer key-a', 'Bearer key-a2']
+    assert proxy.breakers['a'].failures == 0
@@ -0,0 +1,108 @@
+"""sqlite_store 的测试：WAL 模式、跨连接的缓存失效和数据文件权限"""
+
+import os
+import sqlite3
+import stat
+
+import pytest
+
+from config_core import ConfigManager
+from sqlite_store import SqliteProviderStore
+
+
+def provider(name, **extra):
+    return {'name': name, 'base_url': f"http://{name}.invalid", 'api_key': 'k', **extra}
+
+
+@pytest.fixture
+def stores(tmp_path):
+    path = tmp_path / 'providers.db'
+    first, second = SqliteProviderStore(path), SqliteProviderStore(path)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_wal_readers_are_not_blocked_by_writer(stores):
+    first, second = stores
+    first.write({'providers': {'a': provider('a')}})
+    assert first.connection().execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+    writer = sqlite3.connect(str(first.path), isolation_level=None)
+    try:
+        writer.execute("BEGIN IMMEDIATE")
+        writer.execute("DELETE FROM providers")
+        # 未提交的写事务不影响其他连接读取
+        assert list(second.read()['providers']) == ['a']
+        assert second.get('a')['name'] == 'a'
+        writer.execute("ROLLBACK")
+    finally:
+        writer.close()
+
+
+def test_cache_is_invalidated_by_other_connection(stores):
+    first, second = stores
+    assert second.read() is None
+    first.write({'providers': {'a': provider('a'), 'b': provider('b', tags=['x'])}})
+
+    assert list(second.read()['providers']) == ['a', 'b']
+    assert second.read() is second.read()
+    assert second.stats() == {'hits': 2, 'misses': 2}
+
+    first.apply({'a': provider('a', description='changed'), 'b': None})
+    data = second.read()
+    assert second.stats()['misses'] == 3
+    assert list(data['providers']) == ['a'] and data['providers']['a']['description'] == 'changed'
+    assert second.find(tag='x') == []
+
+    # 本连接的修改直接更新缓存，不需要重新加载
+    before = second.stats()['misses']
+    second.apply({'c': provider('c')})
+    assert list(second.read()['providers']) == ['a', 'c'] and second.stats()['misses'] == before
+    assert first.get('c')['name'] == 'c'
+
+
+def test_database_files_are_private(tmp_path):
+    path = tmp_path / 'providers.db'
+    # 之前的版本按 umask 创建的数据库文件
+    sqlite3.connect(str(path)).close()
+    os.chmod(path, 0o644)
+    old_umask = os.umask(0o022)
+    try:
+        store = SqliteProviderStore(path)
+        store.write({'providers': {'a': provider('a')}})
+        files = [path, tmp_path / 'providers.db-wal', tmp_path / 'providers.db-shm']
+        assert all(file.exists() for file in files)
+        assert [mode(file) for file in files] == [0o600] * 3
+        store.close()
+    finally:
+        os.umask(old_umask)
+
+
+def test_config_manager_on_sqlite(config_manager, tmp_path):
+    config_manager.add_provider('a', 'A', 'http://a.invalid', 'k1')
+    providers = list(config_manager.load_providers()['providers'])
+    assert config_manager.migrate_storage('sqlite') == len(providers)
+    config_manager.add_provider('b', 'B', 'http://b.invalid', 'k2')
+
+    other = ConfigManager(config_manager.config_dir)
+    assert other.storage == 'sqlite' and list(other.load_providers()['providers']) == providers + ['b']
+    other.delete_provider('a')
+    assert config_manager.get_provider('a') is None
+
+
+def test_close_releases_database_and_lock(config_manager):
+    config_manager.migrate_storage('sqlite')
+    config_manager.add_provider('a', 'A', 'http://a.invalid', 'k1')
+    store = config_manager._providers_store
+    assert store._conn is not None and config_manager._lock._fd is not None
+
+    config_manager.close()
+    assert store._conn is None and config_manager._lock._fd is None
+    # 关闭后继续使用时重新打开
+    assert config_manager.get_provider('a')['name'] == 'A'
+    config_manager.close()
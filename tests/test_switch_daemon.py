@@ -0,0 +1,56 @@
+"""switch_daemon 的测试：在后台线程运行守护进程，通过 Unix 域套接字请求"""
+
+import socket
+import threading
+import time
+
+import pytest
+
+import switch_daemon
+from switch_daemon import request_daemon, serve_daemon
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="需要 Unix 域套接字")
+
+
+@pytest.fixture
+def daemon(config_manager, tmp_path, monkeypatch):
+    monkeypatch.delenv('CLAUDE_CONFIG_NO_DAEMON')
+    path = str(tmp_path / 'd.sock')
+    ready = threading.Event()
+    thread = threading.Thread(target=serve_daemon, args=(config_manager, path),
+                              kwargs={'ready': lambda _: ready.set()}, daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    yield path
+    request_daemon({'cmd': 'shutdown'}, path)
+    thread.join(5)
+
+
+def test_request_errors_are_returned_and_daemon_survives(daemon, config_manager, monkeypatch):
+    config_manager.add_provider('a', 'A', 'http://a.invalid', 'k1')
+
+    def broken(*args, **kwargs):
+        raise ValueError("providers.json 已损坏")
+
+    monkeypatch.setattr(config_manager, 'list_providers', broken)
+    assert request_daemon({'cmd': 'list'}, daemon) == {'ok': False, 'error': "providers.json 已损坏"}
+    monkeypatch.setattr(config_manager, 'get_provider', lambda pid: {}.__getitem__(pid))
+    response = request_daemon({'cmd': 'switch', 'provider': 'a', 'update_env': False}, daemon)
+    assert response['ok'] is False
+    assert request_daemon({'cmd': 'ping'}, daemon)['ok']
+
+
+def test_timeout_after_send_is_reported(daemon, monkeypatch):
+    def slow(config_manager, request):
+        time.sleep(0.5)
+        return {'ok': True}
+
+    monkeypatch.setattr(switch_daemon, 'handle_request', slow)
+    response = request_daemon({'cmd': 'switch', 'provider': 'a'}, daemon, timeout=0.1)
+    # 请求已经发出，不能返回 None 让调用方在进程内重复切换
+    assert response is not None and response['ok'] is False and '没有响应' in response['error']
+
+
+def test_missing_socket_falls_back(tmp_path, monkeypatch):
+    monkeypatch.delenv('CLAUDE_CONFIG_NO_DAEMON', raising=False)
+    assert request_daemon({'cmd': 'ping'}, str(tmp_path / 'none.sock')) is None
@@ -0,0 +1,103 @@
+"""task_runner 的测试：用 Python 桩脚本代替 claude 命令"""
+
+import shlex
+import sys
+
+import pytest
+
+from task_runner import TaskRunner, build_command, load_tasks, parse_weights, run_tasks
+
+STUB = '''
+import os, sys, time
+task_id = sys.argv[1]
+print(task_id, os.environ['ANTHROPIC_BASE_URL'], os.environ['ANTHROPIC_AUTH_TOKEN'])
+if task_id.startswith('slow'):
+    time.sleep(5)
+sys.exit(0 if 'good' in os.environ['ANTHROPIC_BASE_URL'] else 3)
+'''
+
+
+@pytest.fixture
+def stub_command(tmp_path):
+    script = tmp_path / 'stub.py'
+    script.write_text(STUB, encoding='utf-8')
+    return f"{shlex.quote(sys.executable)} {shlex.quote(str(script))} {{id}}"
+
+
+@pytest.fixture
+def providers(config_manager):
+    config_manager.add_provider('good', 'Good', 'http://good.invalid', 'k-good')
+    config_manager.add_provider('bad', 'Bad', 'http://bad.invalid', 'k-bad')
+    return config_manager
+
+
+def tasks_of(count, prefix='task'):
+    return [{'id': f"{prefix}-{index}", 'prompt': '', 'args': None} for index in range(count)]
+
+
+def test_tasks_run_with_provider_environment(providers, stub_command, tmp_path):
+    results = run_tasks(providers, tasks_of(4), {'good': 2}, command=stub_command,
+                        output_dir=tmp_path / 'out')
+    assert [result['id'] for result in results] == [f"task-{index}" for index in range(4)]
+    assert all(result['ok'] and result['exit_code'] == 0 and result['attempts'] == 1 for result in results)
+    log = (tmp_path / 'out' / 'task-0.log').read_text(encoding='utf-8')
+    assert log.split() == ['task-0', 'http://good.invalid', 'k-good']
+
+
+def test_failed_tasks_move_to_healthy_provider(providers, stub_command):
+    events = []
+    results = run_tasks(providers, tasks_of(6), {'bad': 1, 'good': 1}, command=stub_command,
+                        failure_threshold=1, reset_timeout=60, on_event=events.append)
+    assert all(result['ok'] and result['provider'] == 'good' for result in results)
+    assert any(event['event'] == 'retry' and event['provider'] == 'bad' for event in events)
+    # 连续失败达到阈值后熔断，之后不再把任务交给 bad
+    opened = [index for index, event in enumerate(events) if event['event'] == 'breaker_open']
+    assert len(opened) == 1 and events[opened[0]]['provider'] == 'bad'
+    assert not any(event['event'] == 'start' and event['provider'] == 'bad' for event in events[opened[0]:])
+
+
+def test_task_fails_after_max_attempts(providers, stub_command):
+    results = run_tasks(providers, tasks_of(1), {'bad': 1}, command=stub_command, max_attempts=2)
+    assert results[0]['ok'] is False
+    assert results[0]['attempts'] == 2 and results[0]['error'] == '退出码 3'
+
+
+def test_task_timeout_kills_process(providers, stub_command):
+    results = run_tasks(providers, tasks_of(1, 'slow'), {'good': 1}, command=stub_command,
+                        timeout=0.3, max_attempts=1)
+    assert results[0]['error'] == '超时' and results[0]['exit_code'] is None
+    assert results[0]['duration_ms'] < 3000
+
+
+def test_missing_command_is_reported(providers):
+    results = run_tasks(providers, tasks_of(1), {'good': 1}, command='/nonexistent/claude {prompt}',
+                        max_attempts=1)
+    assert not results[0]['ok'] and results[0]['error'].startswith('无法执行 /nonexistent/claude')
+
+
+def test_unknown_or_unconfigured_provider(providers):
+    providers.add_provider('nokey', 'No Key', 'http://nokey.invalid', '')
+    with pytest.raises(KeyError):
+        TaskRunner(providers, {'missing': 1})
+    with pytest.raises(KeyError):
+        TaskRunner(providers, {'nokey': 1})
+
+
+def test_parse_weights():
+    assert parse_weights('kimi:4, qwen ,zhipu:2') == {'kimi': 4, 'qwen': 1, 'zhipu': 2}
+    with pytest.raises(ValueError):
+        parse_weights('kimi:x')
+    with pytest.raises(ValueError):
+        parse_weights('kimi:0')
+
+
+def test_load_tasks_and_build_command():
+    tasks = load_tasks(['# comment', '', '"hello"', '{"id": "b", "args": ["echo", "hi"]}'])
+    assert tasks == [{'id': 'task-1', 'prompt': 'hello', 'args': None},
+                     {'id': 'b', 'prompt': '', 'args': ['echo', 'hi']}]
+    assert build_command(['claude', '-p', '{prompt}', '--id={id}'], tasks[0]) == \
+        ['claude', '-p', 'hello', '--id=task-1']
+    assert build_command(['claude'], tasks[1]) == ['echo', 'hi']
+    for lines in (['{"id": "a", "prompt": "x"}', '{"id": "a", "prompt": "y"}'], ['{"args": []}'], ['[1]']):
+        with pytest.raises(ValueError):
+            load_tasks(lines)
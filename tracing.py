@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Claude Code 配置管理器的耗时追踪
+记录配置操作和文件读写的耗时区间，进程退出时输出 Chrome trace-event JSON，
+可在 chrome://tracing 或 https://ui.perfetto.dev 中查看。
+
+通过命令行参数 --trace FILE 或环境变量 CLAUDE_CONFIG_TRACE=FILE 启用。环境变量会被子进程继承
+（exec、run 的任务、守护进程等），因此按环境变量启用时文件名中加入进程号（trace.json -> trace.<pid>.json），
+各进程分别写入自己的文件；
+未启用时 span() 和 traced() 只多一次全局变量判断，threading 等模块也只在启用后才导入。
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+TRACE_ENV = 'CLAUDE_CONFIG_TRACE'
+
+_tracer = None
+
+
+class _NullSpan:
+    """未启用追踪时使用的空上下文"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def process_uptime() -> Optional[float]:
+    """进程已运行的秒数（用于记录解释器启动耗时），仅 Linux 可用"""
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            fields = f.read().rsplit(b')', 1)[1].split()
+        with open('/proc/uptime', 'rb') as f:
+            system_uptime = float(f.read().split()[0])
+        start_ticks = int(fields[19])
+        return max(0.0, system_uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class Tracer:
+    """收集 trace 事件，退出时写入文件"""
+
+    def __init__(self, path: str):
+        import threading
+        self.threading = threading
+        self.path = path
+        self.pid = os.getpid()
+        self.events = []
+        now = time.perf_counter()
+        uptime = process_uptime()
+        # 时间原点取进程启动时刻，解释器启动和模块导入也能显示在时间轴上
+        self.origin = now - (uptime or 0.0)
+        if uptime:
+            self.add('process_startup', 'startup', self.origin, now)
+
+    def add(self, name: str, category: str, start: float, end: float, args: Optional[dict] = None):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self.origin) * 1e6, 3),
+            'dur': round((end - start) * 1e6, 3),
+            'pid': self.pid,
+            'tid': self.threading.get_ident(),
+        }
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def write(self):
+        threading = self.threading
+        threads = {event['tid'] for event in self.events}
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': self.pid,
+                     'args': {'name': os.path.basename(sys.argv[0]) or 'python'}}]
+        metadata += [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+                      'args': {'name': 'main' if tid == threading.main_thread().ident else f"thread-{tid}"}}
+                     for tid in threads]
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name: str, category: str, args: Optional[dict]):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        tracer = _tracer
+        if tracer is not None:
+            args = self.args
+            if exc_type is not None:
+                args = dict(args or {}, error=exc_type.__name__)
+            tracer.add(self.name, self.category, self.start, time.perf_counter(), args)
+        return False
+
+
+def span(name: str, category: str = 'config', **args):
+    """记录一段代码的耗时：with span('json.load', 'io', path=...): ..."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(name, category, args or None)
+
+
+def traced(func=None, *, category: str = 'config'):
+    """记录函数调用耗时的装饰器，区间名称为函数的限定名"""
+    def decorate(func):
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _Span(name, category, None):
+                return func(*args, **kwargs)
+        return wrapper
+
+    if func is not None:
+        return decorate(func)
+    return decorate
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def start_tracing(path: str):
+    """开始记录，进程退出时写入 path"""
+    global _tracer
+    if _tracer is not None:
+        _tracer.path = path
+        return
+    _tracer = Tracer(path)
+    atexit.register(stop_tracing)
+
+
+def stop_tracing() -> Optional[str]:
+    """停止记录并写入文件，返回文件路径"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return None
+    try:
+        tracer.write()
+    except OSError as e:
+        print(f"写入 trace 文件失败: {e}", file=sys.stderr)
+        return None
+    return tracer.path
+
+
+def env_trace_path(path: str, pid: Optional[int] = None) -> str:
+    """环境变量启用追踪时的文件名：在扩展名前加入进程号"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getpid() if pid is None else pid}{ext}"
+
+
+if os.environ.get(TRACE_ENV):
+    start_tracing(env_trace_path(os.environ[TRACE_ENV]))